@@ -0,0 +1,146 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
+
+from config import (
+    ADMISSION_MAX_CONCURRENT_RUNS,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_MAX_QUEUE_SECONDS,
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a run cannot be admitted. Carries the HTTP status and Retry-After."""
+
+    def __init__(self, reason: str, status_code: int, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Concurrency cap with a bounded FIFO wait queue and a max queue time.
+
+    Retry-After hints combine the current drain rate (average run time spread
+    over the concurrency cap) with the time until an LLM key has budget again,
+    as reported by `budget_wait`.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = ADMISSION_MAX_CONCURRENT_RUNS,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        max_queue_seconds: float = ADMISSION_MAX_QUEUE_SECONDS,
+        budget_wait: Optional[Callable[[], float]] = None,
+    ):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_queue = max(0, int(max_queue))
+        self.max_queue_seconds = float(max_queue_seconds)
+        self.budget_wait = budget_wait
+        self.running = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        # Seed the drain-rate estimate with a typical multi-stage run.
+        self._avg_run_seconds = 20.0
+        self._counters = {"admitted": 0, "queue_full": 0, "queue_timeout": 0, "no_llm_budget": 0}
+
+    # ------------------------ estimates -----------------------
+
+    def waiting(self) -> int:
+        return sum(1 for f in self._waiters if not f.done())
+
+    def estimated_wait(self, position: int | None = None) -> float:
+        """Seconds until a request at `position` in line (default: a new arrival) starts."""
+        position = self.waiting() + 1 if position is None else position
+        if self.running < self.max_concurrent and position <= 1:
+            return 0.0
+        return position * self._avg_run_seconds / self.max_concurrent
+
+    def budget_seconds(self) -> float:
+        """Seconds until an LLM key has budget again (0 when unknown)."""
+        if self.budget_wait is None:
+            return 0.0
+        try:
+            return float(self.budget_wait())
+        except Exception:
+            return 0.0
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(max(self.estimated_wait(), self.budget_seconds())))
+
+    # ------------------------- slots --------------------------
+
+    def _reject(self, reason: str, status_code: int = 503) -> AdmissionRejected:
+        self._counters[reason] += 1
+        return AdmissionRejected(reason, status_code, self.retry_after())
+
+    async def acquire(self, bounded: bool = True) -> None:
+        """Take a run slot, waiting in line if needed.
+
+        With `bounded=False` (background jobs, which have their own bounded
+        queue) the caller waits without the queue-size and queue-time limits.
+        """
+        # No key can serve a call before the deadline: fail fast with a 429.
+        if bounded and self.budget_seconds() > self.max_queue_seconds:
+            raise self._reject("no_llm_budget", status_code=429)
+
+        if self.running < self.max_concurrent and not self.waiting():
+            self.running += 1
+            self._counters["admitted"] += 1
+            return
+
+        if bounded and self.waiting() >= self.max_queue:
+            raise self._reject("queue_full")
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await asyncio.wait_for(fut, timeout=self.max_queue_seconds if bounded else None)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if fut.done() and not fut.cancelled():
+                # A slot was handed over just as we gave up: pass it on.
+                self.release(record=False)
+            else:
+                try:
+                    self._waiters.remove(fut)
+                except ValueError:
+                    pass
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            raise self._reject("queue_timeout")
+        self._counters["admitted"] += 1
+
+    def release(self, run_seconds: float | None = None, record: bool = True) -> None:
+        if record and run_seconds is not None:
+            self._avg_run_seconds = 0.8 * self._avg_run_seconds + 0.2 * run_seconds
+        # Hand the slot straight to the next waiter, if any.
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(True)
+                return
+        self.running = max(0, self.running - 1)
+
+    @asynccontextmanager
+    async def admit(self, bounded: bool = True):
+        await self.acquire(bounded=bounded)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def snapshot(self) -> dict:
+        return {
+            "running": self.running,
+            "waiting": self.waiting(),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "max_queue_seconds": self.max_queue_seconds,
+            "avg_run_seconds": round(self._avg_run_seconds, 2),
+            "retry_after_hint": self.retry_after(),
+            **self._counters,
+        }
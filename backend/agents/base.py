@@ -5,6 +5,6 @@ class BaseAgent:
         self.name = name
         self.memory = memory
 
-    async def think(self, prompt: str, purpose: str = "generation", key_index: int | None = None):
+    async def think(self, prompt: str, purpose: str = "generation", key_index: int | None = None, stream: bool = False):
         system = f"you are the {self.name} agent."
-        return await call_llm(prompt, system, purpose=purpose, key_index=key_index)
\ No newline at end of file
+        return await call_llm(prompt, system, purpose=purpose, key_index=key_index, stream=stream)
\ No newline at end of file
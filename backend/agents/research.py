@@ -1,11 +1,101 @@
+import asyncio
+import json
+import re
+
 from agents.base import BaseAgent
+from config import RESEARCH_MAX_SUBQUERIES, RESEARCH_REDUCE_TOKEN_BUDGET
+from llm_cache import is_sentinel
+from rate_limiter import estimate_tokens
 from tools.search_tool import SearchTool
 
 search_tool = SearchTool()
 
+# Reduce rounds before falling back to concatenating what is left.
+_MAX_REDUCE_ROUNDS = 3
+
+
 class ResearchAgent(BaseAgent):
+    """Search and summarize a topic in one LLM call.
+
+    With RESEARCH_MAX_SUBQUERIES above 1 this becomes map-reduce research:
+    split the topic into sub-queries, search and summarize each one
+    concurrently, then merge the partial summaries. Calls are not pinned to a key, so the key scheduler spreads the
+    sub-queries over the healthiest keys and the stage takes as long as the
+    slowest sub-query rather than the sum of them.
+    """
+
     async def run_research(self, topic: str):
-        results = await search_tool.search(topic)
+        queries = await self._split(topic)
+        partials = await asyncio.gather(*(self._research_one(q) for q in queries))
+
+        results = [r for partial in partials for r in partial["results"]]
+        summaries = [p["summary"] for p in partials if not is_sentinel(p["summary"])]
+        if not summaries:
+            # Every sub-query failed: surface the sentinel like a single call would.
+            return {"results": results, "summary": partials[0]["summary"], "queries": queries}
+        summary = await self._reduce(topic, summaries)
+        return {"results": results, "summary": summary, "queries": queries}
+
+    async def _split(self, topic: str) -> list[str]:
+        """Up to RESEARCH_MAX_SUBQUERIES independent sub-queries covering the topic."""
+        if RESEARCH_MAX_SUBQUERIES <= 1:
+            return [topic]
+        raw = await self.think(
+            f"Split this research topic into at most {RESEARCH_MAX_SUBQUERIES} independent, "
+            f"non-overlapping search queries that together cover it. A narrow topic may need only one.\n"
+            f"Return ONLY a JSON array of strings.\n\nTopic:\n{topic}"
+        )
+        if is_sentinel(raw):
+            return [topic]
+        match = re.search(r"\[.*\]", raw or "", re.DOTALL)
+        try:
+            parsed = json.loads(match.group(0)) if match else None
+        except Exception:
+            parsed = None
+        queries = [str(q).strip() for q in (parsed or []) if str(q).strip()]
+        return list(dict.fromkeys(queries))[:RESEARCH_MAX_SUBQUERIES] or [topic]
+
+    async def _research_one(self, query: str) -> dict:
+        results = await search_tool.search(query)
         summary = await self.think(f"Summarize: {results}")
-        return {"results": results, "summary": summary}
-    
\ No newline at end of file
+        return {"query": query, "results": results, "summary": summary}
+
+    async def _reduce(self, topic: str, summaries: list[str]) -> str:
+        """Merge partial summaries, keeping every merge prompt within the token budget."""
+        if len(summaries) == 1:
+            return summaries[0]
+        for _ in range(_MAX_REDUCE_ROUNDS):
+            before = len(summaries)
+            groups = self._group(topic, summaries)
+            merged = await asyncio.gather(*(self._merge(topic, group) for group in groups))
+            # Keep a group's inputs when its merge failed, so nothing is lost.
+            summaries = []
+            for group, text in zip(groups, merged):
+                summaries.extend(group if is_sentinel(text) else [text])
+            if len(summaries) == 1:
+                return summaries[0]
+            if len(summaries) >= before:
+                # Nothing was merged; another round would not converge.
+                break
+        return "\n\n".join(summaries)
+
+    def _group(self, topic: str, summaries: list[str]) -> list[list[str]]:
+        groups: list[list[str]] = [[]]
+        for summary in summaries:
+            if groups[-1] and estimate_tokens(self._merge_prompt(topic, groups[-1] + [summary])) > RESEARCH_REDUCE_TOKEN_BUDGET:
+                groups.append([])
+            groups[-1].append(summary)
+        return groups
+
+    async def _merge(self, topic: str, group: list[str]) -> str:
+        if len(group) == 1:
+            return group[0]
+        return await self.think(self._merge_prompt(topic, group))
+
+    @staticmethod
+    def _merge_prompt(topic: str, summaries: list[str]) -> str:
+        parts = "\n\n".join(f"Finding {i}:\n{s}" for i, s in enumerate(summaries, 1))
+        return (
+            f"Merge these research findings about the topic below into one concise summary. "
+            f"Keep every distinct fact, drop repetition.\n\nTopic:\n{topic}\n\n{parts}"
+        )
@@ -50,7 +50,8 @@ Output ONLY the improved document.
         revised_document = await self.think(
             prompt,
             purpose="review_improve",
-            key_index=key_index
+            key_index=key_index,
+            stream=True
         )
 
         # Detect no-op reviewer behavior
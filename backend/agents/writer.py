@@ -2,4 +2,4 @@ from agents.base import BaseAgent
 
 class WriterAgent(BaseAgent):
     async def write_document(self, brief: str, key_index: int | None = None):
-        return {"document": await self.think(brief, key_index=key_index)}
\ No newline at end of file
+        return {"document": await self.think(brief, key_index=key_index, stream=True)}
\ No newline at end of file
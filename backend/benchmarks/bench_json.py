@@ -0,0 +1,110 @@
+"""Micro-benchmark: response serialization for a /run-sized payload.
+
+Compares the previous path (serialize_doc copy + stdlib json, as JSONResponse
+did) with FastJSONResponse's single-pass encoder, reports gzip size, and the
+cost of a `view=summary` response.
+
+Run from backend/:
+    python benchmarks/bench_json.py [--runs 200] [--chars 20000]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from responses import shape  # noqa: E402
+from utils import ORJSON_AVAILABLE, dumps_json, serialize_doc  # noqa: E402
+
+try:
+    from bson import ObjectId
+except ImportError:
+    ObjectId = None
+
+
+def _text(chars: int) -> str:
+    line = "The architecture of the system is described here in detail, with examples.\n"
+    return (line * (chars // len(line) + 1))[:chars]
+
+
+def build_payload(chars: int) -> dict:
+    """Shape of a /run result: research, developer, writer and reviewer text plus metadata."""
+    now = datetime.now(timezone.utc)
+    oid = ObjectId() if ObjectId is not None else "65f0c0ffee0123456789abcd"
+    document = {"_id": oid, "session_id": "session_bench", "document": _text(chars), "created_at": now}
+    return {
+        "session_id": "session_bench",
+        "plan": {
+            "goal": "Benchmark goal",
+            "tasks": [
+                {"description": _text(400), "assigned_agent": agent}
+                for agent in ("Research", "Developer", "Writer")
+            ],
+        },
+        "handoff": {
+            "research": {
+                "_id": oid,
+                "summary": _text(chars // 4),
+                "results": [{"title": f"Source {i}", "snippet": _text(300), "created_at": now} for i in range(20)],
+            },
+            "developer": {"diagram": _text(chars // 4), "created_at": now},
+            "writer": document,
+            "reviewer": dict(document, document=_text(chars)),
+        },
+        "final": document,
+        "confidence": {
+            "confidence_score": 87,
+            "hallucination_risk_score": 20,
+            "hallucination_issues": [f"Issue {i}" for i in range(5)],
+            "created_at": now,
+        },
+    }
+
+
+def old_path(payload) -> bytes:
+    return json.dumps(
+        serialize_doc(payload),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def bench(fn, payload, runs: int) -> float:
+    fn(payload)  # warm-up
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn(payload)
+    return (time.perf_counter() - start) / runs * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--chars", type=int, default=20000, help="size of the writer/reviewer documents")
+    args = parser.parse_args()
+
+    payload = build_payload(args.chars)
+    old_body, new_body = old_path(payload), dumps_json(payload)
+    assert json.loads(old_body) == json.loads(new_body), "serializers disagree"
+
+    old_ms = bench(old_path, payload, args.runs)
+    new_ms = bench(dumps_json, payload, args.runs)
+    print(f"payload: {len(old_body):,} bytes, gzip: {len(gzip.compress(new_body, 6)):,} bytes")
+    new_label = f"dumps_json ({'orjson' if ORJSON_AVAILABLE else 'stdlib'})"
+    print(f"{'serialize_doc + json.dumps':<27}: {old_ms:.3f} ms")
+    print(f"{new_label:<27}: {new_ms:.3f} ms  ({old_ms / new_ms:.1f}x)")
+
+    summary_ms = bench(lambda p: dumps_json(shape(p, "summary")), payload, args.runs)
+    summary_body = dumps_json(shape(payload, "summary"))
+    print(f"{'view=summary':<27}: {summary_ms:.3f} ms  ({old_ms / summary_ms:.1f}x), {len(summary_body):,} bytes")
+
+
+if __name__ == "__main__":
+    main()
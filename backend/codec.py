@@ -0,0 +1,147 @@
+"""Compression for large text fields stored by MemoryStore.
+
+String values at or above a size threshold are replaced by a small marker
+dict holding the compressed bytes. `decode` restores them, so callers (and
+serialize_doc) only ever see plain strings. Compression uses zstd when the
+`zstandard` package is installed and zlib otherwise, primed with a shared
+dictionary of phrases that recur in plans, research, diagrams and documents;
+the dictionary id is stored with each value so it can change without
+breaking older records.
+"""
+
+import base64
+import zlib
+from typing import Any, Optional
+
+from config import TEXT_COMPRESSION, TEXT_COMPRESSION_MIN_CHARS
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+MARKER = "__codec__"
+
+# Shared dictionaries by id. Never edit one in place: add a new id instead.
+DICTIONARIES = {
+    "d1": (
+        "## Introduction\n## Overview\n## Summary\n## Conclusion\n## Key Points\n## Next Steps\n"
+        "### Architecture\n### Implementation\n### Components\n### Benefits\n### Challenges\n"
+        "```mermaid\ngraph TD\nflowchart TD\nsequenceDiagram\n    participant \n    A --> B\n-->|\n```\n"
+        "- **\n**: \n1. \n2. \n3. \n\n"
+        "The following \n This document \n In this section, \n for example, \n such as \n"
+        " and the \n of the \n to the \n in the \n with the \n that the \n is a \n can be \n"
+        "research findings \n technical \n architecture \n implementation \n performance \n"
+        "confidence \n hallucination \n source \n evidence \n according to \n"
+        '{"summary": "\n{"results": [\n{"goal": "\n{"tasks": [\n"assigned_agent": "\n"description": "\n'
+    ).encode("utf-8"),
+}
+CURRENT_DICTIONARY = "d1"
+
+# Keys that stay plain: they are queried, sorted on, or needed to read the record.
+# A document delta (see doc_versions.py) is already compressed when that is on.
+_PLAIN_KEYS = {"session_id", "type", "created_at", "status", "encoding", "codec", "version", "delta", "_id"}
+
+
+def resolve_algorithm(name: Optional[str]) -> Optional[str]:
+    """Normalize a configured algorithm: zstd (falls back to zlib), zlib, or None."""
+    name = (name or "none").strip().lower()
+    if name == "zstd":
+        return "zstd" if ZSTD_AVAILABLE else "zlib"
+    if name == "zlib":
+        return "zlib"
+    return None
+
+
+def compress_bytes(raw: bytes, algorithm: str, dictionary: Optional[str] = None) -> bytes:
+    zdict = DICTIONARIES[dictionary] if dictionary else None
+    if algorithm == "zstd":
+        dict_data = zstandard.ZstdCompressionDict(zdict, dict_type=zstandard.DICT_TYPE_RAWCONTENT) if zdict else None
+        return zstandard.ZstdCompressor(level=6, dict_data=dict_data).compress(raw)
+    compressor = zlib.compressobj(6, zdict=zdict) if zdict else zlib.compressobj(6)
+    return compressor.compress(raw) + compressor.flush()
+
+
+def decompress_bytes(packed: bytes, algorithm: str, dictionary: Optional[str] = None) -> bytes:
+    zdict = DICTIONARIES[dictionary] if dictionary else None
+    if algorithm == "zstd":
+        dict_data = zstandard.ZstdCompressionDict(zdict, dict_type=zstandard.DICT_TYPE_RAWCONTENT) if zdict else None
+        return zstandard.ZstdDecompressor(dict_data=dict_data).decompress(packed)
+    decompressor = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+    return decompressor.decompress(packed) + decompressor.flush()
+
+
+class TextCodec:
+    """Compresses large string fields of a record, recursively.
+
+    With `binary=True` the compressed bytes are stored as-is (MongoDB, memory);
+    otherwise they are base64 text so the record stays JSON-serializable
+    (SQLite JSON columns).
+    """
+
+    def __init__(
+        self,
+        algorithm: Optional[str] = TEXT_COMPRESSION,
+        min_chars: int = TEXT_COMPRESSION_MIN_CHARS,
+        binary: bool = True,
+    ):
+        self.algorithm = resolve_algorithm(algorithm)
+        self.min_chars = max(64, int(min_chars))
+        self.binary = binary
+        self._counters = {"compressed": 0, "raw_bytes": 0, "stored_bytes": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.algorithm is not None
+
+    def _pack(self, text: str) -> Any:
+        raw = text.encode("utf-8")
+        packed = compress_bytes(raw, self.algorithm, CURRENT_DICTIONARY)
+        if len(packed) >= len(raw):
+            return text
+        self._counters["compressed"] += 1
+        self._counters["raw_bytes"] += len(raw)
+        self._counters["stored_bytes"] += len(packed)
+        data = packed if self.binary else base64.b64encode(packed).decode("ascii")
+        return {MARKER: f"{self.algorithm}:{CURRENT_DICTIONARY}", "data": data}
+
+    def encode(self, value: Any, key: Optional[str] = None) -> Any:
+        """Copy of `value` with large strings compressed (the input is not modified)."""
+        if not self.enabled or key in _PLAIN_KEYS:
+            return value
+        if isinstance(value, str):
+            if len(value) < self.min_chars:
+                return value
+            return self._pack(value)
+        if isinstance(value, dict):
+            return {k: self.encode(v, k) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.encode(v) for v in value]
+        return value
+
+    def stats(self) -> dict:
+        ratio = self._counters["stored_bytes"] / self._counters["raw_bytes"] if self._counters["raw_bytes"] else 0.0
+        return {"algorithm": self.algorithm, "min_chars": self.min_chars, **self._counters, "ratio": round(ratio, 3)}
+
+
+def decode(value: Any) -> Any:
+    """Restore compressed strings. Values without markers come back unchanged.
+
+    Works regardless of the current settings, so data written with compression
+    stays readable after it is turned off.
+    """
+    if isinstance(value, dict):
+        if MARKER in value:
+            algorithm, _, dictionary = str(value[MARKER]).partition(":")
+            data = value.get("data")
+            packed = base64.b64decode(data) if isinstance(data, str) else bytes(data)
+            return decompress_bytes(packed, algorithm, dictionary or None).decode("utf-8")
+        if not any(isinstance(v, (dict, list)) for v in value.values()):
+            return value
+        return {k: decode(v) for k, v in value.items()}
+    if isinstance(value, list):
+        if not any(isinstance(v, (dict, list)) for v in value):
+            return value
+        return [decode(v) for v in value]
+    return value
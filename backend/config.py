@@ -43,10 +43,234 @@ try:
 except Exception:
 	GROQ_MIN_INTERVAL_SECONDS = 0.0
 
+# Per-key budgets for the token-bucket scheduler (each key is paced on its own,
+# so calls on different keys run in parallel). Refined from x-ratelimit-* headers.
+try:
+	GROQ_RPM_PER_KEY = int(os.getenv("GROQ_RPM_PER_KEY", "30"))
+	GROQ_TPM_PER_KEY = int(os.getenv("GROQ_TPM_PER_KEY", "6000"))
+	GROQ_MAX_CONCURRENCY_PER_KEY = int(os.getenv("GROQ_MAX_CONCURRENCY_PER_KEY", "1"))
+	GROQ_EXPECTED_COMPLETION_TOKENS = int(os.getenv("GROQ_EXPECTED_COMPLETION_TOKENS", "512"))
+except Exception:
+	GROQ_RPM_PER_KEY = 30
+	GROQ_TPM_PER_KEY = 6000
+	GROQ_MAX_CONCURRENCY_PER_KEY = 1
+	GROQ_EXPECTED_COMPLETION_TOKENS = 512
+
+# Key health: a key that gets a 429 (or keeps failing) is skipped until its
+# reset window passes. Optional hedging sends a second request on another key
+# when a call runs past that key's observed p95 latency.
+GROQ_HEDGE_ENABLED = os.getenv("GROQ_HEDGE_ENABLED", "false").strip().lower() in {"1", "true", "yes", "y"}
+try:
+	GROQ_CIRCUIT_COOLDOWN_SECONDS = float(os.getenv("GROQ_CIRCUIT_COOLDOWN_SECONDS", "30"))
+	GROQ_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("GROQ_CIRCUIT_FAILURE_THRESHOLD", "3"))
+	GROQ_HEDGE_MIN_SAMPLES = int(os.getenv("GROQ_HEDGE_MIN_SAMPLES", "10"))
+except Exception:
+	GROQ_CIRCUIT_COOLDOWN_SECONDS = 30.0
+	GROQ_CIRCUIT_FAILURE_THRESHOLD = 3
+	GROQ_HEDGE_MIN_SAMPLES = 10
+
 # Model selection for different purposes
 GROQ_VALIDATION_MODEL = os.getenv("GROQ_VALIDATION_MODEL", "llama-3.1-8b-instant")
 
+# Shared HTTP connection pool for LLM providers (opened on server startup).
+# HTTP/2 is used when the optional `h2` package is installed.
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").strip().lower() in {"1", "true", "yes", "y"}
+try:
+	HTTP_POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "20"))
+	HTTP_POOL_MAX_KEEPALIVE = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "10"))
+	HTTP_POOL_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_POOL_KEEPALIVE_EXPIRY", "60"))
+	GROQ_TIMEOUT_SECONDS = float(os.getenv("GROQ_TIMEOUT_SECONDS", "30"))
+except Exception:
+	HTTP_POOL_MAX_CONNECTIONS = 20
+	HTTP_POOL_MAX_KEEPALIVE = 10
+	HTTP_POOL_KEEPALIVE_EXPIRY = 60.0
+	GROQ_TIMEOUT_SECONDS = 30.0
+
+# Optional response cache in front of call_llm (memory LRU + SQLite file).
+# Set LLM_CACHE_PATH to an empty value for a memory-only cache.
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").strip().lower() in {"1", "true", "yes", "y"}
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3").strip() or None
+try:
+	LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+	LLM_CACHE_MEMORY_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_MAX_ENTRIES", "512"))
+	LLM_CACHE_DISK_MAX_ENTRIES = int(os.getenv("LLM_CACHE_DISK_MAX_ENTRIES", "10000"))
+except Exception:
+	LLM_CACHE_TTL_SECONDS = 86400.0
+	LLM_CACHE_MEMORY_MAX_ENTRIES = 512
+	LLM_CACHE_DISK_MAX_ENTRIES = 10000
+
+# Coalesce identical in-flight LLM requests into one upstream call.
+LLM_SINGLE_FLIGHT = os.getenv("LLM_SINGLE_FLIGHT", "true").strip().lower() in {"1", "true", "yes", "y"}
+
+# Background job mode for /jobs: worker pool size, max queued jobs and how
+# long finished jobs stay available for polling.
+try:
+	JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+	JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "100"))
+	JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+except Exception:
+	JOB_WORKERS = 2
+	JOB_QUEUE_MAX = 100
+	JOB_RETENTION_SECONDS = 3600.0
+
+# Admission control in front of the orchestrator: at most N pipelines run at
+# once, a bounded number wait (for at most ADMISSION_MAX_QUEUE_SECONDS), and
+# everything beyond that is rejected fast with 429/503 + Retry-After.
+try:
+	ADMISSION_MAX_CONCURRENT_RUNS = int(os.getenv("ADMISSION_MAX_CONCURRENT_RUNS", "4"))
+	ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "16"))
+	ADMISSION_MAX_QUEUE_SECONDS = float(os.getenv("ADMISSION_MAX_QUEUE_SECONDS", "30"))
+except Exception:
+	ADMISSION_MAX_CONCURRENT_RUNS = 4
+	ADMISSION_MAX_QUEUE = 16
+	ADMISSION_MAX_QUEUE_SECONDS = 30.0
+
+# Quality gate after validation in the LangGraph pipeline: a draft at or above
+# QUALITY_ACCEPT_CONFIDENCE with risk below QUALITY_ACCEPT_MAX_RISK skips the
+# Reviewer; one below QUALITY_REWRITE_BELOW_CONFIDENCE goes back to the Writer
+# (at most QUALITY_MAX_WRITER_PASSES drafts in total); anything else is reviewed.
+try:
+	QUALITY_ACCEPT_CONFIDENCE = int(os.getenv("QUALITY_ACCEPT_CONFIDENCE", "90"))
+	QUALITY_ACCEPT_MAX_RISK = int(os.getenv("QUALITY_ACCEPT_MAX_RISK", "40"))
+	QUALITY_REWRITE_BELOW_CONFIDENCE = int(os.getenv("QUALITY_REWRITE_BELOW_CONFIDENCE", "50"))
+	QUALITY_MAX_WRITER_PASSES = int(os.getenv("QUALITY_MAX_WRITER_PASSES", "2"))
+except Exception:
+	QUALITY_ACCEPT_CONFIDENCE = 90
+	QUALITY_ACCEPT_MAX_RISK = 40
+	QUALITY_REWRITE_BELOW_CONFIDENCE = 50
+	QUALITY_MAX_WRITER_PASSES = 2
+
+# In-memory store (used when MongoDB is not configured): at most
+# MEMORY_MAX_SESSIONS sessions are kept, finished ones evicted least recently
+# used first, and sessions idle for MEMORY_SESSION_MAX_AGE_SECONDS are dropped.
+try:
+	MEMORY_MAX_SESSIONS = int(os.getenv("MEMORY_MAX_SESSIONS", "1000"))
+	MEMORY_SESSION_MAX_AGE_SECONDS = float(os.getenv("MEMORY_SESSION_MAX_AGE_SECONDS", "86400"))
+except Exception:
+	MEMORY_MAX_SESSIONS = 1000
+	MEMORY_SESSION_MAX_AGE_SECONDS = 86400.0
+
 MONGO_URI = os.getenv("MONGO_URI")
+
+# Durable single-node store used instead of the in-memory one when MongoDB is
+# not configured: path of the SQLite file (empty keeps the in-memory store) and
+# the size of the thread pool that runs its queries.
+SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", "").strip() or None
+try:
+	SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "4"))
+except Exception:
+	SQLITE_POOL_SIZE = 4
+
+# Write-behind for MongoDB saves: records are buffered and written with
+# insert_many once MONGO_WRITE_BATCH_SIZE are pending or after
+# MONGO_WRITE_FLUSH_SECONDS, and always at the end of a run and on shutdown.
+MONGO_WRITE_BEHIND = os.getenv("MONGO_WRITE_BEHIND", "false").strip().lower() in {"1", "true", "yes", "y"}
+try:
+	MONGO_WRITE_BATCH_SIZE = int(os.getenv("MONGO_WRITE_BATCH_SIZE", "50"))
+	MONGO_WRITE_FLUSH_SECONDS = float(os.getenv("MONGO_WRITE_FLUSH_SECONDS", "0.5"))
+except Exception:
+	MONGO_WRITE_BATCH_SIZE = 50
+	MONGO_WRITE_FLUSH_SECONDS = 0.5
+
+# Opt-in compression of large text fields (research, diagrams, documents) in
+# MemoryStore: none | zlib | zstd (zstd needs the zstandard package), applied to
+# strings of at least TEXT_COMPRESSION_MIN_CHARS characters.
+TEXT_COMPRESSION = os.getenv("TEXT_COMPRESSION", "none").strip().lower()
+try:
+	TEXT_COMPRESSION_MIN_CHARS = int(os.getenv("TEXT_COMPRESSION_MIN_CHARS", "1024"))
+except Exception:
+	TEXT_COMPRESSION_MIN_CHARS = 1024
+
+# Document version history: each saved version is a line-level delta against
+# the previous one, with a full keyframe every DOC_KEYFRAME_INTERVAL versions.
+# DOC_DELTA_COMPRESSION: none | zlib | zstd (zstd needs the zstandard package).
+DOC_DELTA_ENABLED = os.getenv("DOC_DELTA_ENABLED", "true").strip().lower() in {"1", "true", "yes", "y"}
+DOC_DELTA_COMPRESSION = os.getenv("DOC_DELTA_COMPRESSION", "none").strip().lower()
+try:
+	DOC_KEYFRAME_INTERVAL = int(os.getenv("DOC_KEYFRAME_INTERVAL", "8"))
+except Exception:
+	DOC_KEYFRAME_INTERVAL = 8
+
+# MongoDB index provisioning at startup. MONGO_RETENTION_DAYS > 0 also adds a
+# TTL index on created_at so old runs expire automatically (0 keeps everything).
+MONGO_ENSURE_INDEXES = os.getenv("MONGO_ENSURE_INDEXES", "true").strip().lower() in {"1", "true", "yes", "y"}
+try:
+	MONGO_RETENTION_DAYS = float(os.getenv("MONGO_RETENTION_DAYS", "0"))
+except Exception:
+	MONGO_RETENTION_DAYS = 0.0
+
+# Research fan-out (opt-in): with RESEARCH_MAX_SUBQUERIES above 1 the topic is
+# split into at most that many sub-queries that are searched and summarized
+# concurrently, then merged with prompts of at most RESEARCH_REDUCE_TOKEN_BUDGET
+# estimated tokens each. It costs a split call, one summary per sub-query and
+# merge calls instead of a single summary, so it is off by default.
+try:
+	RESEARCH_MAX_SUBQUERIES = int(os.getenv("RESEARCH_MAX_SUBQUERIES", "1"))
+	RESEARCH_REDUCE_TOKEN_BUDGET = int(os.getenv("RESEARCH_REDUCE_TOKEN_BUDGET", "3000"))
+except Exception:
+	RESEARCH_MAX_SUBQUERIES = 1
+	RESEARCH_REDUCE_TOKEN_BUDGET = 3000
+
+# Stage DAG of an Orchestrator iteration (see pipeline.py): nodes whose inputs
+# are ready run concurrently, up to PIPELINE_PARALLELISM at a time, each with a
+# timeout (0 = none) and retries. By default the Developer runs alongside
+# Research using the previous iteration's research (none on the first pass);
+# PIPELINE_DEVELOPER_WAITS_FOR_RESEARCH makes it wait for this iteration's.
+PIPELINE_DEVELOPER_WAITS_FOR_RESEARCH = os.getenv("PIPELINE_DEVELOPER_WAITS_FOR_RESEARCH", "false").strip().lower() in {"1", "true", "yes", "y"}
+try:
+	PIPELINE_PARALLELISM = int(os.getenv("PIPELINE_PARALLELISM", "4"))
+	PIPELINE_NODE_TIMEOUT_SECONDS = float(os.getenv("PIPELINE_NODE_TIMEOUT_SECONDS", "0"))
+	PIPELINE_NODE_RETRIES = int(os.getenv("PIPELINE_NODE_RETRIES", "0"))
+except Exception:
+	PIPELINE_PARALLELISM = 4
+	PIPELINE_NODE_TIMEOUT_SECONDS = 0.0
+	PIPELINE_NODE_RETRIES = 0
+
+# Run deadlines: RUN_DEADLINE_SECONDS (0 = none) applies when a request does
+# not send an X-Run-Deadline header (seconds); requested deadlines are capped at
+# RUN_DEADLINE_MAX_SECONDS. Optional stages (research, developer, scoring,
+# refinement, review) only start when DEADLINE_STAGE_SECONDS per remaining
+# stage is left, and every LLM call is cut off at the deadline.
+try:
+	RUN_DEADLINE_SECONDS = float(os.getenv("RUN_DEADLINE_SECONDS", "0"))
+	RUN_DEADLINE_MAX_SECONDS = float(os.getenv("RUN_DEADLINE_MAX_SECONDS", "600"))
+	DEADLINE_STAGE_SECONDS = float(os.getenv("DEADLINE_STAGE_SECONDS", "10"))
+except Exception:
+	RUN_DEADLINE_SECONDS = 0.0
+	RUN_DEADLINE_MAX_SECONDS = 600.0
+	DEADLINE_STAGE_SECONDS = 10.0
+
+# Quality tiers: fast (combined CEO+Research and Writer only), standard, or
+# thorough (more refinement). TIER_DEFAULT applies when a request names none.
+# With TIER_AUTO_DOWNGRADE (opt-in), new runs are capped at standard / fast once that
+# many runs are waiting for a slot (TIER_STANDARD_AT_QUEUE_DEPTH /
+# TIER_FAST_AT_QUEUE_DEPTH) or no LLM key has budget for that many seconds
+# (TIER_STANDARD_AT_BUDGET_SECONDS / TIER_FAST_AT_BUDGET_SECONDS).
+TIER_DEFAULT = os.getenv("TIER_DEFAULT", "standard").strip().lower()
+TIER_AUTO_DOWNGRADE = os.getenv("TIER_AUTO_DOWNGRADE", "false").strip().lower() in {"1", "true", "yes", "y"}
+try:
+	TIER_STANDARD_AT_QUEUE_DEPTH = int(os.getenv("TIER_STANDARD_AT_QUEUE_DEPTH", "1"))
+	TIER_FAST_AT_QUEUE_DEPTH = int(os.getenv("TIER_FAST_AT_QUEUE_DEPTH", "4"))
+	TIER_STANDARD_AT_BUDGET_SECONDS = float(os.getenv("TIER_STANDARD_AT_BUDGET_SECONDS", "2"))
+	TIER_FAST_AT_BUDGET_SECONDS = float(os.getenv("TIER_FAST_AT_BUDGET_SECONDS", "10"))
+	TIER_THOROUGH_MAX_ITERATIONS = int(os.getenv("TIER_THOROUGH_MAX_ITERATIONS", "5"))
+except Exception:
+	TIER_STANDARD_AT_QUEUE_DEPTH = 1
+	TIER_FAST_AT_QUEUE_DEPTH = 4
+	TIER_STANDARD_AT_BUDGET_SECONDS = 2.0
+	TIER_FAST_AT_BUDGET_SECONDS = 10.0
+	TIER_THOROUGH_MAX_ITERATIONS = 5
+
+# HTTP response compression: gzip | none, for bodies of at least
+# RESPONSE_COMPRESSION_MIN_BYTES when the client sends Accept-Encoding: gzip.
+# The SSE stream is never compressed so events are not held back.
+RESPONSE_COMPRESSION = os.getenv("RESPONSE_COMPRESSION", "gzip").strip().lower()
+try:
+	RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+	RESPONSE_COMPRESSION_LEVEL = int(os.getenv("RESPONSE_COMPRESSION_LEVEL", "6"))
+except Exception:
+	RESPONSE_COMPRESSION_MIN_BYTES = 1024
+	RESPONSE_COMPRESSION_LEVEL = 6
 # GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 # GEMINI_API_KEY_2 = os.getenv("GEMINI_API_KEY_2")
 #
@@ -0,0 +1,65 @@
+"""Per-run deadlines, carried through the pipeline in a ContextVar.
+
+A run sets its deadline once (from the `X-Run-Deadline` header or
+RUN_DEADLINE_SECONDS); orchestrators check `has_time` before optional stages
+and `call_llm` caps each call at the time left. Like the event emitter, the
+value is copied into every task the run starts, so concurrent runs never
+share a deadline and code without one pays nothing.
+"""
+
+import time
+from contextvars import ContextVar
+from typing import List, Optional
+
+from config import DEADLINE_STAGE_SECONDS, RUN_DEADLINE_MAX_SECONDS, RUN_DEADLINE_SECONDS
+
+_deadline: ContextVar[Optional[float]] = ContextVar("run_deadline", default=None)
+# Stages skipped to stay within the deadline (shared by the run's tasks).
+_skipped: ContextVar[Optional[List[str]]] = ContextVar("run_deadline_skipped", default=None)
+
+
+def resolve_seconds(requested=None) -> Optional[float]:
+    """Deadline for a run: the requested seconds (capped), else the configured default. None: no deadline."""
+    try:
+        seconds = float(requested) if requested not in (None, "") else RUN_DEADLINE_SECONDS
+    except (TypeError, ValueError):
+        seconds = RUN_DEADLINE_SECONDS
+    if not seconds or seconds <= 0:
+        return None
+    if RUN_DEADLINE_MAX_SECONDS > 0:
+        seconds = min(seconds, RUN_DEADLINE_MAX_SECONDS)
+    return seconds
+
+
+def set_deadline(seconds: Optional[float]):
+    """Start the current run's deadline `seconds` from now (None: no deadline)."""
+    _skipped.set([])
+    return _deadline.set(time.monotonic() + seconds if seconds else None)
+
+
+def reset_deadline(token) -> None:
+    _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the deadline (may be negative), or None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def has_time(stages: int = 1) -> bool:
+    """Whether `stages` more LLM-backed stages fit in the time left."""
+    left = remaining()
+    return left is None or left >= stages * DEADLINE_STAGE_SECONDS
+
+
+def skip(stage: str) -> None:
+    """Record a stage skipped (or cut short) because the deadline was near."""
+    skipped = _skipped.get()
+    if skipped is not None and stage not in skipped:
+        skipped.append(stage)
+    print(f"⏰ Run deadline near. Skipping {stage}.")
+
+
+def skipped_stages() -> List[str]:
+    return list(_skipped.get() or [])
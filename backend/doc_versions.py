@@ -0,0 +1,153 @@
+"""Document version history stored as keyframes plus line-level deltas.
+
+Every refinement pass and every review saves a new version of a session's
+document, and consecutive versions are nearly identical. A version is stored
+as a delta against the previous one, with a full copy (keyframe) every
+`keyframe_interval` versions or whenever the delta would not be much smaller
+than the text itself. Deltas can optionally be compressed (zstd when the
+`zstandard` package is installed, zlib otherwise).
+"""
+
+import base64
+import difflib
+import json
+from typing import Any, Dict, List, Optional
+
+from codec import MARKER, compress_bytes, decompress_bytes, resolve_algorithm
+from config import DOC_DELTA_COMPRESSION, DOC_KEYFRAME_INTERVAL
+
+FULL = "full"
+DELTA = "delta"
+# Fields only used by the stored form of a version.
+_STORAGE_FIELDS = ("encoding", "delta", "codec")
+# Store a keyframe instead when the delta is at least this share of the text.
+_MAX_DELTA_RATIO = 0.5
+
+
+def make_delta(base: str, new: str) -> List[list]:
+    """Line-level edit script turning `base` into `new`.
+
+    Ops are [0, i1, i2] (copy base lines i1:i2) and [1, text] (insert text).
+    """
+    base_lines = base.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops: List[list] = []
+    matcher = difflib.SequenceMatcher(None, base_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([0, i1, i2])
+        elif j2 > j1:
+            ops.append([1, "".join(new_lines[j1:j2])])
+    return ops
+
+
+def apply_delta(base: str, ops: List[list]) -> str:
+    base_lines = base.splitlines(keepends=True)
+    parts = []
+    for op in ops:
+        if op[0] == 0:
+            parts.extend(base_lines[op[1]:op[2]])
+        else:
+            parts.append(op[1])
+    return "".join(parts)
+
+
+def _encode(ops: List[list], codec: Optional[str]):
+    if codec is None:
+        return ops
+    packed = compress_bytes(json.dumps(ops, separators=(",", ":")).encode("utf-8"), codec)
+    # Text, not bytes, so the record stays JSON-serializable in every backend.
+    return base64.b64encode(packed).decode("ascii")
+
+
+def _decode(payload, codec: Optional[str]) -> List[list]:
+    if codec is None:
+        return payload
+    return json.loads(decompress_bytes(base64.b64decode(payload), codec))
+
+
+def pack_version(
+    document: Dict[str, Any],
+    previous: Optional[Dict[str, Any]],
+    keyframe_interval: int = DOC_KEYFRAME_INTERVAL,
+    compression: str = DOC_DELTA_COMPRESSION,
+) -> Dict[str, Any]:
+    """Stored form of `document` as the version after `previous` (a full document or None)."""
+    version = int((previous or {}).get("version", 0)) + 1
+    text = str(document.get("document", ""))
+    record = {k: v for k, v in document.items() if k not in _STORAGE_FIELDS}
+    record["version"] = version
+
+    keyframe = previous is None or (version - 1) % max(1, int(keyframe_interval)) == 0
+    if not keyframe:
+        ops = make_delta(str(previous.get("document", "")), text)
+        codec = resolve_algorithm(compression)
+        payload = _encode(ops, codec)
+        size = len(payload) if isinstance(payload, str) else len(json.dumps(ops, separators=(",", ":")))
+        if size < _MAX_DELTA_RATIO * max(1, len(text)):
+            record.pop("document", None)
+            record.update({"encoding": DELTA, "delta": payload, "codec": codec})
+            return record
+    record["encoding"] = FULL
+    return record
+
+
+def unpack_versions(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Full documents for a session's stored records, oldest first.
+
+    Records saved before versioning (no `encoding`) count as keyframes. A delta
+    whose base version is missing (no keyframe before it, or a gap in the
+    history) cannot be rebuilt and is skipped, as are the deltas after it up
+    to the next keyframe.
+    """
+    documents: List[Dict[str, Any]] = []
+    for index, record in enumerate(records):
+        doc = {k: v for k, v in record.items() if k not in _STORAGE_FIELDS}
+        doc.setdefault("version", index + 1)
+        if record.get("encoding") == DELTA:
+            base = documents[-1] if documents else None
+            if base is None or base.get("version") != doc["version"] - 1:
+                print(f"⚠️ Skipping document version {doc['version']}: its base version is missing.")
+                continue
+            doc["document"] = apply_delta(str(base.get("document", "")), _decode(record.get("delta"), record.get("codec")))
+        documents.append(doc)
+    return documents
+
+
+def chain_for(records: List[Dict[str, Any]], version: Optional[int] = None) -> List[Dict[str, Any]]:
+    """The records `unpack_versions` needs to rebuild `version` (the latest when None).
+
+    That is the last keyframe at or before it and the deltas after it, so older
+    history is neither decompressed nor replayed. Records without a version
+    get their position, as in `unpack_versions`.
+    """
+    numbered = [r if "version" in r else {**r, "version": i + 1} for i, r in enumerate(records)]
+    if version is not None:
+        numbered = [r for r in numbered if r["version"] <= version]
+    start = max((i for i, r in enumerate(numbered) if not is_delta(r)), default=0)
+    return numbered[start:]
+
+
+def is_delta(record: Optional[Dict[str, Any]]) -> bool:
+    return bool(record) and record.get("encoding") == DELTA
+
+
+def as_document(record: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """A stored keyframe (or pre-versioning record) without its storage fields."""
+    if record is None:
+        return None
+    return {k: v for k, v in record.items() if k not in _STORAGE_FIELDS}
+
+
+def describe(record: Dict[str, Any], index: int) -> Dict[str, Any]:
+    """Version metadata for listings (no document text)."""
+    stored = record.get("delta") if is_delta(record) else record.get("document", "")
+    if isinstance(stored, dict) and MARKER in stored:  # compressed text (see codec.py)
+        stored = stored.get("data") or ""
+    return {
+        "version": record.get("version", index + 1),
+        "created_at": record.get("created_at"),
+        "encoding": record.get("encoding", FULL),
+        "codec": record.get("codec"),
+        "stored_chars": len(stored) if isinstance(stored, (str, bytes)) else len(json.dumps(stored)),
+    }
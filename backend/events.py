@@ -0,0 +1,60 @@
+"""Run-scoped progress events (stage boundaries and streamed LLM tokens).
+
+An emitter is installed per run through a ContextVar, so concurrent runs
+never see each other's events and code paths without a listener pay nothing.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+Emitter = Callable[[str, dict], None]
+
+_emitter: ContextVar[Optional[Emitter]] = ContextVar("run_event_emitter", default=None)
+_current_stage: ContextVar[Optional[str]] = ContextVar("run_current_stage", default=None)
+
+
+def set_emitter(emitter: Optional[Emitter]):
+    """Install an emitter for the current context. Returns a token for `reset_emitter`."""
+    return _emitter.set(emitter)
+
+
+def reset_emitter(token) -> None:
+    _emitter.reset(token)
+
+
+def has_emitter() -> bool:
+    return _emitter.get() is not None
+
+
+def current_stage() -> Optional[str]:
+    return _current_stage.get()
+
+
+def emit(event: str, **data) -> None:
+    emitter = _emitter.get()
+    if emitter is None:
+        return
+    if "stage" not in data and _current_stage.get():
+        data["stage"] = _current_stage.get()
+    try:
+        emitter(event, data)
+    except Exception as e:
+        # A broken listener must never break the pipeline.
+        print(f"⚠️ Event emitter failed: {e}")
+
+
+@contextmanager
+def stage(name: str, **data):
+    """Mark a pipeline stage: emits start/end events and tags tokens with the stage."""
+    token = _current_stage.set(name)
+    emit("stage", stage=name, status="start", **data)
+    try:
+        yield
+    except BaseException:
+        emit("stage", stage=name, status="error")
+        raise
+    else:
+        emit("stage", stage=name, status="end")
+    finally:
+        _current_stage.reset(token)
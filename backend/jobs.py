@@ -0,0 +1,195 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Dict, Optional
+
+from config import JOB_QUEUE_MAX, JOB_RETENTION_SECONDS, JOB_WORKERS
+from events import set_emitter
+from utils import serialize_doc
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+_FINISHED = {SUCCEEDED, FAILED, CANCELLED}
+
+
+class JobQueue:
+    """Bounded background queue for pipeline runs.
+
+    `submit` returns immediately with a job id. A fixed pool of workers pulls
+    jobs in FIFO order and runs them through `runner(goal, email, tier)`. Stage
+    progress is captured from the run's stage events (see events.py).
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[str, Optional[str], Optional[str]], Awaitable[dict]],
+        workers: int = JOB_WORKERS,
+        max_queue: int = JOB_QUEUE_MAX,
+        retention_seconds: float = JOB_RETENTION_SECONDS,
+    ):
+        self.runner = runner
+        self.workers = max(1, int(workers))
+        self.max_queue = max(1, int(max_queue))
+        self.retention_seconds = float(retention_seconds)
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._jobs: "OrderedDict[str, dict]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._workers: list[asyncio.Task] = []
+        self._wait_times: deque[float] = deque(maxlen=200)
+        self._counters = {"submitted": 0, "rejected": 0, SUCCEEDED: 0, FAILED: 0, CANCELLED: 0}
+
+    # ----------------------- lifecycle -----------------------
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in list(self._tasks.values()):
+            task.cancel()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    # ------------------------ public API ----------------------
+
+    def depth(self) -> int:
+        return sum(1 for j in self._jobs.values() if j["status"] == QUEUED)
+
+    def submit(self, goal: str, email: Optional[str] = None, tier: Optional[str] = None) -> dict:
+        """Enqueue a run. Raises asyncio.QueueFull when the queue is at capacity."""
+        self._evict_finished()
+        if self.depth() >= self.max_queue:
+            self._counters["rejected"] += 1
+            raise asyncio.QueueFull(f"Job queue is full ({self.max_queue} waiting).")
+
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": QUEUED,
+            "goal": goal,
+            "email": email,
+            "tier": tier,
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "current_stage": None,
+            "stages": [],
+            "result": None,
+            "error": None,
+        }
+        self._jobs[job_id] = job
+        self._queue.put_nowait(job_id)
+        self._counters["submitted"] += 1
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        view = {k: v for k, v in job.items() if k != "email"}
+        if job["status"] == QUEUED:
+            view["position"] = self._position(job_id)
+        return view
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if job["status"] == QUEUED:
+            # The worker skips it when it is dequeued.
+            self._finish(job, CANCELLED)
+        elif job["status"] == RUNNING:
+            task = self._tasks.get(job_id)
+            if task is not None:
+                task.cancel()
+        return self.get(job_id)
+
+    def metrics(self) -> dict:
+        waits = sorted(self._wait_times)
+        return {
+            "workers": self.workers,
+            "queue_depth": self.depth(),
+            "queue_max": self.max_queue,
+            "running": len(self._tasks),
+            "wait_seconds_avg": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "wait_seconds_p95": round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0,
+            **self._counters,
+        }
+
+    # ------------------------ internals -----------------------
+
+    def _position(self, job_id: str) -> int:
+        position = 0
+        for jid, job in self._jobs.items():
+            if job["status"] == QUEUED:
+                position += 1
+                if jid == job_id:
+                    return position
+        return 0
+
+    def _finish(self, job: dict, status: str, result=None, error: str | None = None) -> None:
+        job["status"] = status
+        job["finished_at"] = time.time()
+        job["result"] = result
+        job["error"] = error
+        self._counters[status] += 1
+
+    def _evict_finished(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [jid for jid, j in self._jobs.items() if j["status"] in _FINISHED and j["finished_at"] < cutoff]:
+            del self._jobs[job_id]
+
+    def _record_event(self, job: dict, event: str, data: dict) -> None:
+        # Only stage boundaries are kept; tokens belong to /run/stream.
+        if event != "stage":
+            return
+        job["stages"].append({"stage": data.get("stage"), "status": data.get("status"), "at": time.time()})
+        if data.get("status") == "start":
+            job["current_stage"] = data.get("stage")
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] != QUEUED:
+                continue
+
+            job["status"] = RUNNING
+            job["started_at"] = time.time()
+            self._wait_times.append(job["started_at"] - job["submitted_at"])
+            task = asyncio.create_task(self._run(job))
+            self._tasks[job_id] = task
+            try:
+                await task
+            except asyncio.CancelledError:
+                if job["status"] == RUNNING:
+                    self._finish(job, CANCELLED)
+                if asyncio.current_task().cancelling():
+                    # The worker itself is being stopped.
+                    raise
+            finally:
+                self._tasks.pop(job_id, None)
+
+    async def _run(self, job: dict) -> None:
+        set_emitter(lambda event, data: self._record_event(job, event, data))
+        try:
+            result = await self.runner(job["goal"], job["email"], job["tier"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._finish(job, FAILED, error=str(e))
+            return
+
+        message = str((result or {}).get("message", "")) if isinstance(result, dict) else ""
+        if "__LLM_RATE_LIMITED__" in message:
+            self._finish(job, FAILED, result=serialize_doc(result), error="LLM_RATE_LIMITED")
+        else:
+            self._finish(job, SUCCEEDED, result=serialize_doc(result))
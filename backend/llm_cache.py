@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from config import (
+    LLM_CACHE_DISK_MAX_ENTRIES,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_MEMORY_MAX_ENTRIES,
+    LLM_CACHE_PATH,
+    LLM_CACHE_TTL_SECONDS,
+)
+
+# Router sentinels are transient failures and must never be cached.
+LLM_SENTINELS = ("__LLM_RATE_LIMITED__", "__LLM_UNAVAILABLE__")
+
+
+def is_sentinel(result) -> bool:
+    text = str(result or "")
+    return not text or any(s in text for s in LLM_SENTINELS)
+
+
+def make_cache_key(provider: str, model: str, system: str | None, prompt: str) -> str:
+    h = hashlib.sha256()
+    for part in (provider, model, system or "", prompt or ""):
+        h.update(str(part).encode("utf-8"))
+        # Separator so ("ab", "c") and ("a", "bc") hash differently.
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class LLMCache:
+    """Two-tier response cache: in-memory LRU in front of an optional SQLite file.
+
+    Entries expire after `ttl` seconds. Each tier is bounded by entry count and
+    evicts least-recently-used entries first.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = LLM_CACHE_PATH,
+        ttl: float = LLM_CACHE_TTL_SECONDS,
+        memory_max_entries: int = LLM_CACHE_MEMORY_MAX_ENTRIES,
+        disk_max_entries: int = LLM_CACHE_DISK_MAX_ENTRIES,
+    ):
+        self.ttl = float(ttl)
+        self.memory_max_entries = max(1, int(memory_max_entries))
+        self.disk_max_entries = max(1, int(disk_max_entries))
+        self._memory: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._disk_writes = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache(accessed_at)")
+            self._db.commit()
+
+    # ----------------------- memory tier -----------------------
+
+    def _memory_get(self, key: str, now: float) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        created_at, value = entry
+        if now - created_at > self.ttl:
+            del self._memory[key]
+            self._counters["expired"] += 1
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _memory_set(self, key: str, value: str, created_at: float) -> None:
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_max_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    # ------------------------ disk tier ------------------------
+
+    def _disk_get(self, key: str, now: float) -> Optional[tuple[float, str]]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl:
+                self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._db.commit()
+                self._counters["expired"] += 1
+                return None
+            self._db.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            return created_at, value
+
+    def _disk_set(self, key: str, value: str, now: float) -> None:
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._disk_writes += 1
+            # Trim periodically instead of on every write.
+            if self._disk_writes % 50 == 0:
+                self._disk_trim(now)
+            self._db.commit()
+
+    def _disk_trim(self, now: float) -> None:
+        cur = self._db.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+        self._counters["expired"] += max(0, cur.rowcount)
+        cur = self._db.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            " SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.disk_max_entries,),
+        )
+        self._counters["evictions"] += max(0, cur.rowcount)
+
+    def _disk_count(self) -> int:
+        with self._db_lock:
+            return int(self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0])
+
+    # ------------------------ public API -----------------------
+
+    async def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is not None:
+            self._counters["memory_hits"] += 1
+            return value
+
+        if self._db is not None:
+            found = await asyncio.to_thread(self._disk_get, key, now)
+            if found is not None:
+                created_at, value = found
+                self._memory_set(key, value, created_at)
+                self._counters["disk_hits"] += 1
+                return value
+
+        self._counters["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: str) -> None:
+        if is_sentinel(value):
+            return
+        now = time.time()
+        self._memory_set(key, value, now)
+        self._counters["stores"] += 1
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_set, key, value, now)
+
+    async def stats(self) -> dict:
+        hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+        lookups = hits + self._counters["misses"]
+        stats = {
+            "enabled": True,
+            **self._counters,
+            "hits": hits,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_max_entries": self.memory_max_entries,
+        }
+        if self._db is not None:
+            stats["disk_entries"] = await asyncio.to_thread(self._disk_count)
+            stats["disk_max_entries"] = self.disk_max_entries
+        return stats
+
+    def close(self) -> None:
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
+
+
+llm_cache = LLMCache() if LLM_CACHE_ENABLED else None
@@ -1,13 +1,20 @@
 import httpx
 import asyncio
-import time
 import certifi
+import json
+import time
 
 from config import (
     GROQ_API_KEYS,
+    GROQ_HEDGE_ENABLED,
     GROQ_KEY_STRATEGY,
-    GROQ_MIN_INTERVAL_SECONDS,
+    GROQ_TIMEOUT_SECONDS,
     GROQ_VALIDATION_MODEL,
+    HTTP2_ENABLED,
+    HTTP_POOL_KEEPALIVE_EXPIRY,
+    HTTP_POOL_MAX_CONNECTIONS,
+    HTTP_POOL_MAX_KEEPALIVE,
+    LLM_SINGLE_FLIGHT,
     LLM_PROVIDER,
     LLM_GENERATION_PROVIDER,
     LLM_VALIDATION_PROVIDER,
@@ -16,49 +23,91 @@ try:
     from google.genai import Client as GeminiClient
 except Exception:
     GeminiClient = None
+from rate_limiter import estimate_tokens, groq_limiter
+from llm_cache import is_sentinel, llm_cache, make_cache_key
+from events import emit, has_emitter
+import deadline
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    H2_AVAILABLE = True
+except ImportError:
+    H2_AVAILABLE = False
 
 # --------------------------------------------------
 # Limit concurrent LLM calls (VERY IMPORTANT)
 # --------------------------------------------------
+# Gemini has no per-key scheduler yet, so it stays strictly serialized.
+# Groq calls are paced per key by `groq_limiter` (see rate_limiter.py).
 LLM_SEMAPHORE = asyncio.Semaphore(1)  # strict to avoid rate limits
 
-# Global Groq pacing (prevents bursts when multiple agents call sequentially)
-_groq_pace_lock = asyncio.Lock()
-_groq_last_request_at = 0.0
-
 # Key rotation tracker for load balancing across all 3 keys
 _groq_key_rotation_index = 0
-_groq_last_request_at = 0.0
-
 
-async def _pace_groq_requests() -> None:
-    global _groq_last_request_at
-    min_interval = float(GROQ_MIN_INTERVAL_SECONDS or 0.0)
-    if min_interval <= 0:
-        return
 
-    async with _groq_pace_lock:
-        now = time.monotonic()
-        wait = (_groq_last_request_at + min_interval) - now
-        if wait > 0:
-            await asyncio.sleep(wait)
-        _groq_last_request_at = time.monotonic()
+def _order_groq_keys(keys: list[str], est_tokens: int = 0) -> list[str]:
+    """Candidate keys for one call, healthiest first.
 
-
-def _get_next_groq_key(keys: list[str]) -> str:
-    """Round-robin key selection for rotation strategy."""
+    Keys whose circuit is open (throttled) are left out. With the rotation
+    strategy the starting key still rotates, so equally healthy keys share load.
+    """
     global _groq_key_rotation_index
     if not keys:
         raise RuntimeError("No Groq API keys available")
-    
+
     if GROQ_KEY_STRATEGY.strip().lower() == "rotation":
-        # Rotate through all keys
-        key = keys[_groq_key_rotation_index % len(keys)]
+        start = _groq_key_rotation_index % len(keys)
         _groq_key_rotation_index += 1
-        return key
-    else:
-        # Default: use first key
-        return keys[0]
+        keys = keys[start:] + keys[:start]
+    return groq_limiter.rank(keys, est_tokens)
+
+
+# --------------------------------------------------
+# Shared HTTP connection pools (one per provider)
+# --------------------------------------------------
+_http_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=HTTP_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_POOL_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        timeout=GROQ_TIMEOUT_SECONDS,
+        # Use certifi CA bundle for proper SSL verification (loaded once per pool)
+        verify=certifi.where(),
+        limits=limits,
+        http2=HTTP2_ENABLED and H2_AVAILABLE,
+    )
+
+
+def get_http_client(provider: str = "groq") -> httpx.AsyncClient:
+    """Return the long-lived client for a provider, creating it on first use."""
+    client = _http_clients.get(provider)
+    if client is None or client.is_closed:
+        client = _build_http_client()
+        _http_clients[provider] = client
+    return client
+
+
+async def open_http_clients(providers: tuple[str, ...] = ("groq",)) -> None:
+    """Create provider pools up front (called on server startup)."""
+    for provider in providers:
+        get_http_client(provider)
+    if HTTP2_ENABLED and not H2_AVAILABLE:
+        print("ℹ️ HTTP/2 requested but `h2` is not installed. Using HTTP/1.1 keep-alive.")
+
+
+async def close_http_clients() -> None:
+    """Close all provider pools (called on server shutdown)."""
+    clients = list(_http_clients.values())
+    _http_clients.clear()
+    for client in clients:
+        try:
+            await client.aclose()
+        except Exception:
+            pass
 
 
 # --------------------------------------------------
@@ -76,7 +125,54 @@ def _get_next_groq_key(keys: list[str]) -> str:
 # --------------------------------------------------
 # Groq call with retry
 # --------------------------------------------------
-async def call_groq(prompt: str, system: str = None, retries: int = 1, api_key: str | None = None, model: str = "llama-3.1-8b-instant"):
+async def _read_groq_stream(response: httpx.Response) -> tuple[str, dict | None]:
+    """Consume a Groq SSE chat stream, emitting each token as a `token` event."""
+    parts: list[str] = []
+    usage = None
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        payload = line[len("data:"):].strip()
+        if payload == "[DONE]":
+            break
+        try:
+            chunk = json.loads(payload)
+        except ValueError:
+            continue
+        # Groq reports usage on the final chunk under `x_groq`.
+        usage = (chunk.get("x_groq") or {}).get("usage") or chunk.get("usage") or usage
+        choices = chunk.get("choices") or [{}]
+        text = (choices[0].get("delta") or {}).get("content")
+        if text:
+            parts.append(text)
+            emit("token", text=text)
+    return "".join(parts), usage
+
+
+async def _send_groq_request(url: str, headers: dict, body: dict, budget, est_tokens: int, stream: bool) -> str:
+    client = get_http_client("groq")
+    if stream:
+        async with client.stream("POST", url, headers=headers, json={**body, "stream": True}) as response:
+            if not response.is_success:
+                budget.observe_headers(response.headers)
+                await response.aread()
+                response.raise_for_status()
+            text, usage = await _read_groq_stream(response)
+            budget.observe_usage(est_tokens, (usage or {}).get("total_tokens"))
+            budget.observe_headers(response.headers)
+            return text
+
+    response = await client.post(url, headers=headers, json=body)
+    data = response.json() if response.is_success else {}
+    budget.observe_usage(est_tokens, (data.get("usage") or {}).get("total_tokens"))
+    # Headers are authoritative, so apply them after the local reconcile.
+    budget.observe_headers(response.headers)
+    response.raise_for_status()
+    return data["choices"][0]["message"]["content"]
+
+
+async def call_groq(prompt: str, system: str = None, retries: int = 1, api_key: str | None = None, model: str = "llama-3.1-8b-instant", stream: bool = False, sent: asyncio.Event | None = None):
+    """`sent`, when given, is set once the request holds its limiter slot and goes out."""
     url = "https://api.groq.com/openai/v1/chat/completions"
     if not api_key:
         raise RuntimeError("Groq API key not configured")
@@ -95,14 +191,23 @@ async def call_groq(prompt: str, system: str = None, retries: int = 1, api_key:
         "messages": messages
     }
 
+    est_tokens = estimate_tokens(prompt, system)
     for attempt in range(retries):
         try:
-            await _pace_groq_requests()
-            # Use certifi CA bundle for proper SSL verification
-            async with httpx.AsyncClient(timeout=30, verify=certifi.where()) as client:
-                response = await client.post(url, headers=headers, json=body)
-                response.raise_for_status()
-                return response.json()["choices"][0]["message"]["content"]
+            async with groq_limiter.slot(api_key, est_tokens) as budget:
+                started = time.monotonic()
+                if sent is not None:
+                    sent.set()
+                try:
+                    text = await _send_groq_request(url, headers, body, budget, est_tokens, stream)
+                except httpx.HTTPStatusError as e:
+                    budget.record_failure(e.response.status_code)
+                    raise
+                except httpx.HTTPError:
+                    budget.record_failure()
+                    raise
+                budget.record_success(time.monotonic() - started)
+                return text
 
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 429 and attempt < retries - 1:
@@ -114,6 +219,54 @@ async def call_groq(prompt: str, system: str = None, retries: int = 1, api_key:
             raise
 
 
+# --------------------------------------------------
+# Hedged Groq call (tail-latency cut for long outputs)
+# --------------------------------------------------
+hedge_stats = {"hedged": 0, "hedge_wins": 0}
+
+
+async def _call_groq_hedged(prompt: str, system: str | None, model: str, key: str, backup_keys: list[str], stream: bool = False):
+    """Call Groq on `key`. If it runs past that key's p95 latency, race a second
+    request on the healthiest backup key and return whichever succeeds first."""
+    delay = groq_limiter.budget(key).p95_latency()
+    if not GROQ_HEDGE_ENABLED or stream or not backup_keys or delay is None:
+        return await call_groq(prompt, system, retries=1, api_key=key, model=model, stream=stream)
+
+    sent = asyncio.Event()
+    tasks = [asyncio.ensure_future(call_groq(prompt, system, retries=1, api_key=key, model=model, sent=sent))]
+    try:
+        # p95 is measured from the request going out, so start the clock only
+        # once it has its limiter slot: time spent being paced is not a slow call.
+        waiter = asyncio.ensure_future(sent.wait())
+        try:
+            await asyncio.wait([tasks[0], waiter], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return tasks[0].result()
+
+        hedge_stats["hedged"] += 1
+        print(f"⏱️ Groq call passed p95 ({delay:.1f}s). Hedging on another key...")
+        tasks.append(asyncio.ensure_future(call_groq(prompt, system, retries=1, api_key=backup_keys[0], model=model)))
+
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is tasks[1]:
+                        hedge_stats["hedge_wins"] += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
 # --------------------------------------------------
 # Gemini call (STABLE MODELS ONLY)
 # --------------------------------------------------
@@ -193,7 +346,122 @@ def _select_gemini_clients_for_purpose(purpose: str):
     return [primary, secondary]
 
 
-async def call_llm(prompt: str, system: str = None, purpose: str = "generation", key_index: int | None = None):
+def _select_model(provider: str, purpose: str) -> str:
+    """Primary model used for a provider/purpose pair."""
+    if provider == "gemini":
+        return "gemini-1.5-flash-latest"
+    p = (purpose or "generation").strip().lower()
+    return GROQ_VALIDATION_MODEL if p in {"validation", "validate", "review"} else "llama-3.1-8b-instant"
+
+
+# --------------------------------------------------
+# Single-flight: identical concurrent requests share one upstream call
+# --------------------------------------------------
+class _Flight:
+    """One shared upstream call and the number of callers awaiting it."""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+_inflight_calls: dict[str, _Flight] = {}
+single_flight_stats = {"leaders": 0, "coalesced": 0}
+
+
+async def _single_flight(request_key: str, factory) -> tuple[str, bool]:
+    """Await the shared call for `request_key`. Returns (result, is_leader)."""
+    # Waiters are counted on the flight itself: once it finishes, a new call
+    # for the same key starts a new flight that late waiters cannot touch.
+    flight = _inflight_calls.get(request_key)
+    is_leader = flight is None
+    if is_leader:
+        flight = _Flight(asyncio.ensure_future(factory()))
+        _inflight_calls[request_key] = flight
+        single_flight_stats["leaders"] += 1
+
+        def _forget(done: asyncio.Task, key: str = request_key, started: _Flight = flight) -> None:
+            if _inflight_calls.get(key) is started:
+                _inflight_calls.pop(key, None)
+
+        flight.task.add_done_callback(_forget)
+    else:
+        single_flight_stats["coalesced"] += 1
+
+    flight.waiters += 1
+    try:
+        # Shield so one cancelled waiter does not cancel the call for the others.
+        return await asyncio.shield(flight.task), is_leader
+    except asyncio.CancelledError:
+        # Last waiter gone: nobody needs the result, stop spending quota on it.
+        if flight.waiters <= 1 and not flight.task.done():
+            flight.task.cancel()
+        raise
+    finally:
+        flight.waiters -= 1
+
+
+def single_flight_snapshot() -> dict:
+    return {"in_flight": len(_inflight_calls), **single_flight_stats}
+
+
+async def call_llm(prompt: str, system: str = None, purpose: str = "generation", key_index: int | None = None, stream: bool = False):
+    """Route an LLM call, cut off at the run's deadline (see deadline.py).
+
+    Past the deadline, or when the call would outlive it, the result is the
+    `__LLM_UNAVAILABLE__` sentinel, so callers degrade as for any failed call.
+    """
+    left = deadline.remaining()
+    if left is None:
+        return await _call_llm(prompt, system, purpose, key_index, stream)
+    if left <= 0:
+        print("⏰ Run deadline reached. Skipping LLM call.")
+        return "__LLM_UNAVAILABLE__"
+    try:
+        return await asyncio.wait_for(_call_llm(prompt, system, purpose, key_index, stream), left)
+    except asyncio.TimeoutError:
+        print("⏰ LLM call cut off at the run deadline.")
+        return "__LLM_UNAVAILABLE__"
+
+
+async def _call_llm(prompt: str, system: str = None, purpose: str = "generation", key_index: int | None = None, stream: bool = False):
+    """Repeated prompts are served from `llm_cache` when enabled, and identical
+    concurrent prompts are coalesced into a single upstream request.
+    With `stream=True` and a run event emitter installed (see events.py),
+    tokens are emitted as `token` events while the full text is still returned.
+    """
+    stream = stream and has_emitter()
+    if llm_cache is None and not LLM_SINGLE_FLIGHT:
+        return await _call_llm_uncached(prompt, system, purpose, key_index, stream)
+
+    provider = _select_provider(purpose)
+    request_key = make_cache_key(provider, _select_model(provider, purpose), system, prompt)
+    if llm_cache is not None:
+        cached = await llm_cache.get(request_key)
+        if cached is not None:
+            if stream:
+                emit("token", text=cached)
+            return cached
+
+    async def _fetch() -> str:
+        result = await _call_llm_uncached(prompt, system, purpose, key_index, stream)
+        if llm_cache is not None and not is_sentinel(result):
+            await llm_cache.set(request_key, result)
+        return result
+
+    if not LLM_SINGLE_FLIGHT:
+        return await _fetch()
+
+    result, is_leader = await _single_flight(request_key, _fetch)
+    if stream and not is_leader and not is_sentinel(result):
+        # Tokens went to the leader's listener; hand ours the whole text at once.
+        emit("token", text=result)
+    return result
+
+
+async def _call_llm_uncached(prompt: str, system: str = None, purpose: str = "generation", key_index: int | None = None, stream: bool = False):
     provider = _select_provider(purpose)
 
     async def _call_with_provider(provider_name: str) -> str:
@@ -204,50 +472,66 @@ async def call_llm(prompt: str, system: str = None, purpose: str = "generation",
             if not keys:
                 return "__LLM_UNAVAILABLE__"
             # Select model based on purpose
-            p = (purpose or "generation").strip().lower()
-            model = GROQ_VALIDATION_MODEL if p in {"validation", "validate", "review"} else "llama-3.1-8b-instant"
-            async with LLM_SEMAPHORE:
-                last_status = None
-                # If a specific key index is requested, use only that key
-                if key_index is not None and 0 <= key_index < len(keys):
-                    try:
-                        key = keys[key_index]
-                        return await call_groq(prompt, system, retries=1, api_key=key, model=model)
-                    except httpx.HTTPStatusError as e:
-                        status = getattr(e.response, "status_code", None)
-                        last_status = status
-                        if status == 429:
-                            print("⚠️ Groq rate limited (429) on fixed key.")
-                            return "__LLM_RATE_LIMITED__"
-                        print(f"⚠️ Groq HTTP error ({status}).")
-                        return "__LLM_UNAVAILABLE__"
-                    except Exception as e:
-                        print(f"⚠️ Groq failed: {e}")
-                        return "__LLM_UNAVAILABLE__"
-
-                for i in range(len(keys)):
-                    try:
-                        # Use round-robin key selection with rotation strategy
-                        key = _get_next_groq_key(keys)
-                        return await call_groq(prompt, system, retries=1, api_key=key, model=model)
-                    except httpx.HTTPStatusError as e:
-                        status = getattr(e.response, "status_code", None)
-                        last_status = status
-                        if status == 429 and i < len(keys) - 1:
-                            print("⚠️ Groq rate limited (429). Trying next key...")
-                            continue
-                        if status == 429:
-                            print("⚠️ Groq rate limited (429).")
-                            return "__LLM_RATE_LIMITED__"
-                        print(f"⚠️ Groq HTTP error ({status}).")
-                        return "__LLM_UNAVAILABLE__"
-                    except Exception as e:
-                        print(f"⚠️ Groq failed: {e}")
-                        return "__LLM_UNAVAILABLE__"
-
-                if last_status == 429:
-                    return "__LLM_RATE_LIMITED__"
-                return "__LLM_UNAVAILABLE__"
+            model = _select_model("groq", purpose)
+            last_status = None
+            est_tokens = estimate_tokens(prompt, system)
+            # If a specific key index is requested, use only that key
+            # (unless its circuit is open and a healthy alternative exists).
+            if key_index is not None and 0 <= key_index < len(keys):
+                key = keys[key_index]
+                if groq_limiter.budget(key).circuit_open():
+                    healthy = groq_limiter.rank([k for k in keys if k != key], est_tokens)
+                    if not healthy:
+                        print("⚠️ Groq key is cooling down after a rate limit (circuit open).")
+                        return "__LLM_RATE_LIMITED__"
+                    print("⚠️ Requested Groq key is cooling down. Using the healthiest other key...")
+                    key = healthy[0]
+                try:
+                    backups = groq_limiter.rank([k for k in keys if k != key], est_tokens)
+                    return await _call_groq_hedged(prompt, system, model, key, backups, stream)
+                except httpx.HTTPStatusError as e:
+                    status = getattr(e.response, "status_code", None)
+                    last_status = status
+                    if status == 429:
+                        print("⚠️ Groq rate limited (429) on fixed key.")
+                        return "__LLM_RATE_LIMITED__"
+                    print(f"⚠️ Groq HTTP error ({status}).")
+                    return "__LLM_UNAVAILABLE__"
+                except Exception as e:
+                    print(f"⚠️ Groq failed: {e}")
+                    return "__LLM_UNAVAILABLE__"
+
+            # Healthiest keys first; throttled keys are skipped until their reset window passes.
+            candidates = _order_groq_keys(keys, est_tokens)
+            if not candidates:
+                print("⚠️ All Groq keys are cooling down after rate limits (circuit open).")
+                return "__LLM_RATE_LIMITED__"
+
+            for i, key in enumerate(candidates):
+                if i > 0 and groq_limiter.budget(key).circuit_open():
+                    # Throttled by a parallel call since we ranked the keys.
+                    last_status = 429
+                    continue
+                try:
+                    return await _call_groq_hedged(prompt, system, model, key, candidates[i + 1:], stream)
+                except httpx.HTTPStatusError as e:
+                    status = getattr(e.response, "status_code", None)
+                    last_status = status
+                    if status == 429 and i < len(candidates) - 1:
+                        print("⚠️ Groq rate limited (429). Trying next key...")
+                        continue
+                    if status == 429:
+                        print("⚠️ Groq rate limited (429).")
+                        return "__LLM_RATE_LIMITED__"
+                    print(f"⚠️ Groq HTTP error ({status}).")
+                    return "__LLM_UNAVAILABLE__"
+                except Exception as e:
+                    print(f"⚠️ Groq failed: {e}")
+                    return "__LLM_UNAVAILABLE__"
+
+            if last_status == 429:
+                return "__LLM_RATE_LIMITED__"
+            return "__LLM_UNAVAILABLE__"
 
         if name == "gemini":
             clients = _select_gemini_clients_for_purpose(purpose)
@@ -1,16 +1,657 @@
+import asyncio
+import base64
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 import certifi  # use system-trusted certs for TLS connections
 
+import doc_versions
+from codec import TextCodec, decode
+from config import (
+    DOC_DELTA_ENABLED,
+    MEMORY_MAX_SESSIONS,
+    MEMORY_SESSION_MAX_AGE_SECONDS,
+    MONGO_RETENTION_DAYS,
+    MONGO_WRITE_BATCH_SIZE,
+    MONGO_WRITE_BEHIND,
+    MONGO_WRITE_FLUSH_SECONDS,
+    SQLITE_DB_PATH,
+    SQLITE_POOL_SIZE,
+)
+
 try:
     from motor.motor_asyncio import AsyncIOMotorClient
+    from pymongo.errors import BulkWriteError
     MOTOR_AVAILABLE = True
 except ImportError:
+    BulkWriteError = None
     MOTOR_AVAILABLE = False
 
+
+# Indexes every collection needs: lookups are by session_id, newest first.
+SESSION_LOOKUP_INDEX = [("session_id", 1), ("created_at", -1)]
+INDEX_SPECS: Dict[str, List[tuple]] = {
+    "sessions": [
+        ("session_id_1", [("session_id", 1)], {"sparse": True}),
+        # Newest-first listing with a stable tie-break (see list_sessions).
+        ("created_at_-1__id_-1", [("created_at", -1), ("_id", -1)], {}),
+    ],
+    "plans": [("session_id_1_created_at_-1", SESSION_LOOKUP_INDEX, {})],
+    "research": [("session_id_1_created_at_-1", SESSION_LOOKUP_INDEX, {})],
+    "document": [("session_id_1_created_at_-1", SESSION_LOOKUP_INDEX, {})],
+    "actions": [("session_id_1_created_at_-1", SESSION_LOOKUP_INDEX, {})],
+}
+TTL_INDEX_NAME = "created_at_ttl"
+# Never expired by created_at: a document version may be a delta against an
+# older keyframe, and expiring that keyframe first would leave it unreadable.
+TTL_EXCLUDED_COLLECTIONS = {"document"}
+EXPECTED_INDEX_NAMES = {name for specs in INDEX_SPECS.values() for name, _, _ in specs} | {TTL_INDEX_NAME}
+
+# Session snapshot (see MemoryStore.get_session_snapshot): what is returned for
+# the session itself and for its latest confidence report.
+CONFIDENCE_REPORT_TYPE = "confidence_and_hallucination_report"
+# Action records marking a completed pipeline stage (see save_checkpoint).
+CHECKPOINT_TYPE = "stage_checkpoint"
+# Checkpoint values that point at a stored research record or document version.
+CHECKPOINT_REF = "__ref__"
+SESSION_FIELDS = ("goal", "email", "tier", "created_at", "status", "confidence_score", "finished_at")
+SUMMARY_FIELDS = ("goal", "created_at", "confidence_score", "status")
+CONFIDENCE_FIELDS = (
+    "confidence_score",
+    "confidence_source",
+    "hallucination_risk",
+    "hallucination_risk_score",
+    "hallucination_issues",
+    "hallucination_summary",
+    "created_at",
+)
+SNAPSHOT_RESEARCH_LIMIT = 100
+# Latest full document per session, so delta-stored heads are not rebuilt per read.
+DOC_HEAD_CACHE_SIZE = 256
+# Pause before a failed write-behind flush is retried.
+WRITE_RETRY_SECONDS = 5.0
+# MongoDB duplicate key error: on a retried insert, the record is already stored.
+DUPLICATE_KEY_ERROR = 11000
+
+
+def _pick(doc: Optional[Dict], fields) -> Optional[Dict]:
+    if doc is None:
+        return None
+    return {k: doc[k] for k in fields if k in doc}
+
+
+def _encode_cursor(value: str) -> str:
+    return base64.urlsafe_b64encode(value.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> str:
+    return base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+
+
+def _snapshot_lookups(session_id: Optional[str] = None, requested: Optional[List[str]] = None) -> List[Dict]:
+    """$lookup stages pulling a session's latest plan, research, latest document and confidence.
+
+    With `session_id` the sub-pipelines match that literal id. Otherwise (batch
+    snapshots) they correlate on the id each session was requested by: its _id
+    when that is one of `requested`, else its stored session_id field.
+    """
+    correlate = {}
+    if session_id is None:
+        by_id = {"$toString": "$_id"}
+        correlate = {"let": {"sid": {"$cond": [{"$in": [by_id, list(requested or [])]}, by_id, "$session_id"]}}}
+
+    def latest(extra: Optional[Dict] = None, limit: int = 1, project: Optional[Dict] = None) -> List[Dict]:
+        if session_id is not None:
+            match = {"session_id": session_id, **(extra or {})}
+        else:
+            match = {"$expr": {"$eq": ["$session_id", "$$sid"]}, **(extra or {})}
+        stages = [{"$match": match}, {"$sort": {"created_at": -1}}, {"$limit": limit}]
+        if project:
+            stages.append({"$project": project})
+        return stages
+
+    return [
+        {"$lookup": {"from": "plans", **correlate, "pipeline": latest(), "as": "plan"}},
+        {"$lookup": {
+            "from": "research",
+            **correlate,
+            "pipeline": latest(limit=SNAPSHOT_RESEARCH_LIMIT) + [{"$sort": {"created_at": 1}}],
+            "as": "research",
+        }},
+        {"$lookup": {"from": "document", **correlate, "pipeline": latest(), "as": "document"}},
+        {"$lookup": {
+            "from": "actions",
+            **correlate,
+            "pipeline": latest(
+                extra={"type": CONFIDENCE_REPORT_TYPE},
+                project={"_id": 0, **{field: 1 for field in CONFIDENCE_FIELDS}},
+            ),
+            "as": "confidence",
+        }},
+    ]
+
+
+def _written_records(batch: List[Dict], error: Exception) -> List[Dict]:
+    """Records of a failed insert_many(ordered=False) that did reach the database."""
+    if BulkWriteError is None or not isinstance(error, BulkWriteError):
+        return []
+    failed = {
+        e.get("index")
+        for e in (error.details or {}).get("writeErrors", [])
+        if e.get("code") != DUPLICATE_KEY_ERROR
+    }
+    return [doc for index, doc in enumerate(batch) if index not in failed]
+
+
+def _merge_pending(saved: List[Dict], pending: List[Dict]) -> List[Dict]:
+    """Saved records plus buffered ones, without records that are already both.
+
+    insert_many sets `_id` on the buffered records, so a record whose insert is
+    in flight (or half-failed) can already be in `saved`.
+    """
+    seen = {d["_id"] for d in saved if d.get("_id") is not None}
+    return saved + [d for d in pending if d.get("_id") is None or d["_id"] not in seen]
+
+
+def _checkpoint_ref(value: Any) -> Optional[Dict]:
+    """Reference to a saved research record or document version, else None."""
+    if not isinstance(value, dict) or not value.get("session_id"):
+        return None
+    if value.get("record_id"):
+        return {CHECKPOINT_REF: "research", "id": value["record_id"]}
+    if value.get("version") and "document" in value:
+        return {CHECKPOINT_REF: "document", "id": value["version"]}
+    return None
+
+
+def _ref_values(output: Any) -> List[Dict]:
+    """The references held by a stored checkpoint output."""
+    if not isinstance(output, dict):
+        return []
+    if CHECKPOINT_REF in output:
+        return [output]
+    return [v for v in output.values() if isinstance(v, dict) and CHECKPOINT_REF in v]
+
+
+def _decode_snapshot(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    # Compressed text fields (see codec.py) are restored before anything reads
+    # them; the document is left to _resolve_document, which may not need it.
+    return {**snapshot, **{k: decode(snapshot[k]) for k in ("plan", "research", "confidence")}}
+
+
+def _row_to_snapshot(row: Dict) -> Dict[str, Any]:
+    return {
+        "session": {k: v for k, v in row.items() if k not in {"plan", "research", "document", "confidence"}},
+        "plan": (row.get("plan") or [None])[0],
+        "research": row.get("research") or [],
+        "document": (row.get("document") or [None])[0],
+        "confidence": (row.get("confidence") or [None])[0],
+    }
+
+
+class InMemoryBackend:
+    """Session-indexed in-memory storage used when MongoDB is not configured.
+
+    Every session owns one bucket holding the session document and an append
+    log per collection, so lookups never scan other sessions. Buckets are kept
+    in LRU order: finished sessions are evicted first once there are more than
+    `max_sessions`, and any session idle for `max_age_seconds` is dropped.
+    """
+
+    COLLECTIONS = ("plans", "research", "documents", "actions")
+
+    def __init__(
+        self,
+        max_sessions: int = MEMORY_MAX_SESSIONS,
+        max_age_seconds: float = MEMORY_SESSION_MAX_AGE_SECONDS,
+    ):
+        self.max_sessions = max(1, int(max_sessions))
+        self.max_age_seconds = float(max_age_seconds)
+        self._buckets: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._seq = 0  # creation order, for listing (bucket order is LRU)
+        self.evicted = 0
+
+    @staticmethod
+    def new_session_id() -> str:
+        return f"session_{uuid.uuid4().hex}"
+
+    def _bucket(self, session_id: str, create: bool = False) -> Optional[Dict[str, Any]]:
+        bucket = self._buckets.get(session_id)
+        if bucket is None:
+            if not create:
+                return None
+            self._seq += 1
+            bucket = {"session": None, "finished": False, "touched": 0.0, "seq": self._seq}
+            bucket.update({name: [] for name in self.COLLECTIONS})
+            self._buckets[session_id] = bucket
+        bucket["touched"] = time.monotonic()
+        self._buckets.move_to_end(session_id)
+        return bucket
+
+    def add_session(self, session_id: str, session: Dict) -> None:
+        self._bucket(session_id, create=True)["session"] = session
+        self._evict()
+
+    def get_session(self, session_id: str) -> Optional[Dict]:
+        bucket = self._bucket(session_id)
+        return bucket["session"] if bucket else None
+
+    def finish_session(self, session_id: str, fields: Dict) -> None:
+        bucket = self._bucket(session_id)
+        if bucket is None:
+            return
+        bucket["finished"] = True
+        if bucket["session"] is not None:
+            bucket["session"].update(fields)
+        self._evict()
+
+    def append(self, collection: str, session_id: str, record: Dict) -> None:
+        # Records for unknown sessions get a bucket too, evictable like a finished one.
+        self._bucket(session_id, create=True)[collection].append(record)
+        self._evict()
+
+    def latest(self, collection: str, session_id: str) -> Optional[Dict]:
+        bucket = self._bucket(session_id)
+        if not bucket or not bucket[collection]:
+            return None
+        return bucket[collection][-1]
+
+    def records(self, collection: str, session_id: str, limit: Optional[int] = None) -> List[Dict]:
+        bucket = self._bucket(session_id)
+        if not bucket:
+            return []
+        items = bucket[collection]
+        return list(items[:limit] if limit is not None else items)
+
+    def snapshot(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Session, latest plan, research, latest document and confidence report in one pass."""
+        bucket = self._bucket(session_id)
+        if not bucket or bucket["session"] is None:
+            return None
+        confidence = next(
+            (a for a in reversed(bucket["actions"]) if a.get("type") == CONFIDENCE_REPORT_TYPE),
+            None,
+        )
+        return {
+            "session": _pick(bucket["session"], SESSION_FIELDS),
+            "plan": bucket["plans"][-1] if bucket["plans"] else None,
+            "research": list(bucket["research"][:SNAPSHOT_RESEARCH_LIMIT]),
+            "document": bucket["documents"][-1] if bucket["documents"] else None,
+            "confidence": _pick(confidence, CONFIDENCE_FIELDS),
+        }
+
+    def snapshots(self, session_ids: List[str], summary: bool = False) -> Dict[str, Optional[Dict[str, Any]]]:
+        result: Dict[str, Optional[Dict[str, Any]]] = {}
+        for sid in session_ids:
+            if summary:
+                session = self.get_session(sid)
+                result[sid] = {"session_id": sid, **_pick(session, SUMMARY_FIELDS)} if session else None
+            else:
+                result[sid] = self.snapshot(sid)
+        return result
+
+    def list_sessions(self, limit: int, cursor: Optional[str] = None) -> Dict[str, Any]:
+        # Listing does not count as a use, so it leaves the LRU order alone.
+        try:
+            before = int(_decode_cursor(cursor)) if cursor else None
+        except Exception:
+            raise ValueError("Invalid cursor.")
+        rows = sorted(
+            (
+                (b["seq"], sid, b["session"]) for sid, b in self._buckets.items()
+                if b["session"] is not None and (before is None or b["seq"] < before)
+            ),
+            key=lambda row: row[0],
+            reverse=True,
+        )
+        page = rows[:limit]
+        next_cursor = _encode_cursor(str(page[-1][0])) if len(rows) > limit else None
+        return {
+            "sessions": [{"session_id": sid, **_pick(session, SUMMARY_FIELDS)} for _, sid, session in page],
+            "next_cursor": next_cursor,
+        }
+
+    def _evictable(self, bucket: Dict[str, Any]) -> bool:
+        # A created session that has not finished yet is a run in progress.
+        return bucket["finished"] or bucket["session"] is None
+
+    def _evict(self) -> None:
+        cutoff = time.monotonic() - self.max_age_seconds
+        # Oldest first: stop at the first bucket touched after the cutoff.
+        while self._buckets:
+            session_id, bucket = next(iter(self._buckets.items()))
+            if bucket["touched"] >= cutoff:
+                break
+            del self._buckets[session_id]
+            self.evicted += 1
+
+        overflow = len(self._buckets) - self.max_sessions
+        if overflow <= 0:
+            return
+        for session_id in [sid for sid, b in self._buckets.items() if self._evictable(b)][:overflow]:
+            del self._buckets[session_id]
+            self.evicted += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._buckets),
+            "active": sum(1 for b in self._buckets.values() if not self._evictable(b)),
+            "max_sessions": self.max_sessions,
+            "evicted": self.evicted,
+        }
+
+
+class SQLiteBackend:
+    """Durable single-node storage in one SQLite file (WAL mode).
+
+    Same synchronous interface as InMemoryBackend; MemoryStore runs every call
+    on `executor`, a small thread pool where each thread keeps its own
+    connection. WAL lets readers proceed while a write is in progress; writes
+    are serialized by a lock. Plans, research, documents and actions are JSON
+    columns in per-collection tables indexed on (session_id, id).
+    """
+
+    COLLECTIONS = InMemoryBackend.COLLECTIONS
+
+    def __init__(self, path: str = SQLITE_DB_PATH, pool_size: int = SQLITE_POOL_SIZE):
+        self.path = path
+        self.executor = ThreadPoolExecutor(max_workers=max(1, int(pool_size)), thread_name_prefix="memory-sqlite")
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        # Bumped from every executor thread.
+        self._counters_lock = threading.Lock()
+        self._counters = {"reads": 0, "writes": 0}
+
+        db = self._conn()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " session_id TEXT NOT NULL UNIQUE,"
+            " goal TEXT,"
+            " email TEXT,"
+            " created_at TEXT NOT NULL,"
+            " status TEXT,"
+            " confidence_score NUMERIC,"
+            " finished_at TEXT,"
+            " tier TEXT)"
+        )
+        # Files created before sessions recorded their quality tier.
+        if "tier" not in {row["name"] for row in db.execute("PRAGMA table_info(sessions)")}:
+            db.execute("ALTER TABLE sessions ADD COLUMN tier TEXT")
+        for table in self.COLLECTIONS:
+            db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " session_id TEXT NOT NULL,"
+                " type TEXT,"
+                " created_at TEXT NOT NULL,"
+                " data TEXT NOT NULL)"
+            )
+            db.execute(f"CREATE INDEX IF NOT EXISTS {table}_session ON {table}(session_id, id)")
+        db.execute("CREATE INDEX IF NOT EXISTS actions_session_type ON actions(session_id, type, id)")
+        db.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+            with self._connections_lock:
+                self._connections.append(db)
+        return db
+
+    def _write(self, sql: str, params: tuple) -> None:
+        with self._write_lock:
+            db = self._conn()
+            db.execute(sql, params)
+            db.commit()
+        self._count("writes")
+
+    def _query(self, sql: str, params: tuple) -> List[sqlite3.Row]:
+        self._count("reads")
+        return self._conn().execute(sql, params).fetchall()
+
+    def _count(self, counter: str) -> None:
+        with self._counters_lock:
+            self._counters[counter] += 1
+
+    @staticmethod
+    def _record(row: sqlite3.Row) -> Dict:
+        record = json.loads(row["data"])
+        record["created_at"] = datetime.fromisoformat(row["created_at"])
+        return record
+
+    @staticmethod
+    def _session(row: Optional[sqlite3.Row]) -> Optional[Dict]:
+        if row is None:
+            return None
+        session = {k: row[k] for k in row.keys() if k != "seq"}
+        for key in ("created_at", "finished_at"):
+            if session.get(key):
+                session[key] = datetime.fromisoformat(session[key])
+        return session
+
+    new_session_id = staticmethod(InMemoryBackend.new_session_id)
+
+    def add_session(self, session_id: str, session: Dict) -> None:
+        self._write(
+            "INSERT INTO sessions (session_id, goal, email, tier, created_at) VALUES (?, ?, ?, ?, ?)",
+            (
+                session_id,
+                session.get("goal"),
+                session.get("email"),
+                session.get("tier"),
+                session["created_at"].isoformat(),
+            ),
+        )
+
+    def get_session(self, session_id: str) -> Optional[Dict]:
+        rows = self._query("SELECT * FROM sessions WHERE session_id = ?", (session_id,))
+        return self._session(rows[0] if rows else None)
+
+    def finish_session(self, session_id: str, fields: Dict) -> None:
+        self._write(
+            "UPDATE sessions SET status = ?, finished_at = ?,"
+            " confidence_score = COALESCE(?, confidence_score) WHERE session_id = ?",
+            (fields.get("status"), fields["finished_at"].isoformat(), fields.get("confidence_score"), session_id),
+        )
+
+    def append(self, collection: str, session_id: str, record: Dict) -> None:
+        data = {k: v for k, v in record.items() if k != "created_at"}
+        self._write(
+            f"INSERT INTO {collection} (session_id, type, created_at, data) VALUES (?, ?, ?, ?)",
+            (session_id, record.get("type"), record["created_at"].isoformat(), json.dumps(data, default=str)),
+        )
+
+    def latest(self, collection: str, session_id: str) -> Optional[Dict]:
+        rows = self._query(
+            f"SELECT created_at, data FROM {collection} WHERE session_id = ? ORDER BY id DESC LIMIT 1",
+            (session_id,),
+        )
+        return self._record(rows[0]) if rows else None
+
+    def records(self, collection: str, session_id: str, limit: Optional[int] = None) -> List[Dict]:
+        rows = self._query(
+            f"SELECT created_at, data FROM {collection} WHERE session_id = ? ORDER BY id LIMIT ?",
+            (session_id, -1 if limit is None else int(limit)),
+        )
+        return [self._record(row) for row in rows]
+
+    def snapshot(self, session_id: str) -> Optional[Dict[str, Any]]:
+        session = self.get_session(session_id)
+        if session is None:
+            return None
+        confidence = self._query(
+            "SELECT created_at, data FROM actions WHERE session_id = ? AND type = ? ORDER BY id DESC LIMIT 1",
+            (session_id, CONFIDENCE_REPORT_TYPE),
+        )
+        return {
+            "session": _pick(session, SESSION_FIELDS),
+            "plan": self.latest("plans", session_id),
+            "research": self.records("research", session_id, limit=SNAPSHOT_RESEARCH_LIMIT),
+            "document": self.latest("documents", session_id),
+            "confidence": _pick(self._record(confidence[0]), CONFIDENCE_FIELDS) if confidence else None,
+        }
+
+    def snapshots(self, session_ids: List[str], summary: bool = False) -> Dict[str, Optional[Dict[str, Any]]]:
+        if summary:
+            result: Dict[str, Optional[Dict[str, Any]]] = {sid: None for sid in session_ids}
+            if session_ids:
+                marks = ",".join("?" for _ in session_ids)
+                for row in self._query(f"SELECT * FROM sessions WHERE session_id IN ({marks})", tuple(session_ids)):
+                    session = self._session(row)
+                    result[session["session_id"]] = {"session_id": session["session_id"], **_pick(session, SUMMARY_FIELDS)}
+            return result
+        return {sid: self.snapshot(sid) for sid in session_ids}
+
+    def list_sessions(self, limit: int, cursor: Optional[str] = None) -> Dict[str, Any]:
+        try:
+            before = int(_decode_cursor(cursor)) if cursor else None
+        except Exception:
+            raise ValueError("Invalid cursor.")
+        rows = self._query(
+            "SELECT * FROM sessions WHERE (? IS NULL OR seq < ?) ORDER BY seq DESC LIMIT ?",
+            (before, before, limit + 1),
+        )
+        page = rows[:limit]
+        next_cursor = _encode_cursor(str(page[-1]["seq"])) if len(rows) > limit else None
+        return {
+            "sessions": [
+                {"session_id": row["session_id"], **_pick(self._session(row), SUMMARY_FIELDS)} for row in page
+            ],
+            "next_cursor": next_cursor,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._counters_lock:
+            counters = dict(self._counters)
+        return {"path": self.path, "connections": len(self._connections), **counters}
+
+    def close(self) -> None:
+        """Wait for queued calls, then close every connection. Blocks: call it off the event loop."""
+        self.executor.shutdown(wait=True)
+        with self._connections_lock:
+            for db in self._connections:
+                db.close()
+            self._connections = []
+
+
+class WriteBehindBuffer:
+    """Buffers MongoDB inserts and writes them per collection with insert_many.
+
+    A flush happens once `batch_size` records are pending, `flush_interval`
+    seconds after the first buffered record, or when `flush()` is called; a
+    failed flush is retried after WRITE_RETRY_SECONDS. Records stay visible
+    through `pending()` until their insert has completed, so readers can
+    overlay them on query results (read-your-writes, see _merge_pending).
+    """
+
+    def __init__(self, db, batch_size: int = MONGO_WRITE_BATCH_SIZE, flush_interval: float = MONGO_WRITE_FLUSH_SECONDS):
+        self.db = db
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.0, float(flush_interval))
+        self._pending: Dict[str, List[Dict]] = {}
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        # Background flushes, referenced until done so none is garbage-collected.
+        self._tasks: set = set()
+        self._counters = {"buffered": 0, "flushed": 0, "batches": 0, "errors": 0}
+
+    def size(self) -> int:
+        return sum(len(docs) for docs in self._pending.values())
+
+    def add(self, collection: str, doc: Dict) -> None:
+        self._pending.setdefault(collection, []).append(doc)
+        self._counters["buffered"] += 1
+        if self.size() >= self.batch_size:
+            self._spawn(self.flush())
+        else:
+            self._arm_timer(self.flush_interval)
+
+    def pending(self, collection: str, session_id: str) -> List[Dict]:
+        return [d for d in self._pending.get(collection, []) if d.get("session_id") == session_id]
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self._counters["errors"] += 1
+            print(f"⚠️ [MemoryStore] Write-behind flush task failed: {task.exception()}")
+
+    def _arm_timer(self, delay: float) -> None:
+        if self._timer is None or self._timer.done():
+            self._timer = self._spawn(self._flush_later(delay))
+
+    async def _flush_later(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        # This flush may need to arm the next timer.
+        self._timer = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        failed = False
+        async with self._lock:
+            for collection in list(self._pending):
+                batch = list(self._pending.get(collection, []))
+                if not batch:
+                    continue
+                try:
+                    await self.db[collection].insert_many(batch, ordered=False)
+                    written = batch
+                    self._counters["batches"] += 1
+                except Exception as e:
+                    # Only the records that were not written stay buffered.
+                    failed = True
+                    written = _written_records(batch, e)
+                    self._counters["errors"] += 1
+                    print(f"⚠️ [MemoryStore] Write-behind flush to {collection} failed: {e}")
+                # Records added while the insert was in flight stay queued.
+                done = {id(d) for d in written}
+                self._pending[collection] = [d for d in self._pending[collection] if id(d) not in done]
+                self._counters["flushed"] += len(written)
+        if failed and self.size():
+            # No later save may come along to trigger it, so schedule the retry.
+            self._arm_timer(max(self.flush_interval, WRITE_RETRY_SECONDS))
+
+    async def close(self) -> None:
+        if self._timer is not None and not self._timer.done():
+            self._timer.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush()
+        # Shutting down: a failed final flush is not retried.
+        if self._timer is not None and not self._timer.done():
+            self._timer.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pending": self.size(), "batch_size": self.batch_size, **self._counters}
+
+
 class MemoryStore:
-    def __init__(self, mongo_uri: Optional[str] = None, db_name: str = "AgentForge"):
+    def __init__(
+        self,
+        mongo_uri: Optional[str] = None,
+        db_name: str = "AgentForge",
+        sqlite_path: Optional[str] = SQLITE_DB_PATH,
+    ):
+        self._doc_heads: "OrderedDict[str, Dict]" = OrderedDict()
         if mongo_uri and MOTOR_AVAILABLE:
             # Explicitly provide CA bundle to avoid Windows cert store issues
             self.client = AsyncIOMotorClient(
@@ -20,30 +661,40 @@ class MemoryStore:
             )
             self.db = self.client[db_name]
             self.use_mongo = True
+            self.backend = "mongo"
+            self.index_report: Optional[Dict[str, Any]] = None
+            self._writes = WriteBehindBuffer(self.db) if MONGO_WRITE_BEHIND else None
             print(f"[MemoryStore] MongoDB connected: {mongo_uri}")
         else:
             self.db = None
             self.use_mongo = False
-            self._memory = {}
-            print("[MemoryStore] MongoDB NOT connected. Using in-memory store.")
+            if sqlite_path:
+                self.backend = "sqlite"
+                self._memory = SQLiteBackend(sqlite_path)
+                print(f"[MemoryStore] MongoDB NOT connected. Using SQLite store: {sqlite_path}")
+            else:
+                self.backend = "memory"
+                self._memory = InMemoryBackend()
+                print("[MemoryStore] MongoDB NOT connected. Using in-memory store.")
+        # SQLite keeps records in JSON columns, so compressed bytes go in as base64 there.
+        self._codec = TextCodec(binary=self.backend != "sqlite")
 
 
 # -------------------- Session ---------------
 
-    async def create_session(self, goal: str, email: str | None = None):
+    async def create_session(self, goal: str, email: str | None = None, tier: str | None = None):
         session = {
             "goal": goal,
             "email": email,
+            "tier": tier,
             "created_at": datetime.now()
         }
         if self.use_mongo:
             result = await self.db.sessions.insert_one(session)
             return str(result.inserted_id)
         else:
-            session_id = f"session_{len(self._memory.get('sessions', []))}"
-            if 'sessions' not in self._memory:
-                self._memory['sessions'] = []
-            self._memory['sessions'].append(session)
+            session_id = self._memory.new_session_id()
+            await self._local("add_session", session_id, {**session, "session_id": session_id})
             return session_id
     
     async def get_session(self, session_id: str) -> Optional[Dict]:
@@ -65,77 +716,348 @@ class MemoryStore:
             except Exception:
                 return None
         else:
-            # For in-memory storage, find by matching session_id
-            sessions = self._memory.get('sessions', [])
-            for idx, s in enumerate(sessions):
-                if f"session_{idx}" == session_id or s.get("session_id") == session_id:
-                    return s
+            return await self._local("get_session", session_id)
+
+    async def _local(self, method: str, *args):
+        """Call the non-Mongo backend; SQLite calls run on its thread pool."""
+        fn = getattr(self._memory, method)
+        executor = getattr(self._memory, "executor", None)
+        if executor is None:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+    async def get_session_snapshot(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Everything /session needs in one query.
+
+        Returns {"session", "plan", "research", "document", "confidence"} or None
+        when the session does not exist. On MongoDB this is a single aggregation
+        on `sessions` with one $lookup per collection (each served by the
+        (session_id, created_at) index).
+        """
+        if not self.use_mongo:
+            snapshot = await self._local("snapshot", session_id)
+            if snapshot is not None:
+                snapshot = _decode_snapshot(snapshot)
+                snapshot["document"] = await self._resolve_document(session_id, snapshot["document"])
+            return snapshot
+
+        from bson.objectid import ObjectId
+        # Like get_session: by _id first, then by a stored session_id field
+        # (also when a valid-looking ObjectId matches nothing).
+        matches = []
+        try:
+            matches.append({"_id": ObjectId(session_id)})
+        except Exception:
+            pass
+        matches.append({"session_id": session_id})
+
+        rows = []
+        for match in matches:
+            pipeline = [
+                {"$match": match},
+                {"$limit": 1},
+                {"$project": {field: 1 for field in SESSION_FIELDS}},
+                *_snapshot_lookups(session_id),
+            ]
+            rows = await self.db.sessions.aggregate(pipeline).to_list(length=1)
+            if rows:
+                break
+        if not rows:
             return None
-    
+        snapshot = _decode_snapshot(self._overlay_pending(session_id, _row_to_snapshot(rows[0])))
+        snapshot["document"] = await self._resolve_document(session_id, snapshot["document"])
+        return snapshot
+
+    async def get_session_snapshots(
+        self, session_ids: List[str], summary: bool = False
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Snapshots for many sessions in one query, keyed by id (None for unknown ids).
+
+        With `summary=True` only the list fields (goal, created_at,
+        confidence_score, status) are fetched, as in `list_sessions`.
+        """
+        result: Dict[str, Optional[Dict[str, Any]]] = {sid: None for sid in session_ids}
+        if not self.use_mongo:
+            result = await self._local("snapshots", list(result), summary)
+            if not summary:
+                for sid, snapshot in result.items():
+                    if snapshot is not None:
+                        snapshot = result[sid] = _decode_snapshot(snapshot)
+                        snapshot["document"] = await self._resolve_document(sid, snapshot["document"])
+            return result
+
+        from bson.objectid import ObjectId
+        # Like get_session: by _id, then by a stored session_id field.
+        ids = list(result)
+        object_ids = []
+        for sid in ids:
+            try:
+                object_ids.append(ObjectId(sid))
+            except Exception:
+                pass
+        match = {"$or": [{"_id": {"$in": object_ids}}, {"session_id": {"$in": ids}}]}
+        if summary:
+            rows = self.db.sessions.find(match, projection={f: 1 for f in ("session_id", *SUMMARY_FIELDS)})
+        else:
+            rows = self.db.sessions.aggregate([
+                {"$match": match},
+                {"$project": {field: 1 for field in ("session_id", *SESSION_FIELDS)}},
+                *_snapshot_lookups(requested=ids),
+            ])
+        by_id, by_session_id = {}, {}
+        async for row in rows:
+            by_id[str(row["_id"])] = row
+            if row.get("session_id") is not None:
+                by_session_id.setdefault(str(row["session_id"]), row)
+        for sid in ids:
+            row = by_id.get(sid) or by_session_id.get(sid)
+            if row is None:
+                continue
+            if summary:
+                result[sid] = {"session_id": sid, **_pick(row, SUMMARY_FIELDS)}
+                continue
+            snapshot = _decode_snapshot(self._overlay_pending(sid, _row_to_snapshot(row)))
+            snapshot["document"] = await self._resolve_document(sid, snapshot["document"])
+            result[sid] = snapshot
+        return result
+
+    async def list_sessions(self, limit: int = 20, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Newest sessions first, as summaries, with keyset pagination.
+
+        Returns {"sessions": [...], "next_cursor": str | None}; pass `next_cursor`
+        back to get the following page. Cursors are opaque.
+        """
+        limit = max(1, min(int(limit), 100))
+        if not self.use_mongo:
+            return await self._local("list_sessions", limit, cursor)
+
+        from bson.objectid import ObjectId
+        query: Dict[str, Any] = {}
+        if cursor:
+            try:
+                created_at, last_id = _decode_cursor(cursor).split("|", 1)
+                created_at, last_id = datetime.fromisoformat(created_at), ObjectId(last_id)
+            except Exception:
+                raise ValueError("Invalid cursor.")
+            query = {"$or": [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": last_id}},
+            ]}
+        rows = await self.db.sessions.find(
+            query,
+            projection={field: 1 for field in SUMMARY_FIELDS},
+            sort=[("created_at", -1), ("_id", -1)],
+            limit=limit + 1,
+        ).to_list(length=limit + 1)
+        page = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit and page:
+            last = page[-1]
+            next_cursor = _encode_cursor(f"{last['created_at'].isoformat()}|{last['_id']}")
+        return {
+            "sessions": [{"session_id": str(r["_id"]), **_pick(r, SUMMARY_FIELDS)} for r in page],
+            "next_cursor": next_cursor,
+        }
+
+    def _overlay_pending(self, session_id: str, snapshot: Dict[str, Any]) -> Dict[str, Any]:
+        # Read-your-writes for records still sitting in the write-behind buffer.
+        pending_plans = self._pending("plans", session_id)
+        if pending_plans:
+            snapshot["plan"] = pending_plans[-1]
+        snapshot["research"] = _merge_pending(snapshot["research"], self._pending("research", session_id))
+        pending_docs = self._pending("document", session_id)
+        if pending_docs:
+            snapshot["document"] = pending_docs[-1]
+        pending_reports = [a for a in self._pending("actions", session_id) if a.get("type") == CONFIDENCE_REPORT_TYPE]
+        if pending_reports:
+            snapshot["confidence"] = _pick(pending_reports[-1], CONFIDENCE_FIELDS)
+        return snapshot
+
+    async def _append(self, collection: str, session_id: str, record: Dict) -> None:
+        await self._local("append", collection, session_id, self._codec.encode(record))
+
+    async def _insert(self, collection: str, doc: Dict) -> None:
+        doc = self._codec.encode(doc)
+        if self._writes is not None:
+            self._writes.add(collection, doc)
+        else:
+            await self.db[collection].insert_one(doc)
+
+    def _pending(self, collection: str, session_id: str) -> List[Dict]:
+        return self._writes.pending(collection, session_id) if self._writes is not None else []
+
+    async def flush(self) -> None:
+        """Write out buffered saves (no-op without write-behind)."""
+        if self.use_mongo and self._writes is not None:
+            await self._writes.flush()
+
+    async def close(self) -> None:
+        if self.use_mongo:
+            if self._writes is not None:
+                await self._writes.close()
+        elif self.backend == "sqlite":
+            # Waits for queued SQLite calls; keep the event loop free meanwhile.
+            await asyncio.to_thread(self._memory.close)
+
+    async def finish_session(self, session_id: str, status: str, confidence_score: Any = None):
+        """Mark a run as finished. In-memory sessions become evictable from here on."""
+        fields = {"status": status, "finished_at": datetime.now()}
+        if confidence_score is not None:
+            fields["confidence_score"] = confidence_score
+        if self.use_mongo:
+            from bson.objectid import ObjectId
+            # End of a run: nothing it saved should stay buffered.
+            await self.flush()
+            try:
+                # Like get_session: by _id first, then by a stored session_id field
+                # (also when a valid-looking ObjectId matches nothing).
+                try:
+                    obj_id = ObjectId(session_id)
+                except Exception:
+                    obj_id = None
+                updated = None
+                if obj_id is not None:
+                    updated = await self.db.sessions.update_one({"_id": obj_id}, {"$set": fields})
+                if updated is None or not updated.matched_count:
+                    await self.db.sessions.update_one({"session_id": session_id}, {"$set": fields})
+            except Exception as e:
+                print(f"⚠️ Failed to mark session {session_id} finished: {e}")
+        else:
+            await self._local("finish_session", session_id, fields)
+
 # --------------------------- Plan --------------------------
 
     async def save_plan(self, session_id: str, plan: Dict):
         plan["session_id"] = session_id
         plan["created_at"] = datetime.now()
         if self.use_mongo:
-            await self.db.plans.insert_one(plan)
+            await self._insert("plans", plan)
         else:
-            if 'plans' not in self._memory:
-                self._memory['plans'] = []
-            self._memory['plans'].append(plan)
+            await self._append("plans", session_id, plan)
 
     async def get_latest_plan(self, session_id: str) -> Optional[Dict]:
         """Retrieve the latest plan for a session."""
+        return decode(await self._latest_plan_record(session_id))
+
+    async def _latest_plan_record(self, session_id: str) -> Optional[Dict]:
         if self.use_mongo:
+            pending = self._pending("plans", session_id)
+            if pending:
+                return pending[-1]
             return await self.db.plans.find_one(
                 {"session_id": session_id},
                 sort=[("created_at", -1)]
             )
         else:
-            plans = [p for p in self._memory.get('plans', []) if p.get('session_id') == session_id]
-            return plans[-1] if plans else None
+            return await self._local("latest", "plans", session_id)
 
 # ----------------------- Research -------------------------
 
     async def save_research(self, session_id:str, research: Dict):
         research["session_id"] = session_id
         research["created_at"] = datetime.now()
+        # Lets stage checkpoints point at this record instead of copying it.
+        research["record_id"] = uuid.uuid4().hex
         if self.use_mongo:
-            await self.db.research.insert_one(research)
+            await self._insert("research", research)
         else:
-            if 'research' not in self._memory:
-                self._memory['research'] = []
-            self._memory['research'].append(research)
+            await self._append("research", session_id, research)
 
     async def get_research(self, session_id: str) -> List[Dict]:
+        return decode(await self._research_records(session_id))
+
+    async def _research_records(self, session_id: str) -> List[Dict]:
         if self.use_mongo:
-            return await self.db.research.find(
+            saved = await self.db.research.find(
                 {"session_id": session_id}
             ).to_list(length=100)
+            return _merge_pending(saved, self._pending("research", session_id))
         else:
-            return [r for r in self._memory.get('research', []) if r.get('session_id') == session_id]
+            return await self._local("records", "research", session_id, 100)
 
 # ------------------- Documents ----------------------------
 
     async def save_document(self, session_id: str, document: Dict):
         document["session_id"] = session_id
         document["created_at"] = datetime.now()
+        record = document
+        if DOC_DELTA_ENABLED:
+            # Diff against the latest stored version. The head cache only saves
+            # rebuilding it, and is used only when its version matches the store.
+            previous = await self.get_latest_document(session_id)
+            record = doc_versions.pack_version(document, previous)
+            document["version"] = record["version"]
+            self._cache_head(session_id, dict(document))
         if self.use_mongo:
-            await self.db.document.insert_one(document)
+            await self._insert("document", record)
         else:
-            if 'documents' not in self._memory:
-                self._memory['documents'] = []
-            self._memory['documents'].append(document)
+            await self._append("documents", session_id, record)
     
     async def get_latest_document(self, session_id:str):
+        return await self._resolve_document(session_id, await self._latest_document_record(session_id))
+
+    async def get_document_versions(self, session_id: str) -> List[Dict]:
+        """Metadata (version, created_at, encoding, stored size) for every saved version.
+
+        Reads the stored records only; nothing is decompressed or rebuilt.
+        """
+        records = await self._document_records(session_id)
+        return [doc_versions.describe(record, index) for index, record in enumerate(records)]
+
+    async def get_document_version(self, session_id: str, version: int) -> Optional[Dict]:
+        """Rebuild one version of a session's document (1 = first draft)."""
+        records = doc_versions.chain_for(await self._document_records(session_id), version)
+        documents = doc_versions.unpack_versions(decode(records))
+        return next((d for d in documents if d.get("version") == version), None)
+
+    def _cache_head(self, session_id: str, document: Dict) -> None:
+        self._doc_heads[session_id] = document
+        self._doc_heads.move_to_end(session_id)
+        while len(self._doc_heads) > DOC_HEAD_CACHE_SIZE:
+            self._doc_heads.popitem(last=False)
+
+    async def _resolve_document(self, session_id: str, record: Optional[Dict]) -> Optional[Dict]:
+        """Full document for a session's latest stored record.
+
+        Keyframes are returned as stored. A delta head comes from the head cache
+        when the cached version matches (without decompressing anything),
+        otherwise it is rebuilt from its keyframe.
+        """
+        if not doc_versions.is_delta(record):
+            return doc_versions.as_document(decode(record))
+        head = self._doc_heads.get(session_id)
+        if head is not None and head.get("version") == record.get("version"):
+            self._doc_heads.move_to_end(session_id)
+            return head
+        records = doc_versions.chain_for(await self._document_records(session_id))
+        documents = doc_versions.unpack_versions(decode(records))
+        if not documents:
+            return None
+        self._cache_head(session_id, documents[-1])
+        return documents[-1]
+
+    async def _document_records(self, session_id: str) -> List[Dict]:
+        # Oldest first and still compressed (see codec.py); documents per
+        # session are few (one per pass plus review).
+        if self.use_mongo:
+            saved = await self.db.document.find(
+                {"session_id": session_id},
+                sort=[("created_at", 1)]
+            ).to_list(length=None)
+            return _merge_pending(saved, self._pending("document", session_id))
+        return await self._local("records", "documents", session_id, None)
+
+    async def _latest_document_record(self, session_id: str) -> Optional[Dict]:
         if self.use_mongo:
+            pending = self._pending("document", session_id)
+            if pending:
+                return pending[-1]
             return await self.db.document.find_one(
                 {"session_id": session_id},
                 sort=[("created_at", -1)]
             )
         else:
-            docs = [d for d in self._memory.get('documents', []) if d.get('session_id') == session_id]
-            return docs[-1] if docs else None
+            return await self._local("latest", "documents", session_id)
 
 # --------------------- Actions ------------------------------ 
 
@@ -143,15 +1065,155 @@ class MemoryStore:
         action["session_id"] = session_id
         action["created_at"] = datetime.now()
         if self.use_mongo:
-            await self.db.actions.insert_one(action)
+            await self._insert("actions", action)
         else:
-            if 'actions' not in self._memory:
-                self._memory['actions'] = []
-            self._memory['actions'].append(action)
+            await self._append("actions", session_id, action)
     
     # Alias for backwards compatibility
     async def save_action(self, session_id:str, action:Dict):
         return await self.save_actions(session_id, action)
 
+# ------------------- Stage checkpoints ----------------------
+
+    async def save_checkpoint(self, session_id: str, stage: str, output: Any, iteration: int = 0):
+        """Mark a pipeline stage as completed in `iteration`.
+
+        `output` is what the stage produced (a value or a dict of values), or
+        None when it reused the output of an earlier checkpoint. Research
+        records and document versions it contains were saved already, so only
+        a reference to them is stored; get_checkpoints loads them back.
+        """
+        if isinstance(output, dict) and _checkpoint_ref(output) is None:
+            output = {k: _checkpoint_ref(v) or v for k, v in output.items()}
+        else:
+            output = _checkpoint_ref(output) or output
+        await self.save_actions(session_id, {
+            "type": CHECKPOINT_TYPE,
+            "stage": stage,
+            "iteration": iteration,
+            "output": output,
+        })
+
+    async def get_checkpoints(self, session_id: str) -> List[Dict]:
+        """Stage checkpoints of a session, oldest first, with references resolved."""
+        if self.use_mongo:
+            saved = await self.db.actions.find(
+                {"session_id": session_id, "type": CHECKPOINT_TYPE},
+                sort=[("created_at", 1)]
+            ).to_list(length=None)
+            pending = [a for a in self._pending("actions", session_id) if a.get("type") == CHECKPOINT_TYPE]
+            checkpoints = decode(_merge_pending(saved, pending))
+        else:
+            actions = await self._local("records", "actions", session_id)
+            checkpoints = decode([a for a in actions if a.get("type") == CHECKPOINT_TYPE])
+        return await self._resolve_checkpoints(session_id, checkpoints)
+
+    async def _resolve_checkpoints(self, session_id: str, checkpoints: List[Dict]) -> List[Dict]:
+        kinds = {
+            value[CHECKPOINT_REF]
+            for checkpoint in checkpoints
+            for value in _ref_values(checkpoint.get("output"))
+        }
+        if not kinds:
+            return checkpoints
+        stored: Dict[str, Dict[Any, Dict]] = {"research": {}, "document": {}}
+        if "research" in kinds:
+            stored["research"] = {r.get("record_id"): r for r in await self.get_research(session_id)}
+        if "document" in kinds:
+            documents = doc_versions.unpack_versions(decode(await self._document_records(session_id)))
+            stored["document"] = {d.get("version"): d for d in documents}
+
+        for checkpoint in checkpoints:
+            output = checkpoint.get("output")
+            refs = _ref_values(output)
+            if not refs:
+                continue
+            loaded = {id(ref): stored[ref[CHECKPOINT_REF]].get(ref["id"]) for ref in refs}
+            if any(value is None for value in loaded.values()):
+                # The referenced record is gone: treat the stage as not completed.
+                checkpoint["output"] = None
+            elif CHECKPOINT_REF in output:
+                checkpoint["output"] = loaded[id(output)]
+            else:
+                checkpoint["output"] = {k: loaded.get(id(v), v) for k, v in output.items()}
+        return checkpoints
+
+# --------------------- Indexes ------------------------------
+
+    async def ensure_indexes(self, retention_days: float = MONGO_RETENTION_DAYS) -> None:
+        """Create the lookup indexes (and the optional TTL index) if they are missing."""
+        if not self.use_mongo:
+            return
+        ttl_seconds = int(retention_days * 86400) if retention_days and retention_days > 0 else None
+        for collection, specs in INDEX_SPECS.items():
+            coll = self.db[collection]
+            for name, keys, options in specs:
+                try:
+                    await coll.create_index(keys, name=name, background=True, **options)
+                except Exception as e:
+                    # e.g. the same keys already indexed under another name.
+                    print(f"⚠️ [MemoryStore] Could not create {collection}.{name}: {e}")
+
+            existing = await coll.index_information()
+            ttl = existing.get(TTL_INDEX_NAME)
+            if collection in TTL_EXCLUDED_COLLECTIONS:
+                if ttl is not None:
+                    print(f"[MemoryStore] Dropping {collection}.{TTL_INDEX_NAME}: {collection} records are not expired by age.")
+                    await coll.drop_index(TTL_INDEX_NAME)
+            elif ttl_seconds is None:
+                if ttl is not None:
+                    print(f"[MemoryStore] {collection}.{TTL_INDEX_NAME} exists but MONGO_RETENTION_DAYS is 0; leaving it in place.")
+            elif ttl is None:
+                await coll.create_index(
+                    [("created_at", 1)], name=TTL_INDEX_NAME, expireAfterSeconds=ttl_seconds, background=True
+                )
+            elif ttl.get("expireAfterSeconds") != ttl_seconds:
+                # Changing a TTL in place needs collMod; create_index would conflict.
+                await self.db.command(
+                    "collMod",
+                    collection,
+                    index={"name": TTL_INDEX_NAME, "expireAfterSeconds": ttl_seconds},
+                )
+
+    async def check_indexes(self) -> Dict[str, Any]:
+        """Report, per collection, expected indexes that are missing and indexes never used.
+
+        Usage comes from $indexStats, so "unused" means no operations since the
+        last server restart.
+        """
+        if not self.use_mongo:
+            return {}
+        report: Dict[str, Any] = {}
+        for collection, specs in INDEX_SPECS.items():
+            coll = self.db[collection]
+            existing = await coll.index_information()
+            # Match on key pattern, not name, so equivalent indexes count as present.
+            present = [[(field, int(order)) for field, order in info.get("key", [])] for info in existing.values()]
+            missing = [name for name, keys, _ in specs if list(keys) not in present]
+            unused = []
+            try:
+                async for row in coll.aggregate([{"$indexStats": {}}]):
+                    if row.get("name") != "_id_" and int((row.get("accesses") or {}).get("ops", 0)) == 0:
+                        unused.append(row.get("name"))
+            except Exception:
+                # $indexStats needs clusterMonitor-like privileges on some deployments.
+                unused = None
+            report[collection] = {"indexes": sorted(existing), "missing": missing, "unused": unused}
+        self.index_report = report
+        return report
+
+# --------------------- Stats ------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        compression = self._codec.stats() if self._codec.enabled else {"enabled": False}
+        if self.use_mongo:
+            return {
+                "backend": "mongo",
+                "indexes": self.index_report,
+                "write_behind": self._writes.stats() if self._writes is not None else {"enabled": False},
+                "text_compression": compression,
+            }
+        return {"backend": self.backend, **self._memory.stats(), "text_compression": compression}
+
 
         
\ No newline at end of file
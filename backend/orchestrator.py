@@ -177,18 +177,87 @@ from agents.developer import DeveloperAgent
 from agents.automation import AutomationAgent
 from agents.confidence import ConfidenceAgent
 
+import asyncio
+import hashlib
+
+import deadline
+import tiers
+from config import PIPELINE_DEVELOPER_WAITS_FOR_RESEARCH
+from events import emit, stage
+from llm_cache import is_sentinel
+from pipeline import Pipeline
 from utils import format_email_content
 
 
+# Keywords used to route confidence issues back to the stage that can fix them.
+# The Writer always re-runs on a refinement iteration.
+_RESEARCH_ISSUE_HINTS = (
+    "fact", "claim", "unsupported", "evidence", "source", "citation", "cite",
+    "data", "statistic", "number", "figure", "date", "outdated", "inaccura",
+    "incorrect", "verify", "unverified", "hallucinat",
+)
+_DEVELOPER_ISSUE_HINTS = (
+    "diagram", "mermaid", "technical", "architecture", "code", "implementation",
+    "outline", "structure", "workflow", "flowchart",
+)
+
+
+def _stages_affected_by(issues) -> set[str]:
+    """Which upstream stages (research/developer) the reported issues point at."""
+    affected = set()
+    for issue in issues or []:
+        text = str(issue).lower()
+        if any(hint in text for hint in _RESEARCH_ISSUE_HINTS):
+            affected.add("research")
+        if any(hint in text for hint in _DEVELOPER_ISSUE_HINTS):
+            affected.add("developer")
+    return affected
+
+
+def _fingerprint(value) -> str:
+    return hashlib.sha256(str(value).encode("utf-8")).hexdigest()
+
+
+# Field of each stage's output that holds its LLM text; a sentinel there means
+# the stage did not complete and must not be checkpointed.
+_STAGE_TEXT_FIELDS = {"research": "summary", "developer": "mermaid", "writer": "document"}
+
+
+def _checkpoint_state(checkpoints) -> tuple[dict, set, int]:
+    """Latest output per stage, the stages completed in the latest iteration, and that iteration."""
+    latest = max((int(c.get("iteration") or 0) for c in checkpoints), default=0)
+    outputs, completed = {}, set()
+    for checkpoint in checkpoints:
+        if checkpoint.get("output") is not None:
+            outputs[checkpoint["stage"]] = checkpoint["output"]
+        if int(checkpoint.get("iteration") or 0) == latest:
+            completed.add(checkpoint["stage"])
+    return outputs, completed, latest
+
+
+# One iteration as a stage DAG (see pipeline.py): the Writer needs both
+# upstream stages; the Developer overlaps with Research unless configured to wait.
+ITERATION_PIPELINE = [
+    {"name": "research"},
+    {"name": "developer", "deps": ["research"] if PIPELINE_DEVELOPER_WAITS_FOR_RESEARCH else []},
+    {"name": "writer", "deps": ["research", "developer"]},
+]
+
+
 class Orchestrator:
     """Multi-agent pipeline: CEO -> Research -> Developer -> Writer.
 
-    This orchestrator is intentionally sequential to enforce handoff order:
+    Each iteration runs ITERATION_PIPELINE on the DAG scheduler in pipeline.py:
     - CEO produces one task per agent
-    - Research executes first
-    - Developer uses research output to create technical artifacts
+    - Research and Developer run concurrently; the Developer uses the previous
+      iteration's research (or waits for this one's when
+      PIPELINE_DEVELOPER_WAITS_FOR_RESEARCH is on)
     - Writer uses research + developer output to draft the final response
 
+    The run's quality tier (see tiers.py) picks the stages and the iteration
+    limit: the fast tier plans and researches in one CEO call, skips the
+    Developer and confidence scoring, and drafts once.
+
     Email sending is intentionally not performed.
     """
 
@@ -201,64 +270,191 @@ class Orchestrator:
         self.confidence = ConfidenceAgent("Confidence", memory)
         self.memory = memory
 
-    async def run(self, goal: str, email_target: str | None = None, max_iterations: int = 3):
+    async def run(
+        self,
+        goal: str,
+        email_target: str | None = None,
+        max_iterations: int | None = None,
+        tier: str | None = None,
+    ):
+        tier = tiers.resolve_tier(tier)
         # 1) Create session (email is optional and not used for sending)
-        session_id = await self.memory.create_session(goal, email_target)
+        session_id = await self.memory.create_session(goal, email_target, tier)
+        try:
+            return await self._run_session(session_id, goal, email_target, max_iterations, tier)
+        except asyncio.CancelledError:
+            # Client went away (or the job was cancelled): stop, but record it.
+            await self.memory.finish_session(session_id, "cancelled")
+            raise
+        except Exception:
+            # Don't leave the session "running" after an unexpected error.
+            await self.memory.finish_session(session_id, "failed")
+            raise
+
+    async def _run_session(
+        self, session_id: str, goal: str, email_target: str | None, max_iterations: int | None, tier: str
+    ):
+        settings = tiers.settings(tier)
+        max_iterations = max_iterations or settings["max_iterations"]
+        research_result = None
 
-        # 2) CEO handoff plan: exactly Research -> Developer -> Writer
-        plan = await self.ceo.create_plan(goal)
-        await self.memory.save_plan(session_id, plan)
+        # 2) CEO handoff plan: exactly Research -> Developer -> Writer, or for
+        # the fast tier a Writer plan plus research from the same call.
+        if settings["combined_research"]:
+            with stage("ceo_and_research"):
+                combined = await self.ceo.create_plan_and_research(goal)
+                plan = {"goal": combined.get("goal"), "tasks": combined.get("tasks", [])}
+                research_result = combined.get("research", {})
+                await self.memory.save_plan(session_id, plan)
+                await self.memory.save_research(session_id, research_result)
+            await self._checkpoint(session_id, "research", research_result, 1)
+        else:
+            with stage("ceo"):
+                plan = await self.ceo.create_plan(goal)
+                await self.memory.save_plan(session_id, plan)
 
         # 3) Execute pipeline with feedback loop until confidence >= 90%
         tasks = plan.get("tasks", []) or []
         research_task = next((t.get("description") for t in tasks if t.get("assigned_agent") == "Research"), None)
         developer_task = next((t.get("description") for t in tasks if t.get("assigned_agent") == "Developer"), None)
         writer_task = next((t.get("description") for t in tasks if t.get("assigned_agent") == "Writer"), None)
+        if settings["combined_research"]:
+            research_task = None  # already researched by the CEO call
+        if not settings["developer"]:
+            developer_task = None
 
-        research_result = None
         developer_result = None
         final_doc = None
         confidence_result = {"confidence_score": 40, "source": "fallback"}
         iteration = 0
         hallucination_issues = None
-
-        # FEEDBACK LOOP: Keep iterating until confidence >= 90% or max iterations reached
-        while iteration < max_iterations:
-            iteration += 1
-            print(f"🔄 Iteration {iteration}/{max_iterations}")
-
-            # Research phase (with optional hallucination feedback)
-            if research_task:
-                research_input = str(research_task)
-                if hallucination_issues:
-                    research_input = (
-                        f"{research_task}\n\n"
-                        f"⚠️ Previous hallucination issues found - please research these thoroughly:\n"
-                        f"{chr(10).join(f'- {issue}' for issue in hallucination_issues)}"
-                    )
-                research_result = await self.research.run_research(research_input)
-                await self.memory.save_research(session_id, research_result)
-
-            # Developer phase (using refreshed research)
-            if developer_task:
-                dev_instructions = str(developer_task)
-                if research_result:
-                    dev_instructions = (
-                        f"{dev_instructions}\n\n"
-                        f"Context from Research (use if helpful):\n{research_result}"
-                    )
+        affected = {"research", "developer"}
+        # Stage reuse across iterations: input fingerprints of the last run of
+        # each stage, plus the last scored document.
+        research_input_hash = None
+        developer_input_hash = None
+        scored_doc_hash = None
+        # Stage outputs of the previous iteration, and outputs already saved in
+        # this one: a retried node reuses those instead of saving a second record.
+        previous = {}
+        saved = {}
+
+        # Research phase (with optional hallucination feedback)
+        async def run_research(_inputs):
+            nonlocal research_input_hash
+            research_result = previous.get("research")
+            if not research_task:
+                return research_result
+            research_input = str(research_task)
+            if hallucination_issues and "research" in affected:
+                research_input = (
+                    f"{research_task}\n\n"
+                    f"⚠️ Previous hallucination issues found - please research these thoroughly:\n"
+                    f"{chr(10).join(f'- {issue}' for issue in hallucination_issues)}"
+                )
+            input_hash = _fingerprint(research_input)
+            if research_result is not None and input_hash == research_input_hash:
+                print("♻️ Research input unchanged. Reusing previous research.")
+                emit("stage", stage="research", status="reused", iteration=iteration)
+                await self._checkpoint(session_id, "research", None, iteration)
+                return research_result
+            if not deadline.has_time(2):  # research + writer
+                deadline.skip("research")
+                emit("stage", stage="research", status="skipped", iteration=iteration)
+                return research_result
+            if saved.get("research", (None,))[0] == iteration:
+                research_result = saved["research"][1]
+            else:
+                with stage("research", iteration=iteration):
+                    research_result = await self.research.run_research(research_input)
+                    await self.memory.save_research(session_id, research_result)
+                saved["research"] = (iteration, research_result)
+            research_input_hash = input_hash
+            await self._checkpoint(session_id, "research", research_result, iteration)
+            return research_result
+
+        # Developer phase: refreshed research when it depends on Research,
+        # otherwise the previous iteration's research (none on the first pass).
+        async def run_developer(inputs):
+            nonlocal developer_input_hash
+            developer_result = previous.get("developer")
+            research_result = inputs.get("research", previous.get("research"))
+            if not developer_task:
+                return developer_result
+            dev_instructions = str(developer_task)
+            if research_result:
+                dev_instructions = (
+                    f"{dev_instructions}\n\n"
+                    f"Context from Research (use if helpful):\n{research_result}"
+                )
+            if hallucination_issues and "developer" in affected:
+                dev_instructions = (
+                    f"{dev_instructions}\n\n"
+                    f"Fix these issues found in the previous draft:\n"
+                    f"{chr(10).join(f'- {issue}' for issue in hallucination_issues)}"
+                )
+            input_hash = _fingerprint(dev_instructions)
+            if developer_result is not None and input_hash == developer_input_hash:
+                print("♻️ Developer input unchanged. Reusing previous artifact.")
+                emit("stage", stage="developer", status="reused", iteration=iteration)
+                await self._checkpoint(session_id, "developer", None, iteration)
+                return developer_result
+            if not deadline.has_time(2):  # developer + writer
+                deadline.skip("developer")
+                emit("stage", stage="developer", status="skipped", iteration=iteration)
+                return developer_result
+            with stage("developer", iteration=iteration):
                 developer_result = await self.developer.generate_diagram(dev_instructions)
+            developer_input_hash = input_hash
+            await self._checkpoint(session_id, "developer", developer_result, iteration)
+            return developer_result
 
-            # Writer phase (using refreshed developer output)
+        # Writer phase (using refreshed research and developer output)
+        async def run_writer(inputs):
+            previous_doc = previous.get("writer")
             brief = (writer_task or "Draft a final response for the user.").strip()
             brief = (
                 f"User goal:\n{goal}\n\n"
                 f"Writing task:\n{brief}\n\n"
-                f"Research output (authoritative context):\n{research_result}\n\n"
-                f"Developer output (technical artifacts):\n{developer_result}\n"
+                f"Research output (authoritative context):\n{inputs['research']}\n\n"
+                f"Developer output (technical artifacts):\n{inputs['developer']}\n"
             )
-            final_doc = await self.writer.write_document(brief)
-            await self.memory.save_document(session_id, final_doc)
+            if hallucination_issues and previous_doc:
+                brief = (
+                    f"{brief}\n"
+                    f"Previous draft:\n{previous_doc.get('document', '')}\n\n"
+                    f"Fix these issues found in the previous draft:\n"
+                    f"{chr(10).join(f'- {issue}' for issue in hallucination_issues)}\n"
+                )
+            if saved.get("writer", (None,))[0] == iteration:
+                final_doc = saved["writer"][1]
+            else:
+                with stage("writer", iteration=iteration):
+                    final_doc = await self.writer.write_document(brief)
+                    await self.memory.save_document(session_id, final_doc)
+                saved["writer"] = (iteration, final_doc)
+            await self._checkpoint(session_id, "writer", final_doc, iteration)
+            return final_doc
+
+        pipeline = Pipeline.from_spec(
+            ITERATION_PIPELINE,
+            {"research": run_research, "developer": run_developer, "writer": run_writer},
+        )
+
+        # FEEDBACK LOOP: Keep iterating until confidence >= 90% or max iterations reached
+        while iteration < max_iterations:
+            if iteration > 0 and not deadline.has_time(2):  # writer + confidence
+                deadline.skip("refinement")
+                break
+            iteration += 1
+            print(f"🔄 Iteration {iteration}/{max_iterations}")
+
+            # On refinement iterations only the stages the issues point at re-run;
+            # the Writer always re-drafts with the issues in its brief.
+            affected = _stages_affected_by(hallucination_issues) if iteration > 1 else {"research", "developer"}
+            previous = {"research": research_result, "developer": developer_result, "writer": final_doc}
+            outputs = await pipeline.run()
+            research_result, developer_result, final_doc = outputs["research"], outputs["developer"], outputs["writer"]
 
             # Check if we hit rate limits - if so, break the loop
             doc_content = (final_doc or {}).get("document", "")
@@ -275,13 +471,40 @@ class Orchestrator:
                 }
                 break
 
+            if not settings["confidence"]:
+                confidence_result = {
+                    "confidence_score": None,
+                    "confidence_source": "skipped",
+                    "hallucination_summary": f"Not scored - {tier} tier",
+                }
+                break
+
+            # A document identical to the one already scored keeps its score;
+            # re-running the loop on it again could not change anything.
+            doc_hash = _fingerprint(doc_content)
+            if doc_hash == scored_doc_hash:
+                print("♻️ Document unchanged since last iteration. Skipping confidence re-scoring.")
+                emit("stage", stage="confidence", status="reused", iteration=iteration)
+                break
+
+            if not deadline.has_time(1):
+                deadline.skip("confidence")
+                emit("stage", stage="confidence", status="skipped", iteration=iteration)
+                confidence_result = {
+                    "confidence_score": 40,
+                    "confidence_source": "fallback",
+                    "hallucination_summary": "Not scored - run deadline reached",
+                }
+                break
+
             # Confidence & Hallucination Check (only if document is valid)
             confidence_result = {"confidence_score": 40, "source": "fallback"}
             try:
-                confidence_result = await self.confidence.evaluate_and_store(
-                    session_id,
-                    doc_content,
-                )
+                with stage("confidence", iteration=iteration):
+                    confidence_result = await self.confidence.evaluate_and_store(
+                        session_id,
+                        doc_content,
+                    )
             except Exception as e:
                 print(f"⚠️ Confidence evaluation failed: {e}")
                 confidence_result = {"confidence_score": 40, "source": "fallback", "error": str(e)}
@@ -299,6 +522,9 @@ class Orchestrator:
                             "hallucination_summary": "Skipped due to rate limiting",
                         }
 
+            if confidence_result.get("confidence_source") == "llm":
+                scored_doc_hash = doc_hash
+
             confidence_score = confidence_result.get("confidence_score", 40)
             hallucination_risk_score = confidence_result.get("hallucination_risk_score", 50)
             print(f"📊 Confidence Score: {confidence_score}/100 | Hallucination Risk: {hallucination_risk_score}/100")
@@ -354,8 +580,14 @@ class Orchestrator:
                     },
                 )
 
-        return {
+        status = "rate_limited" if confidence_result.get("error") == "LLM_RATE_LIMITED" else "completed"
+        if deadline.remaining() is not None and deadline.remaining() <= 0:
+            status = "deadline_exceeded"
+        await self.memory.finish_session(session_id, status, confidence_result.get("confidence_score"))
+
+        result = {
             "session_id": session_id,
+            "tier": tier,
             "plan": plan,
             "handoff": {
                 "research": research_result,
@@ -370,12 +602,37 @@ class Orchestrator:
                 "result": email_result,
             },
         }
+        if deadline.skipped_stages():
+            result["skipped_stages"] = deadline.skipped_stages()
+        return result
+
+    async def _checkpoint(self, session_id: str, stage_name: str, output, iteration: int) -> None:
+        """Record a completed stage; `output=None` marks a reused earlier output."""
+        if output is not None:
+            text = (output or {}).get(_STAGE_TEXT_FIELDS[stage_name]) if isinstance(output, dict) else None
+            if is_sentinel(text):
+                return
+        await self.memory.save_checkpoint(session_id, stage_name, output, iteration)
 
     async def resume(self, session_id: str):
         """Compatibility endpoint for the existing /approve API.
 
-        Re-runs Writer using the latest saved plan + saved research.
+        Picks up at the first stage without a checkpoint in the session's
+        latest iteration; earlier stages reuse their checkpointed output, later
+        ones re-run. Sessions saved before checkpoints reuse their stored research.
+        Only the stages of the session's tier run.
         """
+        try:
+            return await self._resume_session(session_id)
+        except asyncio.CancelledError:
+            # Client went away: stop, but record it.
+            await self.memory.finish_session(session_id, "cancelled")
+            raise
+        except Exception:
+            await self.memory.finish_session(session_id, "failed")
+            raise
+
+    async def _resume_session(self, session_id: str):
         plan = await self.memory.get_latest_plan(session_id)
         if not plan:
             return {
@@ -384,29 +641,80 @@ class Orchestrator:
                 "message": "No plan found for session. Cannot resume.",
             }
 
-        research_results = await self.memory.get_research(session_id)
+        session = await self.memory.get_session(session_id) or {}
+        tier = tiers.resolve_tier(session.get("tier"))
+        settings = tiers.settings(tier)
+        checkpoints = await self.memory.get_checkpoints(session_id)
+        outputs, completed, iteration = _checkpoint_state(checkpoints)
+        iteration = iteration or 1
         tasks = plan.get("tasks", []) or []
+        research_task = next((t.get("description") for t in tasks if t.get("assigned_agent") == "Research"), None)
         writer_task = next((t.get("description") for t in tasks if t.get("assigned_agent") == "Writer"), None)
         developer_task = next((t.get("description") for t in tasks if t.get("assigned_agent") == "Developer"), None)
+        if settings["combined_research"]:
+            research_task = None  # researched by the CEO call
+        if not settings["developer"]:
+            developer_task = None
+
+        # Once a stage re-runs, every stage after it re-runs too.
+        resumed_from = None
+
+        def reusable(stage_name: str) -> bool:
+            if resumed_from is None and stage_name in completed and stage_name in outputs:
+                print(f"♻️ {stage_name.capitalize()} already completed. Reusing checkpoint.")
+                emit("stage", stage=stage_name, status="reused")
+                return True
+            return False
+
+        if reusable("research"):
+            research_results = outputs["research"]
+        elif not checkpoints or settings["combined_research"]:
+            research_results = await self.memory.get_research(session_id)
+        else:
+            research_results = None
+            if research_task:
+                resumed_from = "research"
+                with stage("research"):
+                    research_results = await self.research.run_research(str(research_task))
+                    await self.memory.save_research(session_id, research_results)
+                await self._checkpoint(session_id, "research", research_results, iteration)
 
         developer_result = None
         if developer_task:
-            dev_instructions = str(developer_task)
-            if research_results:
-                dev_instructions = f"{dev_instructions}\n\nContext from Research:\n{research_results}"
-            developer_result = await self.developer.generate_diagram(dev_instructions)
-
-        brief = (
-            f"Writing task:\n{(writer_task or 'Draft the final response.')}\n\n"
-            f"Research output:\n{research_results}\n\n"
-            f"Developer output:\n{developer_result}\n"
-        )
-        final_doc = await self.writer.write_document(brief)
-        await self.memory.save_document(session_id, final_doc)
+            if reusable("developer"):
+                developer_result = outputs["developer"]
+            else:
+                resumed_from = resumed_from or "developer"
+                dev_instructions = str(developer_task)
+                if research_results:
+                    dev_instructions = f"{dev_instructions}\n\nContext from Research:\n{research_results}"
+                with stage("developer"):
+                    developer_result = await self.developer.generate_diagram(dev_instructions)
+                await self._checkpoint(session_id, "developer", developer_result, iteration)
+
+        if reusable("writer"):
+            final_doc = outputs["writer"]
+        else:
+            resumed_from = resumed_from or "writer"
+            brief = (
+                f"Writing task:\n{(writer_task or 'Draft the final response.')}\n\n"
+                f"Research output:\n{research_results}\n\n"
+                f"Developer output:\n{developer_result}\n"
+            )
+            with stage("writer"):
+                final_doc = await self.writer.write_document(brief)
+                await self.memory.save_document(session_id, final_doc)
+            await self._checkpoint(session_id, "writer", final_doc, iteration)
+
+        doc_content = str((final_doc or {}).get("document", ""))
+        status = "rate_limited" if "__LLM_RATE_LIMITED__" in doc_content else "completed"
+        await self.memory.finish_session(session_id, status)
 
         return {
             "session_id": session_id,
+            "tier": tier,
             "plan": plan,
+            "resumed_from": resumed_from,
             "handoff": {
                 "research": research_results,
                 "developer": developer_result,
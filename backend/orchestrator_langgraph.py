@@ -1,7 +1,7 @@
 from __future__ import annotations
 
-from typing import TypedDict, Optional, Dict, Any
 import asyncio
+from typing import TypedDict, Optional, Dict, Any, Tuple
 
 from langgraph.graph import StateGraph, END
 
@@ -12,6 +12,15 @@ from agents.developer import DeveloperAgent
 from agents.automation import AutomationAgent
 from agents.confidence import ConfidenceAgent
 from agents.reviewer import ReviewerAgent
+import deadline
+import tiers
+from config import (
+    QUALITY_ACCEPT_CONFIDENCE,
+    QUALITY_ACCEPT_MAX_RISK,
+    QUALITY_REWRITE_BELOW_CONFIDENCE,
+)
+from events import emit, stage
+from llm_cache import is_sentinel
 from utils import format_email_content
 
 
@@ -19,19 +28,70 @@ class PipelineState(TypedDict, total=False):
     session_id: str
     goal: str
     email: Optional[str]
+    tier: str
     plan: Dict[str, Any]
     research: Dict[str, Any]
     developer: Dict[str, Any]
     writer: Dict[str, Any]
     confidence: Dict[str, Any]
     reviewer: Dict[str, Any]
+    writer_passes: int
+    # Checkpointed node outputs by (node, writer pass), replayed on resume.
+    replay: Dict[Tuple[str, int], Dict[str, Any]]
+
+
+def _completed(name: str, update: Dict[str, Any]) -> bool:
+    """Whether a node's output can be checkpointed (no LLM failure, a real score)."""
+    if not update or is_sentinel(str(update)):
+        return False
+    if name == "validation":
+        return (update.get("confidence") or {}).get("confidence_source") == "llm"
+    return True
+
+
+def _route_after_research(state: PipelineState) -> str:
+    return "developer" if tiers.settings(state.get("tier"))["developer"] else "writer"
+
+
+def _route_after_writer(state: PipelineState) -> str:
+    return "validation" if tiers.settings(state.get("tier"))["confidence"] else "end"
+
+
+def _route_after_validation(state: PipelineState) -> str:
+    """Quality gate: finish, send the draft back to the Writer, or review it."""
+    doc_content = str((state.get("writer") or {}).get("document", ""))
+    if "__LLM_RATE_LIMITED__" in doc_content or "__LLM_UNAVAILABLE__" in doc_content:
+        # Nothing a reviewer could repair; surface the sentinel as-is.
+        return "end"
+
+    conf = state.get("confidence") or {}
+    score = conf.get("confidence_score", 40)
+    risk = conf.get("hallucination_risk_score", 50)
+    issues = conf.get("hallucination_issues") or []
+    if score >= QUALITY_ACCEPT_CONFIDENCE and risk < QUALITY_ACCEPT_MAX_RISK and not issues:
+        return "end"
+    if not deadline.has_time(1):
+        deadline.skip("reviewer")
+        return "end"
+    if (
+        conf.get("confidence_source") == "llm"
+        and score < QUALITY_REWRITE_BELOW_CONFIDENCE
+        and state.get("writer_passes", 1) < tiers.settings(state.get("tier"))["max_writer_passes"]
+    ):
+        return "writer"
+    return "reviewer"
 
 
 class LangGraphOrchestrator:
     """Graph-based multi-agent pipeline using LangGraph.
 
-    Simplified flow: CEO+Research -> Developer -> Writer
-    (No confidence/hallucination stage)
+    Flow: CEO+Research -> Developer -> Writer -> Validation, then a quality gate:
+    well-scored drafts finish, very weak drafts go back to the Writer with the
+    issues, and the rest go through the Reviewer. Pacing between LLM calls comes
+    from the per-key rate limiter (see rate_limiter.py), not from fixed sleeps.
+
+    The fast tier (see tiers.py) goes straight from CEO+Research to the Writer
+    and finishes there; thorough allows one more Writer pass at the gate.
     """
 
     def __init__(self, memory):
@@ -47,6 +107,28 @@ class LangGraphOrchestrator:
         # Build graph once
         self.app = self._build_graph()
 
+    def _checkpointed(self, name: str, node):
+        """Wrap a graph node: stage events, a checkpoint once it completes, and replay on resume.
+
+        Nodes are keyed by the Writer pass they run in, so a resumed run replays
+        exactly the nodes that completed and re-runs from the first one that did
+        not; after that nothing is replayed.
+        """
+
+        async def run_node(state: PipelineState) -> PipelineState:
+            passes = state.get("writer_passes", 0)
+            replayed = (state.get("replay") or {}).get((name, passes))
+            if replayed is not None:
+                emit("stage", stage=name, status="reused")
+                return replayed
+            with stage(name):
+                update = await node(state)
+            if _completed(name, update):
+                await self.memory.save_checkpoint(state["session_id"], name, update, passes)
+            return {**update, "replay": {}}
+
+        return run_node
+
     def _build_graph(self):
         graph = StateGraph(PipelineState)
 
@@ -73,16 +155,22 @@ class LangGraphOrchestrator:
             return {"plan": plan, "research": research}
 
         async def node_validation(state: PipelineState) -> PipelineState:
-            # Delay between transitions
-            await asyncio.sleep(2)
             doc_content = ((state.get("writer") or {}).get("document", ""))
+            if not deadline.has_time(1):
+                deadline.skip("validation")
+                return {"confidence": {
+                    "confidence_score": 40,
+                    "confidence_source": "fallback",
+                    "hallucination_summary": "Not scored - run deadline reached",
+                }}
             # Use Key 1 only for combined confidence + hallucination
             combined = await self.confidence.evaluate_and_store(state["session_id"], doc_content, key_index=0)
             return {"confidence": combined}
 
         async def node_developer(state: PipelineState) -> PipelineState:
-            # Delay between transitions
-            await asyncio.sleep(2)
+            if not deadline.has_time(2):  # developer + writer
+                deadline.skip("developer")
+                return {}
             tasks = (state.get("plan", {}) or {}).get("tasks", [])
             dev_task = next((t.get("description") for t in tasks if t.get("assigned_agent") == "Developer"), None)
             instructions = dev_task or "Create a concise technical outline or mermaid diagram."
@@ -95,8 +183,6 @@ class LangGraphOrchestrator:
             return {"developer": dev_result}
 
         async def node_writer(state: PipelineState) -> PipelineState:
-            # Delay between transitions
-            await asyncio.sleep(2)
             tasks = (state.get("plan", {}) or {}).get("tasks", [])
             writer_task = next((t.get("description") for t in tasks if t.get("assigned_agent") == "Writer"), None)
             brief = (writer_task or "Draft a final response for the user.").strip()
@@ -106,14 +192,23 @@ class LangGraphOrchestrator:
                 f"Research output (authoritative context):\n{state.get('research')}\n\n"
                 f"Developer output (technical artifacts):\n{state.get('developer')}\n"
             )
+            # Sent back by the quality gate: rewrite the previous draft.
+            issues = (state.get("confidence") or {}).get("hallucination_issues") or []
+            if state.get("writer") and issues:
+                brief = (
+                    f"{brief}\n"
+                    f"Previous draft:\n{state['writer'].get('document', '')}\n\n"
+                    f"Fix these issues found in the previous draft:\n"
+                    + "\n".join(f"- {x}" for x in issues)
+                    + "\n"
+                )
             # Use API key 3 (index 2)
             doc = await self.writer.write_document(brief, key_index=2)
             await self.memory.save_document(state["session_id"], doc)
-            return {"writer": doc}
+            return {"writer": doc, "writer_passes": state.get("writer_passes", 0) + 1}
 
         async def node_reviewer(state: PipelineState) -> PipelineState:
             """Reviewer node to fix issues identified by confidence agent."""
-            await asyncio.sleep(2)
             doc_content = ((state.get("writer") or {}).get("document", ""))
             conf = state.get("confidence") or {}
             issues = conf.get("hallucination_issues") or []
@@ -130,29 +225,57 @@ class LangGraphOrchestrator:
             return {"reviewer": revised_doc, "writer": revised_doc}
 
         # Register nodes
-        graph.add_node("ceo_and_research", node_ceo_and_research)
-        graph.add_node("developer", node_developer)
-        graph.add_node("writer", node_writer)
-        graph.add_node("validation", node_validation)
-        graph.add_node("reviewer", node_reviewer)
-
-        # Linear handoff
-        graph.add_edge("ceo_and_research", "developer")
+        graph.add_node("ceo_and_research", self._checkpointed("ceo_and_research", node_ceo_and_research))
+        graph.add_node("developer", self._checkpointed("developer", node_developer))
+        graph.add_node("writer", self._checkpointed("writer", node_writer))
+        graph.add_node("validation", self._checkpointed("validation", node_validation))
+        graph.add_node("reviewer", self._checkpointed("reviewer", node_reviewer))
+
+        # Linear handoff up to validation (minus the stages the tier skips),
+        # then the quality gate
+        graph.add_conditional_edges(
+            "ceo_and_research",
+            _route_after_research,
+            {"developer": "developer", "writer": "writer"},
+        )
         graph.add_edge("developer", "writer")
-        graph.add_edge("writer", "validation")
-        graph.add_edge("validation", "reviewer")
+        graph.add_conditional_edges(
+            "writer",
+            _route_after_writer,
+            {"validation": "validation", "end": END},
+        )
+        graph.add_conditional_edges(
+            "validation",
+            _route_after_validation,
+            {"end": END, "writer": "writer", "reviewer": "reviewer"},
+        )
         graph.add_edge("reviewer", END)
 
         graph.set_entry_point("ceo_and_research")
         return graph.compile()
 
-    async def run(self, goal: str, email_target: Optional[str] = None) -> Dict[str, Any]:
+    async def run(self, goal: str, email_target: Optional[str] = None, tier: Optional[str] = None) -> Dict[str, Any]:
         # Create session and initial state
-        session_id = await self.memory.create_session(goal, email_target)
-        initial: PipelineState = {"session_id": session_id, "goal": goal, "email": email_target}
+        tier = tiers.resolve_tier(tier)
+        session_id = await self.memory.create_session(goal, email_target, tier)
+        initial: PipelineState = {
+            "session_id": session_id,
+            "goal": goal,
+            "email": email_target,
+            "tier": tier,
+        }
 
         # Execute the graph (async)
-        final_state: PipelineState = await self.app.ainvoke(initial)
+        try:
+            final_state: PipelineState = await self.app.ainvoke(initial)
+        except asyncio.CancelledError:
+            # Client went away (or the job was cancelled): stop, but record it.
+            await self.memory.finish_session(session_id, "cancelled")
+            raise
+        except Exception:
+            # Don't leave the session "running" after an unexpected error.
+            await self.memory.finish_session(session_id, "failed")
+            raise
 
         # Print confidence & hallucination metrics at the end (if available)
         conf = final_state.get("confidence") or {}
@@ -203,8 +326,59 @@ class LangGraphOrchestrator:
                     },
                 )
 
-        return {
+        await self._finish(session_id, final_state)
+        return self._result(session_id, final_state, email_target, email_result)
+
+    async def resume(self, session_id: str) -> Dict[str, Any]:
+        """Re-run a session's graph from its first incomplete node (used by /approve).
+
+        Nodes the earlier run checkpointed in MemoryStore are replayed instead
+        of calling the LLM again. The retry runs at the session's tier.
+        """
+        session = await self.memory.get_session(session_id)
+        if not session:
+            return {
+                "session_id": session_id,
+                "status": "ERROR",
+                "message": "Session not found. Cannot resume.",
+            }
+        replay = {
+            (c["stage"], int(c.get("iteration") or 0)): c["output"]
+            for c in await self.memory.get_checkpoints(session_id)
+            if c.get("output") is not None
+        }
+        initial: PipelineState = {
+            "session_id": session_id,
+            "goal": session.get("goal", ""),
+            "email": session.get("email"),
+            "tier": tiers.resolve_tier(session.get("tier")),
+            "replay": replay,
+        }
+        try:
+            final_state: PipelineState = await self.app.ainvoke(initial)
+        except asyncio.CancelledError:
+            # Client went away: stop, but record it.
+            await self.memory.finish_session(session_id, "cancelled")
+            raise
+        except Exception:
+            await self.memory.finish_session(session_id, "failed")
+            raise
+        await self._finish(session_id, final_state)
+        return self._result(session_id, final_state, None, None)
+
+    async def _finish(self, session_id: str, final_state: PipelineState) -> None:
+        conf = final_state.get("confidence") or {}
+        doc_content = str((final_state.get("writer") or {}).get("document", ""))
+        status = "rate_limited" if "__LLM_RATE_LIMITED__" in doc_content else "completed"
+        if deadline.remaining() is not None and deadline.remaining() <= 0:
+            status = "deadline_exceeded"
+        await self.memory.finish_session(session_id, status, conf.get("confidence_score"))
+
+    @staticmethod
+    def _result(session_id: str, final_state: PipelineState, email_target: Optional[str], email_result) -> Dict[str, Any]:
+        result = {
             "session_id": session_id,
+            "tier": final_state.get("tier"),
             "plan": final_state.get("plan"),
             "handoff": {
                 "research": final_state.get("research"),
@@ -218,6 +392,16 @@ class LangGraphOrchestrator:
                 "to": email_target,
                 "result": email_result,
             },
-            # Place confidence at the end so it appears last in JSON
-            "confidence": final_state.get("confidence"),
         }
+        if deadline.skipped_stages():
+            result["skipped_stages"] = deadline.skipped_stages()
+        # Place confidence at the end so it appears last in JSON
+        confidence = final_state.get("confidence")
+        if confidence is None and not tiers.settings(final_state.get("tier"))["confidence"]:
+            confidence = {
+                "confidence_score": None,
+                "confidence_source": "skipped",
+                "hallucination_summary": f"Not scored - {final_state.get('tier')} tier",
+            }
+        result["confidence"] = confidence
+        return result
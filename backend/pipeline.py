@@ -0,0 +1,133 @@
+"""Declarative DAG pipelines with bounded parallelism.
+
+A pipeline is a list of node specs, each naming a handler and the nodes it
+depends on:
+
+    [
+        {"name": "research"},
+        {"name": "developer", "deps": ["research"]},
+        {"name": "writer", "deps": ["research", "developer"], "timeout": 120},
+    ]
+
+`Pipeline.run` starts every node whose dependencies have finished, at most
+`parallelism` at a time, so independent nodes overlap instead of waiting in
+line. Each node gets a timeout and a number of retries, and is called with
+the outputs of its dependencies.
+
+A retry calls the handler again from the start. A handler with side effects
+(e.g. saving a record) must make them idempotent, so a retry after a partial
+attempt does not repeat them.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from config import PIPELINE_NODE_RETRIES, PIPELINE_NODE_TIMEOUT_SECONDS, PIPELINE_PARALLELISM
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class PipelineError(Exception):
+    """Raised when a node still fails (or times out) after its retries."""
+
+    def __init__(self, node: str, cause: BaseException):
+        detail = str(cause) or type(cause).__name__
+        super().__init__(f"Pipeline node '{node}' failed: {detail}")
+        self.node = node
+        self.cause = cause
+
+
+class Node:
+    def __init__(
+        self,
+        name: str,
+        handler: Handler,
+        deps: Iterable[str] = (),
+        timeout: Optional[float] = PIPELINE_NODE_TIMEOUT_SECONDS,
+        retries: int = PIPELINE_NODE_RETRIES,
+    ):
+        self.name = name
+        self.handler = handler
+        self.deps = tuple(deps)
+        # 0 / None: no timeout beyond the LLM client's own.
+        self.timeout = float(timeout) if timeout else None
+        self.retries = max(0, int(retries))
+
+    async def run(self, inputs: Dict[str, Any]) -> Any:
+        for attempt in range(self.retries + 1):
+            try:
+                if self.timeout is None:
+                    return await self.handler(inputs)
+                return await asyncio.wait_for(self.handler(inputs), self.timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if attempt >= self.retries:
+                    raise PipelineError(self.name, e) from e
+                print(f"⚠️ Pipeline node '{self.name}' failed ({e or type(e).__name__}). Retrying...")
+
+
+class Pipeline:
+    def __init__(self, nodes: List[Node], parallelism: int = PIPELINE_PARALLELISM):
+        self.nodes = {node.name: node for node in nodes}
+        if len(self.nodes) != len(nodes):
+            raise ValueError("Pipeline node names must be unique.")
+        for node in nodes:
+            unknown = [d for d in node.deps if d not in self.nodes]
+            if unknown:
+                raise ValueError(f"Pipeline node '{node.name}' depends on unknown nodes: {unknown}")
+        self._check_acyclic()
+        self.parallelism = max(1, int(parallelism))
+
+    @classmethod
+    def from_spec(cls, spec: List[Dict[str, Any]], handlers: Dict[str, Handler], **kwargs) -> "Pipeline":
+        """Build a pipeline from node specs; `handler` defaults to the node name."""
+        nodes = []
+        for item in spec:
+            options = {k: item[k] for k in ("timeout", "retries") if k in item}
+            handler = handlers[item.get("handler", item["name"])]
+            nodes.append(Node(item["name"], handler, item.get("deps", ()), **options))
+        return cls(nodes, **kwargs)
+
+    def _check_acyclic(self) -> None:
+        visiting, done = set(), set()
+
+        def visit(name: str) -> None:
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline has a dependency cycle through '{name}'.")
+            visiting.add(name)
+            for dep in self.nodes[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.nodes:
+            visit(name)
+
+    async def run(self) -> Dict[str, Any]:
+        """Run every node once. Returns node outputs by name.
+
+        The first node to fail cancels the rest and its PipelineError is raised.
+        """
+        results: Dict[str, Any] = {}
+        pending = dict(self.nodes)
+        running: Dict[asyncio.Task, str] = {}
+        try:
+            while pending or running:
+                ready = [n for n in pending.values() if all(d in results for d in n.deps)]
+                for node in ready[: self.parallelism - len(running)]:
+                    del pending[node.name]
+                    inputs = {d: results[d] for d in node.deps}
+                    running[asyncio.create_task(node.run(inputs))] = node.name
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    results[name] = task.result()
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+        return results
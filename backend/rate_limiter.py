@@ -0,0 +1,298 @@
+import asyncio
+import re
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Mapping, Optional
+
+from config import (
+    GROQ_CIRCUIT_COOLDOWN_SECONDS,
+    GROQ_CIRCUIT_FAILURE_THRESHOLD,
+    GROQ_EXPECTED_COMPLETION_TOKENS,
+    GROQ_HEDGE_MIN_SAMPLES,
+    GROQ_MAX_CONCURRENCY_PER_KEY,
+    GROQ_MIN_INTERVAL_SECONDS,
+    GROQ_RPM_PER_KEY,
+    GROQ_TPM_PER_KEY,
+)
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_reset_duration(value) -> Optional[float]:
+    """Parse Groq reset values like "7.66s", "2m59.56s", "1h2m" or "250ms" to seconds."""
+    if value is None:
+        return None
+    text = str(value).strip().lower()
+    if not text:
+        return None
+    try:
+        return max(0.0, float(text))
+    except ValueError:
+        pass
+
+    total = 0.0
+    matched = False
+    for amount, unit in _DURATION_PART.findall(text):
+        matched = True
+        amount = float(amount)
+        if unit == "h":
+            total += amount * 3600
+        elif unit == "m":
+            total += amount * 60
+        elif unit == "s":
+            total += amount
+        elif unit == "ms":
+            total += amount / 1000
+    return total if matched else None
+
+
+def estimate_tokens(prompt: str, system: str | None = None) -> int:
+    """Rough token estimate (~4 chars/token) plus the expected completion size."""
+    chars = len(prompt or "") + len(system or "")
+    return chars // 4 + GROQ_EXPECTED_COMPLETION_TOKENS
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `capacity` per minute."""
+
+    def __init__(self, capacity: float):
+        self.capacity = float(max(1, capacity))
+        self.refill_per_second = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+            self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        # Never ask for more than a full bucket, otherwise we would wait forever.
+        amount = min(float(amount), self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_second
+
+    def consume(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.tokens -= float(amount)
+
+    def set_remaining(self, remaining: float, now: float) -> None:
+        self._refill(now)
+        self.tokens = min(self.capacity, float(remaining))
+
+
+def _percentile(values, pct: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class KeyBudget:
+    """Request/token budgets, pacing, concurrency and health for one API key."""
+
+    def __init__(self, rpm: int, tpm: int, max_concurrency: int, min_interval: float):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.min_interval = max(0.0, float(min_interval or 0.0))
+        self.blocked_until = 0.0
+        self.last_request_at = 0.0
+        self.in_flight = 0
+        self._lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(max(1, max_concurrency))
+        # Health: rolling latencies of successful calls, rolling outcomes
+        # (True = error) and a circuit breaker that opens on throttling.
+        self.latencies: deque[float] = deque(maxlen=50)
+        self.outcomes: deque[bool] = deque(maxlen=20)
+        self.consecutive_failures = 0
+        self.circuit_open_until = 0.0
+
+    def wait_time(self, est_tokens: int, now: float | None = None) -> float:
+        now = time.monotonic() if now is None else now
+        return max(
+            0.0,
+            self.blocked_until - now,
+            (self.last_request_at + self.min_interval) - now if self.min_interval else 0.0,
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(est_tokens, now),
+        )
+
+    async def acquire(self, est_tokens: int) -> None:
+        # The lock only serializes callers of the SAME key.
+        async with self._lock:
+            while True:
+                wait = self.wait_time(est_tokens)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            now = time.monotonic()
+            self.requests.consume(1, now)
+            self.tokens.consume(est_tokens, now)
+            self.last_request_at = now
+
+    def observe_usage(self, est_tokens: int, used_tokens: int | None) -> None:
+        """Reconcile the estimate with the real token usage reported by the API."""
+        if used_tokens is None:
+            return
+        try:
+            delta = int(used_tokens) - int(est_tokens)
+        except Exception:
+            return
+        if delta:
+            self.tokens.consume(delta, time.monotonic())
+
+    def observe_headers(self, headers: Mapping[str, str] | None) -> None:
+        """Refill/block from Groq's x-ratelimit-* and retry-after response headers."""
+        if not headers:
+            return
+        now = time.monotonic()
+
+        retry_after = parse_reset_duration(headers.get("retry-after"))
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        if remaining_tokens is not None:
+            try:
+                self.tokens.set_remaining(float(remaining_tokens), now)
+            except ValueError:
+                pass
+
+        # x-ratelimit-*-requests is a daily budget on Groq; only honour it when exhausted.
+        for kind in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            reset = parse_reset_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            try:
+                exhausted = remaining is not None and float(remaining) <= 0
+            except ValueError:
+                exhausted = False
+            if exhausted and reset:
+                self.blocked_until = max(self.blocked_until, now + reset)
+
+    # ------------------------- health -------------------------
+
+    def record_success(self, latency: float) -> None:
+        self.latencies.append(latency)
+        self.outcomes.append(False)
+        self.consecutive_failures = 0
+
+    def record_failure(self, status: int | None = None) -> None:
+        """Count a failed call. 429s (and repeated failures) open the circuit."""
+        self.outcomes.append(True)
+        self.consecutive_failures += 1
+        now = time.monotonic()
+        if status == 429:
+            # Stay out for the reset window Groq told us about, or the default.
+            reset_at = max(self.blocked_until, now + GROQ_CIRCUIT_COOLDOWN_SECONDS)
+            self.circuit_open_until = max(self.circuit_open_until, reset_at)
+        elif self.consecutive_failures >= GROQ_CIRCUIT_FAILURE_THRESHOLD:
+            self.circuit_open_until = max(self.circuit_open_until, now + GROQ_CIRCUIT_COOLDOWN_SECONDS)
+
+    def circuit_open(self, now: float | None = None) -> bool:
+        now = time.monotonic() if now is None else now
+        return now < self.circuit_open_until
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return sum(self.outcomes) / len(self.outcomes)
+
+    def p50_latency(self) -> float | None:
+        return _percentile(self.latencies, 0.5)
+
+    def p95_latency(self) -> float | None:
+        """Observed p95, or None until enough samples exist to trust it."""
+        if len(self.latencies) < GROQ_HEDGE_MIN_SAMPLES:
+            return None
+        return _percentile(self.latencies, 0.95)
+
+    def health_score(self, est_tokens: int = 0) -> float:
+        """Expected seconds until a call on this key completes (lower is healthier)."""
+        latency = self.p50_latency() or 1.0
+        queued = self.in_flight * latency
+        return self.wait_time(est_tokens) + queued + latency * (1.0 + 4.0 * self.error_rate())
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        self.requests._refill(now)
+        self.tokens._refill(now)
+        p50 = self.p50_latency()
+        p95 = _percentile(self.latencies, 0.95)
+        return {
+            "requests_available": round(self.requests.tokens, 2),
+            "tokens_available": round(self.tokens.tokens, 1),
+            "blocked_for_seconds": round(max(0.0, self.blocked_until - now), 2),
+            "in_flight": self.in_flight,
+            "latency_p50": round(p50, 3) if p50 is not None else None,
+            "latency_p95": round(p95, 3) if p95 is not None else None,
+            "error_rate": round(self.error_rate(), 3),
+            "circuit_open_for_seconds": round(max(0.0, self.circuit_open_until - now), 2),
+        }
+
+
+class KeyRateLimiter:
+    """Registry of per-key budgets. Calls on different keys never wait on each other."""
+
+    def __init__(
+        self,
+        rpm: int = GROQ_RPM_PER_KEY,
+        tpm: int = GROQ_TPM_PER_KEY,
+        max_concurrency: int = GROQ_MAX_CONCURRENCY_PER_KEY,
+        min_interval: float = GROQ_MIN_INTERVAL_SECONDS,
+    ):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.min_interval = min_interval
+        self._budgets: Dict[str, KeyBudget] = {}
+
+    def budget(self, key: str) -> KeyBudget:
+        budget = self._budgets.get(key)
+        if budget is None:
+            budget = KeyBudget(self.rpm, self.tpm, self.max_concurrency, self.min_interval)
+            self._budgets[key] = budget
+        return budget
+
+    @asynccontextmanager
+    async def slot(self, key: str, est_tokens: int):
+        """Wait for the key's budget and a concurrency slot, then hold the slot."""
+        budget = self.budget(key)
+        async with budget._slots:
+            await budget.acquire(est_tokens)
+            budget.in_flight += 1
+            try:
+                yield budget
+            finally:
+                budget.in_flight -= 1
+
+    def wait_time(self, key: str, est_tokens: int = 0) -> float:
+        return self.budget(key).wait_time(est_tokens)
+
+    def soonest_available(self, keys: list[str], est_tokens: int = 0) -> float:
+        """Seconds until at least one of `keys` can take a call (budget and circuit)."""
+        if not keys:
+            return 0.0
+        now = time.monotonic()
+        return min(
+            max(self.budget(k).wait_time(est_tokens, now), self.budget(k).circuit_open_until - now, 0.0)
+            for k in keys
+        )
+
+    def rank(self, keys: list[str], est_tokens: int = 0) -> list[str]:
+        """Keys with a closed circuit, healthiest first (ties keep the given order)."""
+        now = time.monotonic()
+        closed = [k for k in keys if not self.budget(k).circuit_open(now)]
+        return sorted(closed, key=lambda k: self.budget(k).health_score(est_tokens))
+
+    def snapshot(self, keys: list[str]) -> dict:
+        # Keys are secrets: expose them by position only.
+        return {f"key_{i}": self.budget(k).snapshot() for i, k in enumerate(keys)}
+
+
+groq_limiter = KeyRateLimiter()
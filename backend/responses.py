@@ -0,0 +1,121 @@
+"""HTTP response helpers: single-pass JSON rendering, response views and compression."""
+
+from typing import Any, Dict, Iterable, List, Literal, Optional
+
+from fastapi.responses import JSONResponse
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from memory import CONFIDENCE_FIELDS
+from utils import dumps_json
+
+View = Literal["full", "summary"]
+# Top-level keys a summary keeps as-is; everything large is replaced by `artifacts`.
+_SUMMARY_KEYS = ("session_id", "goal", "email", "created_at", "status", "message", "tier", "tier_requested")
+_SUMMARY_DOCUMENT_FIELDS = ("document", "version", "created_at")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that encodes ObjectId/datetime values while serializing.
+
+    Replaces `JSONResponse(content=serialize_doc(...))`, which copied the whole
+    payload in Python before the stdlib encoder walked it a second time.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+
+def artifact_links(session_id: str) -> Dict[str, str]:
+    """Where the stored artifacts of a session can be fetched on their own."""
+    base = f"/session/{session_id}"
+    return {
+        "plan": f"{base}/artifacts/plan",
+        "research": f"{base}/artifacts/research",
+        "document": f"{base}/artifacts/document",
+        "versions": f"{base}/versions",
+    }
+
+
+def _summary(payload: Dict[str, Any]) -> Dict[str, Any]:
+    summary = {k: payload[k] for k in _SUMMARY_KEYS if k in payload}
+    final = payload.get("final")
+    if isinstance(final, dict):
+        summary["final"] = {k: final[k] for k in _SUMMARY_DOCUMENT_FIELDS if k in final}
+    else:
+        summary["final"] = final
+    confidence = payload.get("confidence")
+    if isinstance(confidence, dict):
+        summary["confidence"] = {k: confidence[k] for k in CONFIDENCE_FIELDS if k in confidence}
+    else:
+        summary["confidence"] = confidence
+    if payload.get("session_id"):
+        summary["artifacts"] = artifact_links(payload["session_id"])
+    return summary
+
+
+def _pick(value: Any, path: List[str]) -> Any:
+    if not path:
+        return value
+    if isinstance(value, list):
+        return [_pick(item, path) for item in value]
+    if isinstance(value, dict) and path[0] in value:
+        return _pick(value[path[0]], path[1:])
+    return None
+
+
+def _merge(target: Dict[str, Any], path: List[str], value: Any) -> None:
+    for key in path[:-1]:
+        target = target.setdefault(key, {})
+        if not isinstance(target, dict):
+            return
+    target[path[-1]] = value
+
+
+def shape(payload: Any, view: View = "full", fields: Optional[str] = None) -> Any:
+    """Trim a /run or /session payload to what the client asked for.
+
+    `view=summary` keeps the final document text, the confidence scores and
+    links to the stored artifacts. `fields` is a comma-separated list of
+    dotted paths (e.g. `final.document,confidence.confidence_score`) picked
+    from the chosen view; `session_id` is always kept.
+    """
+    if not isinstance(payload, dict):
+        return payload
+    if view == "summary":
+        payload = _summary(payload)
+    if not fields:
+        return payload
+
+    picked: Dict[str, Any] = {}
+    if "session_id" in payload:
+        picked["session_id"] = payload["session_id"]
+    for field in fields.split(","):
+        path = [part for part in field.strip().split(".") if part]
+        if not path:
+            continue
+        value = _pick(payload, path)
+        if value is not None:
+            _merge(picked, path, value)
+    return picked
+
+
+class CompressionMiddleware:
+    """Gzip for responses, except on paths that stream (e.g. Server-Sent Events)."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        compresslevel: int = 6,
+        skip_paths: Iterable[str] = (),
+    ) -> None:
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=compresslevel)
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope.get("path") not in self.skip_paths:
+            await self.gzip(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
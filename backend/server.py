@@ -55,21 +55,152 @@
 
 # ------------------------------ Human in loop ----------------------------------
 
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Literal
+
 import uvicorn
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, model_validator
-from config import APP_HOST, APP_PORT, MONGO_URI, LLM_PROVIDER, USE_LANGGRAPH
+from config import APP_HOST, APP_PORT, MONGO_URI, MONGO_ENSURE_INDEXES, LLM_PROVIDER, USE_LANGGRAPH, GROQ_API_KEYS
+from config import RESPONSE_COMPRESSION, RESPONSE_COMPRESSION_MIN_BYTES, RESPONSE_COMPRESSION_LEVEL
 if USE_LANGGRAPH:
     from orchestrator_langgraph import LangGraphOrchestrator as SelectedOrchestrator
 else:
     from orchestrator import Orchestrator as SelectedOrchestrator
-from memory import MemoryStore
-from utils import serialize_doc, parse_command
-
-app = FastAPI()
+from memory import MemoryStore, EXPECTED_INDEX_NAMES
+from llm_client import open_http_clients, close_http_clients, single_flight_snapshot, hedge_stats
+from rate_limiter import groq_limiter
+from llm_cache import llm_cache
+from events import set_emitter
+from deadline import resolve_seconds, set_deadline
+from jobs import JobQueue
+from admission import AdmissionController, AdmissionRejected
+from tiers import Tier, record_tier, select_tier, tier_stats
+from responses import FastJSONResponse, CompressionMiddleware, View, shape
+from utils import dumps_json, parse_command
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Long-lived provider connection pools (keep-alive, HTTP/2 when available)
+    await open_http_clients()
+    await job_queue.start()
+    if memory.use_mongo and MONGO_ENSURE_INDEXES:
+        try:
+            await memory.ensure_indexes()
+            report = await memory.check_indexes()
+            for collection, info in report.items():
+                if info["missing"]:
+                    print(f"⚠️ [MemoryStore] {collection}: missing indexes {info['missing']}")
+                # Indexes just created always read as unused; only flag the others.
+                stale = [n for n in (info["unused"] or []) if n not in EXPECTED_INDEX_NAMES]
+                if stale:
+                    print(f"ℹ️ [MemoryStore] {collection}: unused indexes {stale}")
+        except Exception as e:
+            print(f"⚠️ [MemoryStore] Index provisioning failed: {e}")
+    try:
+        yield
+    finally:
+        await job_queue.stop()
+        await memory.close()
+        await close_http_clients()
+        if llm_cache is not None:
+            llm_cache.close()
+
+
+# Responses serialize ObjectId/datetime in one pass (orjson when installed).
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+if RESPONSE_COMPRESSION == "gzip":
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=RESPONSE_COMPRESSION_MIN_BYTES,
+        compresslevel=RESPONSE_COMPRESSION_LEVEL,
+        skip_paths=("/run/stream",),
+    )
 memory = MemoryStore(MONGO_URI)
 orchestrator = SelectedOrchestrator(memory)
+admission = AdmissionController(budget_wait=lambda: groq_limiter.soonest_available(GROQ_API_KEYS))
+
+
+def _select_tier(requested: str | None) -> tuple[str, str, str | None]:
+    """Tier for a new run: the requested one, downgraded while runs queue or keys are out of budget."""
+    return select_tier(requested, admission.waiting(), admission.budget_seconds())
+
+
+def _tagged(result, tier: str, requested: str):
+    """Note on the result when the run was served at a cheaper tier than requested."""
+    if isinstance(result, dict) and tier != requested:
+        result["tier_requested"] = requested
+    return result
+
+
+async def _run_admitted_job(goal: str, email: str | None, tier: str | None):
+    # Jobs already wait in their own bounded queue, so they only share the run cap.
+    # Their tier is picked when they start, under the load at that time.
+    tier, requested, reason = _select_tier(tier)
+    async with admission.admit(bounded=False):
+        record_tier(tier, requested, reason)
+        set_deadline(resolve_seconds())
+        return _tagged(await orchestrator.run(goal, email, tier=tier), tier, requested)
+
+
+job_queue = JobQueue(_run_admitted_job)
+
+
+# How often a blocking run checks whether its client is still connected.
+DISCONNECT_POLL_SECONDS = 1.0
+
+
+class ClientDisconnected(Exception):
+    """The client closed the connection before its run finished."""
+
+
+async def _run_for_client(request: Request, run_deadline: str | None, factory):
+    """Await `factory()` under the run's deadline; cancel it if the client disconnects.
+
+    Cancelling the run cancels its in-flight LLM call too, so an abandoned
+    request stops spending quota live users need.
+    """
+    seconds = resolve_seconds(run_deadline)
+
+    async def _run():
+        set_deadline(seconds)
+        return await factory()
+
+    task = asyncio.create_task(_run())
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                print("🔌 Client disconnected. Cancelling its run.")
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+def _disconnected_response() -> FastJSONResponse:
+    # 499: client closed request (nobody reads it, but it shows in access logs)
+    return FastJSONResponse(status_code=499, content={"error": "Client closed request"})
+
+
+def _rejected_response(exc: AdmissionRejected) -> FastJSONResponse:
+    return FastJSONResponse(
+        status_code=exc.status_code,
+        content={
+            "error": "Server is at capacity. Retry later.",
+            "reason": exc.reason,
+            "retry_after": exc.retry_after,
+        },
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 
 # ===============================
@@ -84,6 +215,20 @@ async def health():
     }
 
 
+@app.get("/metrics")
+async def metrics():
+    return {
+        "llm_keys": groq_limiter.snapshot(GROQ_API_KEYS),
+        "llm_cache": await llm_cache.stats() if llm_cache is not None else {"enabled": False},
+        "llm_single_flight": single_flight_snapshot(),
+        "llm_hedging": hedge_stats,
+        "jobs": job_queue.metrics(),
+        "admission": admission.snapshot(),
+        "tiers": tier_stats,
+        "memory": memory.stats(),
+    }
+
+
 # ===============================
 # Request Models
 # ===============================
@@ -92,6 +237,7 @@ class RunRequest(BaseModel):
     command: str | None = None
     goal: str | None = None
     email: str | None = None
+    tier: Tier | None = None  # fast | standard | thorough (default: TIER_DEFAULT)
 
     @model_validator(mode="after")
     def ensure_input(self):
@@ -112,34 +258,71 @@ class ApprovalRequest(BaseModel):
     decision: str  # retry_now | retry_later | cancel
 
 
+class SessionBatchRequest(BaseModel):
+    session_ids: list[str]
+    summary: bool = False  # only goal, created_at, confidence_score, status
+
+    @model_validator(mode="after")
+    def limit_batch(self):
+        if len(self.session_ids) > 100:
+            raise ValueError("At most 100 session_ids per request.")
+        return self
+
+
 # ===============================
 # Main Run Endpoint
 # ===============================
 
+def _resolve_goal(req: RunRequest) -> tuple[str, str | None]:
+    if req.command:
+        parsed = parse_command(req.command)
+        goal, email = parsed.get("goal"), parsed.get("email")
+    else:
+        goal, email = req.goal, req.email
+
+    if not goal:
+        raise ValueError("'goal' is required when no command is provided.")
+    return goal, email
+
+
 @app.post("/run")
-async def run(req: RunRequest):
+async def run(
+    req: RunRequest,
+    request: Request,
+    view: View = "full",
+    fields: str | None = None,
+    x_run_deadline: str | None = Header(None),
+):
+    """Run the pipeline. `view=summary` / `fields=...` trim the response (see responses.shape).
+
+    `X-Run-Deadline` (seconds) bounds the whole run; the run is cancelled if the client disconnects.
+    `tier` picks the stages run; under load it may be downgraded (see `tier_requested`).
+    """
     try:
-        if req.command:
-            parsed = parse_command(req.command)
-            goal, email = parsed.get("goal"), parsed.get("email")
-        else:
-            goal, email = req.goal, req.email
-
-        if not goal:
-            raise ValueError("'goal' is required when no command is provided.")
+        goal, email = _resolve_goal(req)
+        tier, requested, reason = _select_tier(req.tier)
 
-        result = await orchestrator.run(goal, email)
+        async with admission.admit():
+            record_tier(tier, requested, reason)
+            result = await _run_for_client(request, x_run_deadline, lambda: orchestrator.run(goal, email, tier=tier))
+        _tagged(result, tier, requested)
 
         # If the run returned an LLM sentinel status, map to a proper HTTP code.
         if isinstance(result, dict):
             message = str(result.get("message", ""))
             if "__LLM_RATE_LIMITED__" in message:
-                return JSONResponse(status_code=429, content=serialize_doc(result))
+                return FastJSONResponse(status_code=429, content=shape(result, view, fields))
 
-        return JSONResponse(content=serialize_doc(result))
+        return FastJSONResponse(content=shape(result, view, fields))
 
     except ValueError as e:
-        return JSONResponse(status_code=400, content={"error": str(e)})
+        return FastJSONResponse(status_code=400, content={"error": str(e)})
+
+    except AdmissionRejected as e:
+        return _rejected_response(e)
+
+    except ClientDisconnected:
+        return _disconnected_response()
 
     except Exception as e:
         # Avoid crashing the server on upstream LLM/network errors.
@@ -147,81 +330,256 @@ async def run(req: RunRequest):
         status = 500
         if "429" in text or "Too Many Requests" in text:
             status = 429
-        return JSONResponse(status_code=status, content={"error": "Request failed", "detail": text})
+        return FastJSONResponse(status_code=status, content={"error": "Request failed", "detail": text})
+
+
+# ===============================
+# Streaming Run Endpoint (SSE)
+# ===============================
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {dumps_json(data).decode('utf-8')}\n\n"
+
+
+@app.post("/run/stream")
+async def run_stream(req: RunRequest, x_run_deadline: str | None = Header(None)):
+    """Run the pipeline and stream progress as Server-Sent Events.
+
+    Events: `accepted` (immediately), `stage` (start/end of each stage),
+    `token` (Writer/Reviewer output as it is generated), then a final
+    `result` or `error` carrying the same payload as POST /run.
+    """
+    try:
+        goal, email = _resolve_goal(req)
+    except ValueError as e:
+        return FastJSONResponse(status_code=400, content={"error": str(e)})
+    tier, requested, reason = _select_tier(req.tier)
+
+    try:
+        await admission.acquire()
+    except AdmissionRejected as e:
+        return _rejected_response(e)
+    record_tier(tier, requested, reason)
+    admitted_at = time.monotonic()
+
+    async def _release_slot():
+        admission.release(time.monotonic() - admitted_at)
+
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def _run_pipeline():
+        # Runs in its own task, so the emitter only sees this run's events.
+        set_emitter(lambda event, data: queue.put_nowait((event, data)))
+        set_deadline(resolve_seconds(x_run_deadline))
+        try:
+            result = _tagged(await orchestrator.run(goal, email, tier=tier), tier, requested)
+            if isinstance(result, dict) and "__LLM_RATE_LIMITED__" in str(result.get("message", "")):
+                queue.put_nowait(("error", {"status": 429, "result": result}))
+            else:
+                queue.put_nowait(("result", result))
+        except Exception as e:
+            queue.put_nowait(("error", {"status": 500, "error": "Request failed", "detail": str(e)}))
+        finally:
+            queue.put_nowait(None)
+
+    async def _event_stream():
+        task = asyncio.create_task(_run_pipeline())
+        try:
+            yield _sse("accepted", {"goal": goal, "tier": tier})
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                event, data = item
+                yield _sse(event, data)
+        finally:
+            # Client went away before the run finished.
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(
+        _event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Runs once the stream ends or the client disconnects.
+        background=BackgroundTask(_release_slot),
+    )
+
+
+# ===============================
+# Background Jobs (async run mode)
+# ===============================
+
+@app.post("/jobs")
+async def submit_job(req: RunRequest):
+    """Queue a run and return its job id immediately (poll GET /jobs/{job_id})."""
+    try:
+        goal, email = _resolve_goal(req)
+    except ValueError as e:
+        return FastJSONResponse(status_code=400, content={"error": str(e)})
+
+    try:
+        job = job_queue.submit(goal, email, req.tier)
+    except asyncio.QueueFull as e:
+        return FastJSONResponse(status_code=503, content={"error": str(e)}, headers={"Retry-After": "30"})
+    return FastJSONResponse(status_code=202, content=job)
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, view: View = "full", fields: str | None = None):
+    job = job_queue.get(job_id)
+    if job is None:
+        return FastJSONResponse(status_code=404, content={"error": f"Job not found: {job_id}"})
+    if job.get("result") is not None:
+        job = dict(job, result=shape(job["result"], view, fields))
+    return FastJSONResponse(content=job)
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return FastJSONResponse(status_code=404, content={"error": f"Job not found: {job_id}"})
+    return FastJSONResponse(content=job)
 
 
 @app.post("/run/legacy")
-async def run_legacy(req: RunLegacyRequest):
-    result = await orchestrator.run(req.goal, req.email)
-    return JSONResponse(content=serialize_doc(result))
+async def run_legacy(req: RunLegacyRequest, request: Request, x_run_deadline: str | None = Header(None)):
+    tier, requested, reason = _select_tier(None)
+    try:
+        async with admission.admit():
+            record_tier(tier, requested, reason)
+            result = await _run_for_client(
+                request, x_run_deadline, lambda: orchestrator.run(req.goal, req.email, tier=tier)
+            )
+        _tagged(result, tier, requested)
+    except AdmissionRejected as e:
+        return _rejected_response(e)
+    except ClientDisconnected:
+        return _disconnected_response()
+    return FastJSONResponse(content=result)
 
 
 # ===============================
 # 📊 Get Session by ID
 # ===============================
 
+def _session_response(session_id: str, snapshot: dict) -> dict:
+    session_doc = snapshot["session"]
+    final_doc = snapshot["document"]
+    return {
+        "session_id": session_id,
+        "goal": session_doc.get("goal"),
+        "email": session_doc.get("email"),
+        "created_at": session_doc.get("created_at"),
+        "status": session_doc.get("status"),
+        "tier": session_doc.get("tier"),
+        "plan": snapshot["plan"],
+        "final": final_doc,  # This will include the document field
+        "handoff": {
+            "research": snapshot["research"],
+            "writer": final_doc
+        },
+        "confidence": snapshot["confidence"],
+    }
+
+
 @app.get("/session/{session_id}")
-async def get_session(session_id: str):
+async def get_session(session_id: str, view: View = "full", fields: str | None = None):
     """Retrieve a session and its results by session ID."""
     try:
-        # Get session data from memory
-        session_doc = await memory.get_session(session_id)
+        # Session, plan, research, latest document and confidence in one query
+        snapshot = await memory.get_session_snapshot(session_id)
         
-        if not session_doc:
+        if not snapshot:
             print(f"DEBUG: Session not found for session_id: {session_id}")
-            return JSONResponse(
+            return FastJSONResponse(
                 status_code=404,
                 content={"error": f"Session not found: {session_id}"}
             )
         
-        print(f"DEBUG: Found session for session_id: {session_id}")
-        
-        # Fetch the latest document from the 'document' collection for this session_id
-        final_doc = None
-        if memory.use_mongo:
-            final_doc = await memory.db.document.find_one({"session_id": session_id}, sort=[("created_at", -1)])
-        else:
-            final_doc = None
-
-        # Get plan
-        plan = await memory.get_latest_plan(session_id)
-
-        # Get research results
-        research = await memory.get_research(session_id)
-
-        # Construct response
-        response = {
-            "session_id": session_id,
-            "goal": session_doc.get("goal"),
-            "email": session_doc.get("email"),
-            "created_at": session_doc.get("created_at"),
-            "plan": plan,
-            "final": final_doc,  # This will include the document field
-            "handoff": {
-                "research": research,
-                "writer": final_doc
-            }
-        }
-
-        return JSONResponse(content=serialize_doc(response))
+        return FastJSONResponse(content=shape(_session_response(session_id, snapshot), view, fields))
         
     except Exception as e:
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500,
             content={"error": "Failed to retrieve session", "detail": str(e)}
         )
 
 
+@app.get("/session/{session_id}/artifacts/{name}")
+async def get_session_artifact(session_id: str, name: Literal["plan", "research", "document"]):
+    """One stored artifact of a session, as linked from `view=summary` responses."""
+    loaders = {
+        "plan": memory.get_latest_plan,
+        "research": memory.get_research,
+        "document": memory.get_latest_document,
+    }
+    artifact = await loaders[name](session_id)
+    if not artifact:
+        return FastJSONResponse(
+            status_code=404,
+            content={"error": f"No {name} stored for session: {session_id}"}
+        )
+    return FastJSONResponse(content={"session_id": session_id, name: artifact})
+
+
+@app.get("/session/{session_id}/versions")
+async def get_document_versions(session_id: str):
+    """Every saved version of the session's document (metadata only)."""
+    versions = await memory.get_document_versions(session_id)
+    return FastJSONResponse(content={"session_id": session_id, "versions": versions})
+
+
+@app.get("/session/{session_id}/versions/{version}")
+async def get_document_version(session_id: str, version: int):
+    """One version of the session's document, rebuilt from its stored deltas."""
+    document = await memory.get_document_version(session_id, version)
+    if document is None:
+        return FastJSONResponse(
+            status_code=404,
+            content={"error": f"Version {version} not found for session: {session_id}"}
+        )
+    return FastJSONResponse(content=document)
+
+
+@app.get("/sessions")
+async def list_sessions(limit: int = 20, cursor: str | None = None):
+    """Newest sessions first (goal, created_at, confidence_score, status), paginated by cursor."""
+    try:
+        page = await memory.list_sessions(limit=limit, cursor=cursor)
+    except ValueError as e:
+        return FastJSONResponse(status_code=400, content={"error": str(e)})
+    return FastJSONResponse(content=page)
+
+
+@app.post("/sessions/batch")
+async def get_sessions_batch(req: SessionBatchRequest):
+    """Snapshots (or summaries) for many sessions in one request; unknown ids are listed in `missing`."""
+    session_ids = list(dict.fromkeys(req.session_ids))
+    snapshots = await memory.get_session_snapshots(session_ids, summary=req.summary)
+    found = []
+    for session_id in session_ids:
+        snapshot = snapshots.get(session_id)
+        if snapshot is None:
+            continue
+        found.append(snapshot if req.summary else _session_response(session_id, snapshot))
+    return FastJSONResponse(content={
+        "sessions": found,
+        "missing": [sid for sid in session_ids if snapshots.get(sid) is None],
+    })
+
+
 # ===============================
 # 🧠 Human-in-the-Loop Approval
 # ===============================
 
 @app.post("/approve")
-async def approve(req: ApprovalRequest):
+async def approve(req: ApprovalRequest, request: Request, x_run_deadline: str | None = Header(None)):
     decision = req.decision.lower()
 
     if decision not in ["retry_now", "retry_later", "cancel"]:
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=400,
             content={"error": "Invalid decision. Use retry_now, retry_later, or cancel."}
         )
@@ -235,20 +593,26 @@ async def approve(req: ApprovalRequest):
 
     # Handle decision
     if decision == "retry_now":
-        result = await orchestrator.resume(req.session_id)
-        return JSONResponse(content={
+        try:
+            async with admission.admit():
+                result = await _run_for_client(request, x_run_deadline, lambda: orchestrator.resume(req.session_id))
+        except AdmissionRejected as e:
+            return _rejected_response(e)
+        except ClientDisconnected:
+            return _disconnected_response()
+        return FastJSONResponse(content={
             "status": "RESUMED",
-            "result": serialize_doc(result)
+            "result": result
         })
 
     if decision == "retry_later":
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "status": "PAUSED",
             "message": "Session remains paused. Retry later."
         })
 
     if decision == "cancel":
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "status": "CANCELLED",
             "message": "Session cancelled by human."
         })
@@ -0,0 +1,83 @@
+import json
+import os
+
+# Settings are read at import time, so pin them before any backend module loads.
+os.environ.update({
+    "LLM_PROVIDER": "groq",
+    "LLM_GENERATION_PROVIDER": "groq",
+    "LLM_VALIDATION_PROVIDER": "groq",
+    "GROQ_API_KEYS": "test-key-1,test-key-2,test-key-3",
+    "GROQ_TPM_PER_KEY": "1000000",
+    "GROQ_RPM_PER_KEY": "1000",
+    "GROQ_HEDGE_ENABLED": "false",
+    "LLM_CACHE_ENABLED": "false",
+    "MONGO_URI": "",
+    "SQLITE_DB_PATH": "",
+    "TIER_DEFAULT": "standard",
+    "TIER_AUTO_DOWNGRADE": "false",
+    "RUN_DEADLINE_SECONDS": "0",
+    "RUN_DEADLINE_MAX_SECONDS": "600",
+    "DEADLINE_STAGE_SECONDS": "10",
+})
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+
+def prompt_kind(prompt: str) -> str:
+    if "Writing task" in prompt:
+        return "writer"
+    if "quality assurance" in prompt:
+        return "confidence"
+    if "CEO agent" in prompt:
+        return "ceo"
+    return "other"
+
+
+class FakeGroq:
+    """Stands in for the Groq API: canned answers per agent, recorded calls."""
+
+    def __init__(self):
+        self.calls = []
+        self.failing = set()
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        kind = prompt_kind(body["messages"][-1]["content"])
+        self.calls.append(kind)
+        if kind in self.failing:
+            return httpx.Response(500, json={"error": "unavailable"})
+        if kind == "confidence":
+            text = json.dumps({
+                "confidence_score": 90,
+                "hallucination_risk": "LOW",
+                "risk_score": 10,
+                "issues": [],
+                "summary": "ok",
+            })
+        elif kind == "ceo":
+            text = json.dumps({
+                "goal": "g",
+                "tasks": [
+                    {"assigned_agent": "Research", "description": "research it"},
+                    {"assigned_agent": "Developer", "description": "diagram it"},
+                    {"assigned_agent": "Writer", "description": "write it up"},
+                ],
+                "research": {"summary": "s", "results": ["a"]},
+            })
+        else:
+            text = f"Generated {kind} text."
+        return httpx.Response(200, json={"choices": [{"message": {"content": text}}], "usage": {"total_tokens": 50}})
+
+
+@pytest.fixture
+def fake_groq():
+    import llm_client
+    from rate_limiter import groq_limiter
+
+    fake = FakeGroq()
+    llm_client._http_clients["groq"] = httpx.AsyncClient(transport=httpx.MockTransport(fake.handler))
+    yield fake
+    llm_client._http_clients.pop("groq", None)
+    # Failed calls open key circuits; start the next test with fresh budgets.
+    groq_limiter._budgets.clear()
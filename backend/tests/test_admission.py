@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+
+
+def test_admits_up_to_the_concurrency_cap():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=2, max_queue=0, max_queue_seconds=1)
+        await admission.acquire()
+        await admission.acquire()
+        with pytest.raises(AdmissionRejected) as info:
+            await admission.acquire()
+        return admission, info.value
+
+    admission, rejected = asyncio.run(scenario())
+    assert admission.running == 2
+    assert (rejected.reason, rejected.status_code) == ("queue_full", 503)
+    assert rejected.retry_after >= 1
+    assert admission.snapshot()["queue_full"] == 1
+
+
+def test_waiters_get_slots_in_fifo_order():
+    order = []
+
+    async def run(admission, name):
+        async with admission.admit():
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1, max_queue=5, max_queue_seconds=5)
+        tasks = []
+        for name in ("a", "b", "c"):
+            tasks.append(asyncio.create_task(run(admission, name)))
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        return admission
+
+    admission = asyncio.run(scenario())
+    assert order == ["a", "b", "c"]
+    assert admission.running == 0
+    assert admission.snapshot()["admitted"] == 3
+
+
+def test_queue_timeout_rejects_and_leaves_the_line():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1, max_queue=5, max_queue_seconds=0.02)
+        await admission.acquire()
+        with pytest.raises(AdmissionRejected) as info:
+            await admission.acquire()
+        return admission, info.value
+
+    admission, rejected = asyncio.run(scenario())
+    assert rejected.reason == "queue_timeout"
+    assert admission.waiting() == 0
+    assert admission.running == 1
+
+
+def test_cancelled_waiter_does_not_hold_a_slot():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1, max_queue=5, max_queue_seconds=5)
+        await admission.acquire()
+        waiter = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        admission.release()
+        return admission
+
+    admission = asyncio.run(scenario())
+    assert admission.waiting() == 0
+    assert admission.running == 0
+
+
+def test_no_llm_budget_fails_fast_with_429():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1, max_queue=5, max_queue_seconds=2, budget_wait=lambda: 30.0)
+        with pytest.raises(AdmissionRejected) as info:
+            await admission.acquire()
+        # Background jobs wait for budget instead of failing.
+        await admission.acquire(bounded=False)
+        return admission, info.value
+
+    admission, rejected = asyncio.run(scenario())
+    assert (rejected.reason, rejected.status_code, rejected.retry_after) == ("no_llm_budget", 429, 30)
+    assert admission.running == 1
+
+
+def test_unbounded_acquire_ignores_the_queue_limit():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1, max_queue=0, max_queue_seconds=0.01)
+        await admission.acquire()
+        waiter = asyncio.create_task(admission.acquire(bounded=False))
+        await asyncio.sleep(0.03)
+        assert not waiter.done()
+        admission.release()
+        await waiter
+        return admission
+
+    assert asyncio.run(scenario()).running == 1
+
+
+def test_retry_after_follows_the_drain_rate():
+    admission = AdmissionController(max_concurrent=2, max_queue=5, max_queue_seconds=5)
+    assert admission.estimated_wait() == 0.0
+    admission.running = 2
+    admission.release(run_seconds=10.0)
+    admission.running = 2
+    # Average run time moved from 20s toward 10s; one in line, two slots.
+    assert admission.estimated_wait() == pytest.approx(18.0 / 2)
+    assert admission.retry_after() == 9
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+import codec
+from codec import TextCodec
+from memory import MemoryStore
+
+TEXT = "## Overview\nThe following research findings are relevant. " * 20
+
+
+@pytest.mark.parametrize("algorithm", ["zlib", "zstd"])
+@pytest.mark.parametrize("binary", [True, False])
+def test_text_codec_roundtrip(algorithm, binary):
+    text = TEXT
+    record = {
+        "session_id": "s" * 200,
+        "document": text,
+        "nested": {"sections": [text, "short"]},
+        "score": 5,
+    }
+    text_codec = TextCodec(algorithm=algorithm, min_chars=64, binary=binary)
+    encoded = text_codec.encode(record)
+    assert encoded["session_id"] == record["session_id"]  # queried keys stay plain
+    assert codec.MARKER in encoded["document"]
+    assert encoded["nested"]["sections"][1] == "short"
+    assert isinstance(encoded["document"]["data"], bytes if binary else str)
+    assert codec.decode(encoded) == record
+    assert text_codec.stats()["compressed"] == 2
+
+
+def test_text_codec_disabled_passes_values_through():
+    record = {"document": "x" * 1000}
+    assert TextCodec(algorithm="none").encode(record) is record
+
+
+def test_compressed_values_stay_readable_after_turning_compression_off():
+    stored = TextCodec(algorithm="zlib").encode({"summary": TEXT})
+    assert codec.decode(stored) == {"summary": TEXT}
+    assert codec.decode({"plain": "value", "items": [1, 2]}) == {"plain": "value", "items": [1, 2]}
+
+
+@pytest.mark.parametrize("sqlite", [False, True])
+def test_memory_store_compresses_large_fields(sqlite, tmp_path):
+    store = MemoryStore(sqlite_path=str(tmp_path / "memory.sqlite3") if sqlite else None)
+    store._codec = TextCodec(algorithm="zlib", min_chars=64, binary=not sqlite)
+
+    async def scenario():
+        sid = await store.create_session("goal")
+        await store.save_research(sid, {"summary": TEXT})
+        await store.save_plan(sid, {"tasks": [{"description": TEXT}]})
+        stored = await store._local("records", "research", sid)
+        found = (await store.get_research(sid), await store.get_latest_plan(sid), await store.get_session_snapshot(sid))
+        await store.close()
+        return stored, found
+
+    stored, (research, plan, snapshot) = asyncio.run(scenario())
+    assert codec.MARKER in stored[0]["summary"]
+    assert research[0]["summary"] == TEXT
+    assert plan["tasks"][0]["description"] == TEXT
+    assert snapshot["plan"]["tasks"][0]["description"] == TEXT
+    assert snapshot["research"][0]["summary"] == TEXT
+
+
+@pytest.mark.parametrize("sqlite", [False, True])
+def test_compressed_document_versions(sqlite, tmp_path, monkeypatch):
+    store = MemoryStore(sqlite_path=str(tmp_path / "memory.sqlite3") if sqlite else None)
+    store._codec = TextCodec(algorithm="zlib", min_chars=64, binary=not sqlite)
+    drafts = [f"{TEXT}\nRevision {n}: {'new paragraph. ' * 10}\n{TEXT}" for n in range(3)]
+    decompressed = []
+    decompress_bytes = codec.decompress_bytes
+
+    def counting(packed, algorithm, dictionary=None):
+        decompressed.append(algorithm)
+        return decompress_bytes(packed, algorithm, dictionary)
+
+    async def scenario():
+        sid = await store.create_session("goal")
+        for text in drafts:
+            await store.save_document(sid, {"document": text})
+        stored = await store._local("records", "documents", sid)
+        monkeypatch.setattr(codec, "decompress_bytes", counting)
+        versions = await store.get_document_versions(sid)
+        listed = len(decompressed)
+        found = (await store.get_document_version(sid, 2), await store.get_latest_document(sid))
+        await store.close()
+        return stored, versions, listed, found
+
+    stored, versions, listed, (second, latest) = asyncio.run(scenario())
+    assert codec.MARKER in stored[0]["document"]
+    assert stored[1]["encoding"] == "delta"
+    assert not isinstance(stored[1]["delta"], dict)  # deltas are never compressed a second time
+    assert [v["version"] for v in versions] == [1, 2, 3]
+    assert listed == 0  # listing versions reads metadata only
+    assert second["document"] == drafts[1]
+    assert latest["document"] == drafts[2]
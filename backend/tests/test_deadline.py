@@ -0,0 +1,87 @@
+import asyncio
+import contextvars
+
+import httpx
+import pytest
+
+import deadline
+import llm_client
+from memory import MemoryStore
+from orchestrator import Orchestrator
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # The Developer agent saves its diagram under ./outputs.
+    monkeypatch.chdir(tmp_path)
+
+
+def in_context(fn, *args):
+    """Run `fn` in a copy of the current context, as each request does."""
+    return contextvars.copy_context().run(fn, *args)
+
+
+@pytest.mark.parametrize(
+    "requested, seconds",
+    [(None, None), ("", None), ("0", None), ("-5", None), ("soon", None), ("30", 30.0), (10_000, 600.0)],
+)
+def test_resolve_seconds(requested, seconds):
+    assert deadline.resolve_seconds(requested) == seconds
+
+
+def test_no_deadline_by_default():
+    def check():
+        return deadline.remaining(), deadline.has_time(100), deadline.skipped_stages()
+
+    assert in_context(check) == (None, True, [])
+
+
+def test_deadline_budget_and_skips():
+    def check():
+        deadline.set_deadline(25)
+        budget = (deadline.has_time(2), deadline.has_time(3))
+        deadline.skip("developer")
+        deadline.skip("developer")
+        return budget, 24 < deadline.remaining() <= 25, deadline.skipped_stages()
+
+    assert in_context(check) == ((True, False), True, ["developer"])
+    # Nothing leaks out of the run's context.
+    assert deadline.remaining() is None
+
+
+def test_llm_call_past_the_deadline_is_not_sent(fake_groq):
+    async def scenario():
+        deadline.set_deadline(0.001)
+        await asyncio.sleep(0.01)
+        return await llm_client.call_llm("prompt")
+
+    assert asyncio.run(scenario()) == "__LLM_UNAVAILABLE__"
+    assert fake_groq.calls == []
+
+
+def test_llm_call_is_cut_off_at_the_deadline():
+    async def slow(request):
+        await asyncio.sleep(5)
+        return httpx.Response(200, json={"choices": [{"message": {"content": "late"}}]})
+
+    async def scenario():
+        llm_client._http_clients["groq"] = httpx.AsyncClient(transport=httpx.MockTransport(slow))
+        try:
+            deadline.set_deadline(0.05)
+            return await llm_client.call_llm("prompt")
+        finally:
+            llm_client._http_clients.pop("groq", None)
+
+    assert asyncio.run(scenario()) == "__LLM_UNAVAILABLE__"
+
+
+def test_run_skips_optional_stages_near_the_deadline(fake_groq):
+    async def scenario():
+        # Room for one more stage after the plan: Research and Developer are skipped.
+        deadline.set_deadline(15)
+        return await Orchestrator(MemoryStore(sqlite_path=None)).run("test goal")
+
+    result = asyncio.run(scenario())
+    assert fake_groq.calls == ["ceo", "writer", "confidence"]
+    assert result["skipped_stages"] == ["research", "developer"]
+    assert result["final"]["document"] == "Generated writer text."
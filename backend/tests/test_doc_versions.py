@@ -0,0 +1,75 @@
+import pytest
+
+import doc_versions
+
+
+def _drafts(count):
+    lines = [f"Line {i} of the document body, long enough to matter.\n" for i in range(40)]
+    drafts = []
+    for n in range(count):
+        lines = list(lines)
+        lines[n % len(lines)] = f"Line {n} rewritten in pass {n}.\n"
+        if n % 3 == 0:
+            lines.append(f"Appended paragraph from pass {n}.\n")
+        drafts.append({"document": "".join(lines), "review": f"pass {n}"})
+    return drafts
+
+
+def _pack_all(drafts, **kwargs):
+    records, previous = [], None
+    for draft in drafts:
+        record = doc_versions.pack_version(draft, previous, **kwargs)
+        records.append(record)
+        previous = {**draft, "version": record["version"]}
+    return records
+
+
+def test_delta_roundtrip():
+    base = "a\nb\nc\n"
+    new = "a\nB\nc\nd"
+    assert doc_versions.apply_delta(base, doc_versions.make_delta(base, new)) == new
+
+
+@pytest.mark.parametrize("compression", ["none", "zlib", "zstd"])
+def test_versions_roundtrip(compression):
+    drafts = _drafts(7)
+    records = _pack_all(drafts, keyframe_interval=4, compression=compression)
+    assert [r["encoding"] for r in records] == ["full", "delta", "delta", "delta", "full", "delta", "delta"]
+    assert all("document" not in r for r in records if doc_versions.is_delta(r))
+
+    documents = doc_versions.unpack_versions(records)
+    assert [d["document"] for d in documents] == [d["document"] for d in drafts]
+    assert [d["version"] for d in documents] == list(range(1, 8))
+    assert [d["review"] for d in documents] == [d["review"] for d in drafts]
+    assert all("delta" not in d and "encoding" not in d for d in documents)
+
+
+def test_large_rewrite_is_stored_as_keyframe():
+    first = {"document": "x\n" * 50}
+    previous = {**first, "version": 1}
+    record = doc_versions.pack_version({"document": "completely different\n" * 50}, previous, keyframe_interval=10)
+    assert record["encoding"] == "full"
+    assert record["version"] == 2
+
+
+def test_records_before_versioning_count_as_keyframes():
+    documents = doc_versions.unpack_versions([{"document": "old"}, {"document": "older"}])
+    assert [(d["version"], d["document"]) for d in documents] == [(1, "old"), (2, "older")]
+
+
+def test_delta_without_base_is_skipped():
+    records = _pack_all(_drafts(5), keyframe_interval=3)
+    assert [r["encoding"] for r in records] == ["full", "delta", "delta", "full", "delta"]
+    documents = doc_versions.unpack_versions(records[1:])
+    assert [d["version"] for d in documents] == [4, 5]
+
+    gap = [records[0], records[2], records[3]]
+    assert [d["version"] for d in doc_versions.unpack_versions(gap)] == [1, 4]
+
+
+def test_chain_for_starts_at_the_last_keyframe():
+    records = _pack_all(_drafts(6), keyframe_interval=3)
+    assert [r["version"] for r in doc_versions.chain_for(records)] == [4, 5, 6]
+    assert [r["version"] for r in doc_versions.chain_for(records, 3)] == [1, 2, 3]
+    legacy = [{"document": "old"}, {"document": "older"}]
+    assert doc_versions.chain_for(legacy) == [{"document": "older", "version": 2}]
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from events import emit
+from jobs import CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue
+
+
+async def wait_for_status(queue, job_id, *statuses):
+    for _ in range(200):
+        job = queue.get(job_id)
+        if job["status"] in statuses:
+            return job
+        await asyncio.sleep(0.005)
+    raise AssertionError(f"job stayed {queue.get(job_id)['status']}")
+
+
+def test_job_runs_in_background_and_records_stages():
+    async def runner(goal, email, tier):
+        emit("stage", stage="research", status="start")
+        emit("token", text="ignored")
+        emit("stage", stage="research", status="done")
+        return {"goal": goal, "tier": tier}
+
+    async def scenario():
+        queue = JobQueue(runner, workers=1)
+        await queue.start()
+        try:
+            submitted = queue.submit("goal", "me@example.com", "fast")
+            job = await wait_for_status(queue, submitted["job_id"], SUCCEEDED)
+            return submitted, job, queue.metrics()
+        finally:
+            await queue.stop()
+
+    submitted, job, metrics = asyncio.run(scenario())
+    assert submitted["status"] == QUEUED
+    assert "email" not in submitted
+    assert job["result"] == {"goal": "goal", "tier": "fast"}
+    assert job["current_stage"] == "research"
+    assert [(s["stage"], s["status"]) for s in job["stages"]] == [("research", "start"), ("research", "done")]
+    assert metrics["succeeded"] == 1
+
+
+def test_jobs_run_in_fifo_order_and_report_position():
+    order = []
+    release = asyncio.Event()
+
+    async def runner(goal, email, tier):
+        order.append(goal)
+        await release.wait()
+        return {}
+
+    async def scenario():
+        queue = JobQueue(runner, workers=1)
+        await queue.start()
+        try:
+            ids = [queue.submit(goal)["job_id"] for goal in ("a", "b", "c")]
+            await wait_for_status(queue, ids[0], RUNNING)
+            positions = [queue.get(job_id).get("position") for job_id in ids]
+            release.set()
+            await wait_for_status(queue, ids[2], SUCCEEDED)
+            return positions
+        finally:
+            await queue.stop()
+
+    assert asyncio.run(scenario()) == [None, 1, 2]
+    assert order == ["a", "b", "c"]
+
+
+def test_full_queue_rejects_submissions():
+    async def runner(goal, email, tier):
+        return {}
+
+    async def scenario():
+        queue = JobQueue(runner, workers=1, max_queue=2)  # not started: jobs stay queued
+        queue.submit("a")
+        queue.submit("b")
+        with pytest.raises(asyncio.QueueFull):
+            queue.submit("c")
+        return queue.metrics()
+
+    metrics = asyncio.run(scenario())
+    assert (metrics["queue_depth"], metrics["rejected"]) == (2, 1)
+
+
+def test_failed_run_is_reported():
+    async def runner(goal, email, tier):
+        if goal == "boom":
+            raise RuntimeError("agent crashed")
+        return {"message": "__LLM_RATE_LIMITED__"}
+
+    async def scenario():
+        queue = JobQueue(runner, workers=2)
+        await queue.start()
+        try:
+            crashed = queue.submit("boom")["job_id"]
+            limited = queue.submit("limited")["job_id"]
+            return (
+                await wait_for_status(queue, crashed, FAILED),
+                await wait_for_status(queue, limited, FAILED),
+            )
+        finally:
+            await queue.stop()
+
+    crashed, limited = asyncio.run(scenario())
+    assert crashed["error"] == "agent crashed"
+    assert limited["error"] == "LLM_RATE_LIMITED"
+
+
+def test_cancel_queued_and_running_jobs():
+    started = []
+
+    async def runner(goal, email, tier):
+        started.append(goal)
+        await asyncio.sleep(10)
+
+    async def scenario():
+        queue = JobQueue(runner, workers=1)
+        await queue.start()
+        try:
+            running = queue.submit("running")["job_id"]
+            queued = queue.submit("queued")["job_id"]
+            await wait_for_status(queue, running, RUNNING)
+            assert queue.cancel(queued)["status"] == CANCELLED
+            queue.cancel(running)
+            job = await wait_for_status(queue, running, CANCELLED)
+            await asyncio.sleep(0.02)
+            return job, queue.cancel("unknown")
+        finally:
+            await queue.stop()
+
+    job, unknown = asyncio.run(scenario())
+    assert job["status"] == CANCELLED
+    assert unknown is None
+    assert started == ["running"]
@@ -0,0 +1,185 @@
+import asyncio
+import time
+
+import llm_client
+from llm_cache import LLMCache, is_sentinel, make_cache_key
+
+
+def test_cache_key_separates_parts():
+    assert make_cache_key("groq", "m", "ab", "c") != make_cache_key("groq", "m", "a", "bc")
+    assert make_cache_key("groq", "m", None, "p") == make_cache_key("groq", "m", "", "p")
+
+
+def test_sentinels():
+    assert is_sentinel("__LLM_RATE_LIMITED__")
+    assert is_sentinel("prefix __LLM_UNAVAILABLE__")
+    assert is_sentinel("")
+    assert not is_sentinel("an answer")
+
+
+def test_memory_cache_roundtrip_and_stats():
+    cache = LLMCache(path=None, ttl=60)
+
+    async def scenario():
+        assert await cache.get("k") is None
+        await cache.set("k", "value")
+        assert await cache.get("k") == "value"
+        return await cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["stores"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_sentinels_are_not_cached():
+    cache = LLMCache(path=None, ttl=60)
+
+    async def scenario():
+        await cache.set("k", "__LLM_RATE_LIMITED__")
+        return await cache.get("k")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = LLMCache(path=None, ttl=60, memory_max_entries=2)
+
+    async def scenario():
+        await cache.set("a", "1")
+        await cache.set("b", "2")
+        await cache.get("a")  # "b" is now least recently used
+        await cache.set("c", "3")
+        return [await cache.get(k) for k in ("a", "b", "c")], await cache.stats()
+
+    values, stats = asyncio.run(scenario())
+    assert values == ["1", None, "3"]
+    assert stats["evictions"] == 1
+
+
+def test_expired_entries_are_dropped():
+    cache = LLMCache(path=None, ttl=60)
+
+    async def scenario():
+        await cache.set("k", "value")
+        created_at, value = cache._memory["k"]
+        cache._memory["k"] = (created_at - 120, value)
+        return await cache.get("k"), await cache.stats()
+
+    value, stats = asyncio.run(scenario())
+    assert value is None
+    assert stats["expired"] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+
+    async def store():
+        cache = LLMCache(path=path, ttl=60)
+        await cache.set("k", "value")
+        cache.close()
+
+    async def load():
+        cache = LLMCache(path=path, ttl=60)
+        try:
+            return await cache.get("k"), await cache.get("k"), await cache.stats()
+        finally:
+            cache.close()
+
+    asyncio.run(store())
+    first, second, stats = asyncio.run(load())
+    assert first == second == "value"
+    assert stats["disk_hits"] == 1
+    assert stats["memory_hits"] == 1
+    assert stats["disk_entries"] == 1
+
+
+def test_single_flight_coalesces_identical_calls():
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def scenario():
+        return await asyncio.gather(*(llm_client._single_flight("same", fetch) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert calls == 1
+    assert [r for r, _ in results] == ["answer"] * 5
+    assert sum(is_leader for _, is_leader in results) == 1
+    assert llm_client.single_flight_snapshot()["in_flight"] == 0
+
+
+def test_single_flight_survives_one_cancelled_waiter():
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def scenario():
+        leader = asyncio.create_task(llm_client._single_flight("shared", fetch))
+        follower = asyncio.create_task(llm_client._single_flight("shared", fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(scenario()) == ("answer", False)
+
+
+def test_single_flight_late_waiter_does_not_cancel_the_next_call():
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        # Eager tasks register their flight as soon as they are created.
+        loop.set_task_factory(asyncio.eager_task_factory)
+        release = asyncio.Event()
+        later = {}
+
+        async def first_answer():
+            await release.wait()
+            return "first"
+
+        async def second_answer():
+            await asyncio.sleep(0.02)
+            return "second"
+
+        def start_next_calls():
+            # Runs after the first flight is done but before its waiter resumes.
+            later["kept"] = asyncio.create_task(llm_client._single_flight("key", second_answer))
+            later["dropped"] = asyncio.create_task(llm_client._single_flight("key", second_answer))
+
+        def first():
+            task = asyncio.ensure_future(first_answer())
+            task.add_done_callback(lambda _: loop.call_soon(start_next_calls))
+            return task
+
+        waiter = asyncio.create_task(llm_client._single_flight("key", first))
+        release.set()
+        assert await waiter == ("first", True)
+        later["dropped"].cancel()
+        return await later["kept"]
+
+    assert asyncio.run(scenario()) == ("second", True)
+
+
+def test_single_flight_cancels_call_when_last_waiter_leaves():
+    cancelled = asyncio.Event()
+
+    async def fetch():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def scenario():
+        waiter = asyncio.create_task(llm_client._single_flight("abandoned", fetch))
+        await asyncio.sleep(0.01)
+        started = time.monotonic()
+        waiter.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) < 1
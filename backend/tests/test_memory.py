@@ -0,0 +1,375 @@
+import asyncio
+import time
+
+import pytest
+
+import memory
+from memory import CHECKPOINT_REF, InMemoryBackend, MemoryStore, SQLiteBackend, WriteBehindBuffer
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    path = str(tmp_path / "memory.sqlite3") if request.param == "sqlite" else None
+    store = MemoryStore(sqlite_path=path)
+    yield store
+    asyncio.run(store.close())
+
+
+# ---------------------------- backends ----------------------------
+
+def test_in_memory_evicts_finished_sessions_first():
+    backend = InMemoryBackend(max_sessions=2, max_age_seconds=3600)
+    backend.add_session("running", {"goal": "a"})
+    backend.add_session("done", {"goal": "b"})
+    backend.finish_session("done", {"status": "completed"})
+    backend.add_session("new", {"goal": "c"})
+    assert backend.get_session("done") is None
+    assert backend.get_session("running") is not None
+    assert backend.stats()["evicted"] == 1
+
+
+def test_in_memory_evicts_least_recently_used_finished_session():
+    backend = InMemoryBackend(max_sessions=2, max_age_seconds=3600)
+    for sid in ("old", "recent"):
+        backend.add_session(sid, {"goal": sid})
+        backend.finish_session(sid, {"status": "completed"})
+    backend.records("plans", "old")  # touch: "recent" is now least recently used
+    backend.add_session("new", {"goal": "new"})
+    assert backend.get_session("old") is not None
+    assert backend.get_session("recent") is None
+
+
+def test_in_memory_keeps_running_sessions_over_the_limit():
+    backend = InMemoryBackend(max_sessions=1, max_age_seconds=3600)
+    backend.add_session("a", {"goal": "a"})
+    backend.add_session("b", {"goal": "b"})
+    assert backend.stats()["sessions"] == 2
+    assert backend.stats()["evicted"] == 0
+
+
+def test_in_memory_drops_idle_sessions():
+    backend = InMemoryBackend(max_sessions=10, max_age_seconds=0)
+    backend.add_session("a", {"goal": "a"})
+    backend.add_session("b", {"goal": "b"})
+    assert backend.get_session("a") is None
+
+
+def test_in_memory_records_without_session_are_evictable():
+    backend = InMemoryBackend(max_sessions=1, max_age_seconds=3600)
+    backend.add_session("running", {"goal": "a"})
+    backend.append("actions", "orphan", {"type": "note"})
+    assert backend.records("actions", "orphan") == []
+    assert backend.get_session("running") is not None
+
+
+def test_sqlite_backend_persists_sessions_and_records(tmp_path):
+    path = str(tmp_path / "memory.sqlite3")
+    backend = SQLiteBackend(path, pool_size=1)
+    backend.add_session("s1", {"goal": "g", "email": None, "tier": "fast", "created_at": memory.datetime.now()})
+    backend.append("plans", "s1", {"session_id": "s1", "tasks": [], "created_at": memory.datetime.now()})
+    backend.append("plans", "s1", {"session_id": "s1", "tasks": ["second"], "created_at": memory.datetime.now()})
+    backend.finish_session("s1", {"status": "completed", "confidence_score": 80, "finished_at": memory.datetime.now()})
+    backend.close()
+
+    reopened = SQLiteBackend(path, pool_size=1)
+    try:
+        session = reopened.get_session("s1")
+        assert (session["goal"], session["tier"], session["status"]) == ("g", "fast", "completed")
+        assert reopened.latest("plans", "s1")["tasks"] == ["second"]
+        assert len(reopened.records("plans", "s1")) == 2
+        assert reopened.records("plans", "unknown") == []
+        assert [s["session_id"] for s in reopened.list_sessions(10)["sessions"]] == ["s1"]
+    finally:
+        reopened.close()
+
+
+def test_sqlite_counters_from_many_threads(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "memory.sqlite3"), pool_size=4)
+    record = {"session_id": "s1", "created_at": memory.datetime.now()}
+    futures = [backend.executor.submit(backend.append, "actions", "s1", dict(record)) for _ in range(50)]
+    futures += [backend.executor.submit(backend.records, "actions", "s1") for _ in range(50)]
+    for future in futures:
+        future.result()
+    stats = backend.stats()
+    backend.close()
+    assert (stats["writes"], stats["reads"]) == (50, 50)
+
+
+def test_sqlite_close_keeps_the_event_loop_running(tmp_path):
+    store = MemoryStore(sqlite_path=str(tmp_path / "memory.sqlite3"))
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        store._memory.executor.submit(time.sleep, 0.1)  # a slow call still queued
+        task = asyncio.create_task(ticker())
+        await store.close()
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(scenario()) > 5
+
+
+# ------------------------- MemoryStore ----------------------------
+
+def test_session_records_roundtrip(store):
+    async def scenario():
+        sid = await store.create_session("goal", "me@example.com")
+        await store.save_plan(sid, {"tasks": ["first"]})
+        await store.save_plan(sid, {"tasks": ["second"]})
+        await store.save_research(sid, {"summary": "s"})
+        await store.save_document(sid, {"document": "draft"})
+        await store.finish_session(sid, "completed", 80)
+        return sid, {
+            "session": await store.get_session(sid),
+            "plan": await store.get_latest_plan(sid),
+            "research": await store.get_research(sid),
+            "document": await store.get_latest_document(sid),
+            "other": await store.get_latest_plan("session_unknown"),
+        }
+
+    sid, found = asyncio.run(scenario())
+    assert found["session"]["goal"] == "goal"
+    assert (found["session"]["status"], found["session"]["confidence_score"]) == ("completed", 80)
+    assert found["plan"]["tasks"] == ["second"]
+    assert [r["summary"] for r in found["research"]] == ["s"]
+    assert found["document"]["document"] == "draft"
+    assert found["other"] is None
+
+
+def test_document_versions_roundtrip(store):
+    drafts = [f"# Title\n\nParagraph one.\nParagraph two, revision {n}.\nClosing line.\n" * 5 for n in range(4)]
+
+    async def scenario():
+        sid = await store.create_session("goal")
+        for text in drafts:
+            await store.save_document(sid, {"document": text})
+        return (
+            await store.get_latest_document(sid),
+            await store.get_document_version(sid, 2),
+            await store.get_document_versions(sid),
+        )
+
+    latest, second, versions = asyncio.run(scenario())
+    assert latest["document"] == drafts[-1]
+    assert second["document"] == drafts[1]
+    assert [v["version"] for v in versions] == [1, 2, 3, 4]
+    assert versions[0]["encoding"] == "full"
+
+
+def test_save_document_ignores_a_stale_head(store):
+    drafts = [f"# Title\n\nParagraph one.\nParagraph two, revision {n}.\nClosing line.\n" * 5 for n in range(3)]
+
+    async def scenario():
+        sid = await store.create_session("goal")
+        await store.save_document(sid, {"document": drafts[0]})
+        await store.save_document(sid, {"document": drafts[1]})
+        # As if another process saved version 2 after this one cached version 1.
+        store._doc_heads[sid] = {"document": drafts[0], "version": 1}
+        await store.save_document(sid, {"document": drafts[2]})
+        return await store.get_document_versions(sid), await store.get_document_version(sid, 3)
+
+    versions, third = asyncio.run(scenario())
+    assert [v["version"] for v in versions] == [1, 2, 3]
+    assert third["document"] == drafts[2]
+
+
+def test_session_snapshot(store):
+    async def scenario():
+        sid = await store.create_session("goal")
+        await store.save_plan(sid, {"tasks": ["old"]})
+        await store.save_plan(sid, {"tasks": ["new"]})
+        for n in range(3):
+            await store.save_research(sid, {"n": n})
+        await store.save_document(sid, {"document": "v1"})
+        await store.save_document(sid, {"document": "v2"})
+        await store.save_action(sid, {"type": "confidence_and_hallucination_report", "confidence_score": 70, "raw": "x"})
+        await store.save_action(sid, {"type": "note"})
+        return await store.get_session_snapshot(sid), await store.get_session_snapshot("session_missing")
+
+    snapshot, missing = asyncio.run(scenario())
+    assert missing is None
+    assert snapshot["session"]["goal"] == "goal"
+    assert snapshot["plan"]["tasks"] == ["new"]
+    assert [r["n"] for r in snapshot["research"]] == [0, 1, 2]
+    assert snapshot["document"]["document"] == "v2"
+    assert snapshot["confidence"]["confidence_score"] == 70
+    assert "raw" not in snapshot["confidence"]
+
+
+def test_checkpoints_roundtrip(store):
+    async def scenario():
+        sid = await store.create_session("goal")
+        await store.save_checkpoint(sid, "research", {"summary": "s"}, 1)
+        await store.save_checkpoint(sid, "developer", None, 1)
+        await store.save_action(sid, {"type": "note"})
+        return await store.get_checkpoints(sid)
+
+    checkpoints = asyncio.run(scenario())
+    assert [(c["stage"], c["iteration"], c["output"]) for c in checkpoints] == [
+        ("research", 1, {"summary": "s"}),
+        ("developer", 1, None),
+    ]
+
+
+def test_checkpoints_store_references(store):
+    async def scenario():
+        sid = await store.create_session("goal", tier="fast")
+        research = {"summary": "s", "results": ["a"]}
+        await store.save_research(sid, research)
+        document = {"document": "final text"}
+        await store.save_document(sid, document)
+        await store.save_checkpoint(sid, "research", research, 1)
+        await store.save_checkpoint(sid, "writer", {"writer": document, "passes": 1}, 1)
+        await store.save_checkpoint(sid, "developer", "diagram", 1)
+        stored = await store._local("records", "actions", sid)
+        return sid, stored, await store.get_checkpoints(sid)
+
+    sid, stored, checkpoints = asyncio.run(scenario())
+    outputs = [memory.decode(a["output"]) for a in stored]
+    assert outputs[0][CHECKPOINT_REF] == "research"
+    assert outputs[1]["writer"][CHECKPOINT_REF] == "document"
+    assert outputs[1]["passes"] == 1
+    by_stage = {c["stage"]: c["output"] for c in checkpoints}
+    assert by_stage["research"]["results"] == ["a"]
+    assert by_stage["writer"]["writer"]["document"] == "final text"
+    assert by_stage["developer"] == "diagram"
+
+
+def test_checkpoint_with_missing_record_is_not_reused(store):
+    async def scenario():
+        sid = await store.create_session("goal")
+        await store.save_checkpoint(sid, "research", {"session_id": sid, "record_id": "gone"}, 1)
+        return await store.get_checkpoints(sid)
+
+    (checkpoint,) = asyncio.run(scenario())
+    assert checkpoint["output"] is None
+
+
+def test_session_keeps_its_tier(store):
+    async def scenario():
+        sid = await store.create_session("goal", tier="thorough")
+        await store.finish_session(sid, "completed", 75)
+        return await store.get_session(sid)
+
+    session = asyncio.run(scenario())
+    assert session["tier"] == "thorough"
+    assert session["status"] == "completed"
+
+
+# ------------------------- indexes -------------------------------
+
+class FakeIndexedCollection:
+    def __init__(self):
+        self.indexes = {}
+
+    async def create_index(self, keys, name, background=False, **options):
+        self.indexes[name] = {"key": keys, **options}
+
+    async def drop_index(self, name):
+        del self.indexes[name]
+
+    async def index_information(self):
+        return dict(self.indexes)
+
+
+class FakeIndexedDatabase(dict):
+    def __getitem__(self, name):
+        return self.setdefault(name, FakeIndexedCollection())
+
+
+def test_ttl_index_skips_documents():
+    db = FakeIndexedDatabase()
+    db["document"].indexes[memory.TTL_INDEX_NAME] = {"key": [("created_at", 1)], "expireAfterSeconds": 60}
+    store = MemoryStore(sqlite_path=None)
+    store.db, store.use_mongo = db, True
+
+    asyncio.run(store.ensure_indexes(retention_days=1))
+    assert db["plans"].indexes[memory.TTL_INDEX_NAME]["expireAfterSeconds"] == 86400
+    assert memory.TTL_INDEX_NAME in db["sessions"].indexes
+    assert memory.TTL_INDEX_NAME not in db["document"].indexes
+    assert "session_id_1_created_at_-1" in db["document"].indexes
+
+
+# ------------------------ write-behind ----------------------------
+
+class FakeBulkWriteError(Exception):
+    def __init__(self, details):
+        super().__init__("bulk write failed")
+        self.details = details
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = []
+        self.fail_indexes = set()
+
+    async def insert_many(self, batch, ordered=False):
+        for doc in batch:
+            doc.setdefault("_id", id(doc))
+        failed, self.fail_indexes = self.fail_indexes, set()
+        self.docs += [d for i, d in enumerate(batch) if i not in failed]
+        if failed:
+            raise FakeBulkWriteError({"writeErrors": [{"index": i, "code": 1} for i in failed]})
+
+
+class FakeDatabase(dict):
+    def __getitem__(self, name):
+        return self.setdefault(name, FakeCollection())
+
+
+@pytest.fixture
+def bulk_errors(monkeypatch):
+    monkeypatch.setattr(memory, "BulkWriteError", FakeBulkWriteError)
+    monkeypatch.setattr(memory, "WRITE_RETRY_SECONDS", 0.02)
+
+
+def test_write_behind_flushes_full_batch():
+    db = FakeDatabase()
+
+    async def scenario():
+        buffer = WriteBehindBuffer(db, batch_size=2, flush_interval=60)
+        buffer.add("actions", {"session_id": "s", "n": 1})
+        assert buffer.pending("actions", "s")[0]["n"] == 1
+        buffer.add("actions", {"session_id": "s", "n": 2})
+        await asyncio.sleep(0.01)
+        stats = buffer.stats()
+        await buffer.close()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert [d["n"] for d in db["actions"].docs] == [1, 2]
+    assert (stats["pending"], stats["flushed"], stats["batches"]) == (0, 2, 1)
+
+
+def test_write_behind_retries_only_unwritten_records(bulk_errors):
+    db = FakeDatabase()
+    db["research"].fail_indexes = {1}
+
+    async def scenario():
+        buffer = WriteBehindBuffer(db, batch_size=100, flush_interval=0.01)
+        for n in range(3):
+            buffer.add("research", {"session_id": "s", "n": n})
+        await asyncio.sleep(0.015)
+        left = [d["n"] for d in buffer.pending("research", "s")]
+        # No further add: the retry must be scheduled by the failed flush itself.
+        await asyncio.sleep(0.1)
+        return left, buffer.stats()
+
+    left, stats = asyncio.run(scenario())
+    assert left == [1]
+    assert sorted(d["n"] for d in db["research"].docs) == [0, 1, 2]
+    assert stats["pending"] == 0
+    assert stats["errors"] == 1
+
+
+def test_merge_pending_skips_records_already_saved():
+    saved = [{"_id": 1, "n": 1}]
+    pending = [{"_id": 1, "n": 1}, {"_id": 2, "n": 2}, {"n": 3}]
+    assert [d["n"] for d in memory._merge_pending(saved, pending)] == [1, 2, 3]
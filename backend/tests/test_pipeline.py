@@ -0,0 +1,162 @@
+import asyncio
+
+import pytest
+
+import orchestrator
+from memory import MemoryStore
+from orchestrator import Orchestrator
+from pipeline import Node, Pipeline, PipelineError
+
+
+def run(pipeline):
+    return asyncio.run(pipeline.run())
+
+
+def test_nodes_get_their_dependency_outputs():
+    seen = {}
+
+    def handler(name):
+        async def run_node(inputs):
+            seen[name] = inputs
+            return name.upper()
+        return run_node
+
+    spec = [
+        {"name": "research"},
+        {"name": "developer", "deps": ["research"]},
+        {"name": "writer", "deps": ["research", "developer"]},
+    ]
+    handlers = {item["name"]: handler(item["name"]) for item in spec}
+    results = run(Pipeline.from_spec(spec, handlers))
+    assert results == {"research": "RESEARCH", "developer": "DEVELOPER", "writer": "WRITER"}
+    assert seen["research"] == {}
+    assert seen["writer"] == {"research": "RESEARCH", "developer": "DEVELOPER"}
+
+
+def test_independent_nodes_overlap_up_to_parallelism():
+    active = peak = 0
+
+    async def work(_inputs):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+
+    nodes = [Node(f"n{i}", work, timeout=None) for i in range(5)]
+    run(Pipeline(nodes, parallelism=2))
+    assert peak == 2
+
+
+def test_failed_node_is_retried():
+    attempts = 0
+
+    async def flaky(_inputs):
+        nonlocal attempts
+        attempts += 1
+        if attempts < 3:
+            raise RuntimeError("boom")
+        return "ok"
+
+    assert run(Pipeline([Node("flaky", flaky, retries=2)])) == {"flaky": "ok"}
+    assert attempts == 3
+
+
+def test_timeout_raises_pipeline_error():
+    async def slow(_inputs):
+        await asyncio.sleep(1)
+
+    with pytest.raises(PipelineError) as info:
+        run(Pipeline([Node("slow", slow, timeout=0.01, retries=0)]))
+    assert info.value.node == "slow"
+    assert isinstance(info.value.cause, asyncio.TimeoutError)
+
+
+def test_failure_cancels_running_nodes():
+    cancelled = []
+
+    async def fails(_inputs):
+        await asyncio.sleep(0.01)
+        raise ValueError("bad input")
+
+    async def long_running(_inputs):
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append("long")
+            raise
+
+    async def never(_inputs):
+        cancelled.append("dependent ran")
+
+    nodes = [
+        Node("fails", fails, timeout=None),
+        Node("long", long_running, timeout=None),
+        Node("dependent", never, deps=["fails"], timeout=None),
+    ]
+    with pytest.raises(PipelineError, match="bad input"):
+        run(Pipeline(nodes, parallelism=2))
+    assert cancelled == ["long"]
+
+
+@pytest.mark.parametrize(
+    "nodes, message",
+    [
+        ([("a", ()), ("a", ())], "unique"),
+        ([("a", ("missing",))], "unknown"),
+        ([("a", ("b",)), ("b", ("a",))], "cycle"),
+    ],
+)
+def test_invalid_graphs_are_rejected(nodes, message):
+    async def noop(_inputs):
+        return None
+
+    with pytest.raises(ValueError, match=message):
+        Pipeline([Node(name, noop, deps) for name, deps in nodes])
+
+
+# ------------------------- Orchestrator ---------------------------
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # The Developer agent saves its diagram under ./outputs.
+    monkeypatch.chdir(tmp_path)
+
+
+def test_developer_overlaps_with_research(workdir, fake_groq):
+    events = []
+    orch = Orchestrator(MemoryStore(sqlite_path=None))
+
+    def traced(name, result):
+        async def run_stage(instructions):
+            events.append(f"{name} start")
+            await asyncio.sleep(0.02)
+            events.append(f"{name} end")
+            return result
+        return run_stage
+
+    orch.research.run_research = traced("research", {"summary": "s"})
+    orch.developer.generate_diagram = traced("developer", {"mermaid": "graph TD"})
+    result = asyncio.run(orch.run("test goal", max_iterations=1))
+    assert events.index("developer start") < events.index("research end")
+    assert result["handoff"]["developer"] == {"mermaid": "graph TD"}
+
+
+def test_retried_writer_saves_its_document_once(workdir, fake_groq, monkeypatch):
+    spec = [{**item, "retries": 1} for item in orchestrator.ITERATION_PIPELINE]
+    monkeypatch.setattr(orchestrator, "ITERATION_PIPELINE", spec)
+    store = MemoryStore(sqlite_path=None)
+    save_checkpoint = store.save_checkpoint
+    failures = []
+
+    async def flaky_checkpoint(session_id, stage_name, output, iteration):
+        if stage_name == "writer" and not failures:
+            failures.append(stage_name)
+            raise RuntimeError("checkpoint write failed")
+        await save_checkpoint(session_id, stage_name, output, iteration)
+
+    monkeypatch.setattr(store, "save_checkpoint", flaky_checkpoint)
+    result = asyncio.run(Orchestrator(store).run("test goal", max_iterations=1))
+    assert failures == ["writer"]
+    assert fake_groq.calls.count("writer") == 1
+    assert len(asyncio.run(store.get_document_versions(result["session_id"]))) == 1
@@ -0,0 +1,148 @@
+import asyncio
+import time
+
+import pytest
+
+from config import GROQ_CIRCUIT_FAILURE_THRESHOLD, GROQ_HEDGE_MIN_SAMPLES
+from rate_limiter import KeyBudget, KeyRateLimiter, TokenBucket, parse_reset_duration
+
+
+@pytest.mark.parametrize(
+    "value, seconds",
+    [("7.66s", 7.66), ("2m59.56s", 179.56), ("1h2m", 3720.0), ("250ms", 0.25), ("12", 12.0), ("", None), (None, None), ("soon", None)],
+)
+def test_parse_reset_duration(value, seconds):
+    assert parse_reset_duration(value) == (pytest.approx(seconds) if seconds is not None else None)
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(60)  # one token per second
+    now = bucket.updated_at
+    assert bucket.wait_time(60, now) == 0.0
+    bucket.consume(60, now)
+    assert bucket.wait_time(10, now) == pytest.approx(10.0)
+    assert bucket.wait_time(10, now + 10) == pytest.approx(0.0)
+
+
+def test_token_bucket_caps_request_at_capacity():
+    bucket = TokenBucket(60)
+    now = bucket.updated_at
+    bucket.consume(60, now)
+    # Asking for more than a full bucket waits for a full bucket, not forever.
+    assert bucket.wait_time(1000, now) == pytest.approx(60.0)
+
+
+def test_token_bucket_set_remaining():
+    bucket = TokenBucket(100)
+    now = bucket.updated_at
+    bucket.set_remaining(25, now)
+    assert bucket.tokens == 25
+    bucket.set_remaining(500, now)
+    assert bucket.tokens == 100
+
+
+def test_retry_after_header_blocks_key():
+    budget = KeyBudget(rpm=30, tpm=6000, max_concurrency=1, min_interval=0)
+    budget.observe_headers({"retry-after": "5"})
+    assert 4 < budget.wait_time(0) <= 5
+
+
+def test_exhausted_token_budget_blocks_until_reset():
+    budget = KeyBudget(rpm=30, tpm=6000, max_concurrency=1, min_interval=0)
+    budget.observe_headers({"x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": "7.5s"})
+    assert 7 < budget.wait_time(0) <= 7.5
+
+
+def test_daily_request_budget_only_blocks_when_exhausted():
+    budget = KeyBudget(rpm=30, tpm=6000, max_concurrency=1, min_interval=0)
+    budget.observe_headers({"x-ratelimit-remaining-requests": "100", "x-ratelimit-reset-requests": "2m"})
+    assert budget.wait_time(0) == 0.0
+
+
+def test_min_interval_paces_requests():
+    budget = KeyBudget(rpm=1000, tpm=100000, max_concurrency=1, min_interval=2.0)
+    now = time.monotonic()
+    budget.last_request_at = now
+    assert budget.wait_time(0, now) == pytest.approx(2.0)
+
+
+def test_429_opens_circuit():
+    budget = KeyBudget(rpm=30, tpm=6000, max_concurrency=1, min_interval=0)
+    budget.record_failure(429)
+    assert budget.circuit_open()
+    assert not budget.circuit_open(budget.circuit_open_until + 0.01)
+
+
+def test_consecutive_failures_open_circuit():
+    budget = KeyBudget(rpm=30, tpm=6000, max_concurrency=1, min_interval=0)
+    for _ in range(GROQ_CIRCUIT_FAILURE_THRESHOLD - 1):
+        budget.record_failure(500)
+    assert not budget.circuit_open()
+    budget.record_failure(500)
+    assert budget.circuit_open()
+
+
+def test_success_resets_failure_streak():
+    budget = KeyBudget(rpm=30, tpm=6000, max_concurrency=1, min_interval=0)
+    for _ in range(GROQ_CIRCUIT_FAILURE_THRESHOLD - 1):
+        budget.record_failure(500)
+    budget.record_success(0.1)
+    budget.record_failure(500)
+    assert not budget.circuit_open()
+    assert budget.error_rate() == pytest.approx(GROQ_CIRCUIT_FAILURE_THRESHOLD / (GROQ_CIRCUIT_FAILURE_THRESHOLD + 1))
+
+
+def test_rank_skips_open_circuits_and_prefers_healthy_keys():
+    limiter = KeyRateLimiter(rpm=30, tpm=6000, max_concurrency=1, min_interval=0)
+    limiter.budget("slow").record_success(3.0)
+    limiter.budget("fast").record_success(0.2)
+    limiter.budget("throttled").record_failure(429)
+    assert limiter.rank(["slow", "throttled", "fast"]) == ["fast", "slow"]
+
+
+def test_p95_latency_needs_enough_samples():
+    budget = KeyBudget(rpm=30, tpm=6000, max_concurrency=1, min_interval=0)
+    for _ in range(GROQ_HEDGE_MIN_SAMPLES - 1):
+        budget.record_success(0.5)
+    assert budget.p95_latency() is None
+    budget.record_success(2.0)
+    assert budget.p95_latency() is not None
+
+
+def test_soonest_available_is_the_least_blocked_key():
+    limiter = KeyRateLimiter(rpm=30, tpm=6000, max_concurrency=1, min_interval=0)
+    limiter.budget("a").observe_headers({"retry-after": "20"})
+    limiter.budget("b").observe_headers({"retry-after": "5"})
+    assert 4 < limiter.soonest_available(["a", "b"]) <= 5
+    assert limiter.soonest_available(["a", "b", "c"]) == 0.0
+
+
+def test_slot_consumes_budget_and_tracks_in_flight():
+    limiter = KeyRateLimiter(rpm=30, tpm=6000, max_concurrency=2, min_interval=0)
+
+    async def scenario():
+        async with limiter.slot("k", 1000) as budget:
+            assert budget.in_flight == 1
+        return budget
+
+    budget = asyncio.run(scenario())
+    assert budget.in_flight == 0
+    assert budget.requests.tokens == pytest.approx(29, abs=0.1)
+    assert budget.tokens.tokens == pytest.approx(5000, abs=5)
+
+
+def test_slot_bounds_concurrency_per_key():
+    limiter = KeyRateLimiter(rpm=1000, tpm=100000, max_concurrency=2, min_interval=0)
+    peak = 0
+
+    async def call(key):
+        nonlocal peak
+        async with limiter.slot(key, 10) as budget:
+            peak = max(peak, budget.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        await asyncio.gather(*(call("k") for _ in range(6)), call("other"))
+
+    asyncio.run(scenario())
+    assert peak == 2
@@ -0,0 +1,109 @@
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+
+import utils
+from responses import CompressionMiddleware, FastJSONResponse, shape
+from utils import dumps_json, serialize_doc
+
+DOC = {
+    "session_id": "s1",
+    "created_at": datetime(2026, 1, 2, 3, 4, 5, 678901),
+    "tags": ("a", "b"),
+    "nested": [{"at": datetime(2026, 1, 2), "text": "héllo"}],
+    "score": 0.5,
+    "missing": None,
+}
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dumps_json_matches_serialize_doc(use_orjson, monkeypatch):
+    if use_orjson and not utils.ORJSON_AVAILABLE:
+        pytest.skip("orjson is not installed")
+    monkeypatch.setattr(utils, "ORJSON_AVAILABLE", use_orjson)
+    assert json.loads(dumps_json(DOC)) == json.loads(json.dumps(serialize_doc(DOC)))
+
+
+def test_dumps_json_sets_become_lists():
+    assert json.loads(dumps_json({"ids": {"x"}})) == {"ids": ["x"]}
+
+
+def test_dumps_json_rejects_unknown_types():
+    with pytest.raises(TypeError):
+        dumps_json({"value": object()})
+
+
+RESULT = {
+    "session_id": "s1",
+    "goal": "goal",
+    "plan": {"tasks": [{"assigned_agent": "Writer", "description": "w"}]},
+    "handoff": {"research": [{"summary": "long"}], "writer": {"document": "text"}},
+    "final": {"document": "text", "version": 2, "review": "long review"},
+    "confidence": {"confidence_score": 80, "hallucination_risk": "LOW", "raw_response": "long"},
+}
+
+
+def test_full_view_is_unchanged():
+    assert shape(RESULT) is RESULT
+    assert shape(["not", "a", "dict"], "summary", "x") == ["not", "a", "dict"]
+
+
+def test_summary_view_keeps_final_text_scores_and_links():
+    summary = shape(RESULT, "summary")
+    assert set(summary) == {"session_id", "goal", "final", "confidence", "artifacts"}
+    assert summary["final"] == {"document": "text", "version": 2}
+    assert summary["confidence"] == {"confidence_score": 80, "hallucination_risk": "LOW"}
+    assert summary["artifacts"]["plan"] == "/session/s1/artifacts/plan"
+    assert summary["artifacts"]["versions"] == "/session/s1/versions"
+
+
+def test_fields_pick_dotted_paths():
+    picked = shape(RESULT, fields="final.document, confidence.confidence_score,plan.tasks.assigned_agent,nope.x,")
+    assert picked == {
+        "session_id": "s1",
+        "final": {"document": "text"},
+        "confidence": {"confidence_score": 80},
+        "plan": {"tasks": {"assigned_agent": ["Writer"]}},
+    }
+
+
+def test_fields_apply_to_the_summary_view():
+    assert shape(RESULT, "summary", "artifacts.document") == {
+        "session_id": "s1",
+        "artifacts": {"document": "/session/s1/artifacts/document"},
+    }
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100, skip_paths={"/stream"})
+
+    @app.get("/doc")
+    async def doc():
+        return FastJSONResponse({**DOC, "body": "x" * 500})
+
+    @app.get("/small")
+    async def small():
+        return FastJSONResponse({"ok": True})
+
+    @app.get("/stream")
+    async def stream():
+        return PlainTextResponse("y" * 500)
+
+    return app
+
+
+def test_large_responses_are_gzipped_except_skipped_paths():
+    client = TestClient(make_app())
+    headers = {"Accept-Encoding": "gzip"}
+
+    large = client.get("/doc", headers=headers)
+    assert large.headers.get("content-encoding") == "gzip"
+    assert large.json()["created_at"] == "2026-01-02T03:04:05.678901"
+
+    assert "content-encoding" not in client.get("/small", headers=headers).headers
+    assert "content-encoding" not in client.get("/stream", headers=headers).headers
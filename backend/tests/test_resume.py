@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from memory import MemoryStore
+from orchestrator import Orchestrator
+from orchestrator_langgraph import LangGraphOrchestrator
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # The Developer agent saves its diagram under ./outputs.
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    path = str(tmp_path / "memory.sqlite3") if request.param == "sqlite" else None
+    store = MemoryStore(sqlite_path=path)
+    yield store
+    asyncio.run(store.close())
+
+
+def test_resume_reruns_only_the_failed_stage(store, fake_groq):
+    orchestrator = Orchestrator(store)
+    fake_groq.failing.add("writer")
+    first = asyncio.run(orchestrator.run("test goal"))
+    assert "writer" in fake_groq.calls
+
+    fake_groq.failing.clear()
+    fake_groq.calls.clear()
+    resumed = asyncio.run(orchestrator.resume(first["session_id"]))
+    assert resumed["resumed_from"] == "writer"
+    assert fake_groq.calls == ["writer"]
+    assert resumed["final"]["document"] == "Generated writer text."
+    assert resumed["handoff"]["research"] == first["handoff"]["research"]
+
+
+def test_resume_of_completed_session_reuses_every_stage(store, fake_groq):
+    orchestrator = Orchestrator(store)
+    first = asyncio.run(orchestrator.run("test goal"))
+    fake_groq.calls.clear()
+
+    resumed = asyncio.run(orchestrator.resume(first["session_id"]))
+    assert resumed["resumed_from"] is None
+    assert fake_groq.calls == []
+    assert resumed["final"]["document"] == first["final"]["document"]
+
+
+def test_resume_keeps_the_session_tier(store, fake_groq):
+    orchestrator = Orchestrator(store)
+    first = asyncio.run(orchestrator.run("test goal", tier="fast"))
+    assert "developer" not in fake_groq.calls
+    fake_groq.calls.clear()
+
+    resumed = asyncio.run(orchestrator.resume(first["session_id"]))
+    assert resumed["tier"] == "fast"
+    assert resumed["handoff"]["developer"] is None
+    assert fake_groq.calls == []
+
+
+def test_resume_unknown_session():
+    result = asyncio.run(Orchestrator(MemoryStore(sqlite_path=None)).resume("session_missing"))
+    assert result["status"] == "ERROR"
+
+
+def test_langgraph_resume_replays_checkpoints(store, fake_groq):
+    orchestrator = LangGraphOrchestrator(store)
+    fake_groq.failing.add("writer")
+    first = asyncio.run(orchestrator.run("test goal", tier="fast"))
+
+    fake_groq.failing.clear()
+    fake_groq.calls.clear()
+    resumed = asyncio.run(orchestrator.resume(first["session_id"]))
+    assert resumed["tier"] == "fast"
+    assert "ceo" not in fake_groq.calls
+    assert "writer" in fake_groq.calls
+    assert resumed["final"]["document"] == "Generated writer text."
+
+
+@pytest.mark.parametrize("orchestrator_class", [Orchestrator, LangGraphOrchestrator])
+def test_unexpected_error_marks_the_session_failed(store, fake_groq, monkeypatch, orchestrator_class):
+    async def broken_save(session_id, document):
+        raise RuntimeError("store is down")
+
+    monkeypatch.setattr(store, "save_document", broken_save)
+    with pytest.raises(Exception, match="store is down"):
+        asyncio.run(orchestrator_class(store).run("test goal"))
+    (session,) = asyncio.run(store.list_sessions(limit=10))["sessions"]
+    assert session["status"] == "failed"
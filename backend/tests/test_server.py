@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from memory import MemoryStore
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, "memory", MemoryStore())
+    # No `with`: the lifespan (HTTP pools, workers) is not needed for these routes.
+    return TestClient(server.app)
+
+
+def seed_session(goal="goal", document="final draft"):
+    async def scenario():
+        memory = server.memory
+        sid = await memory.create_session(goal)
+        await memory.save_plan(sid, {"tasks": [{"assigned_agent": "Writer", "description": "w"}]})
+        await memory.save_research(sid, {"summary": "s"})
+        await memory.save_document(sid, {"document": document})
+        await memory.save_action(sid, {
+            "type": "confidence_and_hallucination_report",
+            "confidence_score": 88,
+            "hallucination_risk": "LOW",
+        })
+        await memory.finish_session(sid, "completed", 88)
+        return sid
+
+    return asyncio.run(scenario())
+
+
+def test_get_session_returns_the_snapshot(client):
+    sid = seed_session()
+    body = client.get(f"/session/{sid}").json()
+    assert body["session_id"] == sid
+    assert (body["goal"], body["status"]) == ("goal", "completed")
+    assert body["final"]["document"] == "final draft"
+    assert body["handoff"]["research"][0]["summary"] == "s"
+    assert body["plan"]["tasks"][0]["assigned_agent"] == "Writer"
+    assert body["confidence"]["confidence_score"] == 88
+
+
+def test_get_unknown_session_is_404(client):
+    assert client.get("/session/session_missing").status_code == 404
+
+
+def test_sessions_are_listed_newest_first_by_cursor(client):
+    ids = [seed_session(goal=f"goal {n}") for n in range(5)]
+    first = client.get("/sessions", params={"limit": 2}).json()
+    assert [s["session_id"] for s in first["sessions"]] == ids[:-3:-1]
+    assert set(first["sessions"][0]) >= {"goal", "created_at", "confidence_score", "status"}
+
+    seen = [s["session_id"] for s in first["sessions"]]
+    cursor = first["next_cursor"]
+    while cursor:
+        page = client.get("/sessions", params={"limit": 2, "cursor": cursor}).json()
+        seen += [s["session_id"] for s in page["sessions"]]
+        cursor = page["next_cursor"]
+    assert seen == ids[::-1]
+
+
+def test_sessions_bad_cursor_is_400(client):
+    assert client.get("/sessions", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_sessions_batch(client):
+    a, b = seed_session(document="A"), seed_session(document="B")
+    body = client.post("/sessions/batch", json={"session_ids": [b, "session_missing", a, b]}).json()
+    assert [s["session_id"] for s in body["sessions"]] == [b, a]
+    assert [s["final"]["document"] for s in body["sessions"]] == ["B", "A"]
+    assert body["missing"] == ["session_missing"]
+
+    summary = client.post("/sessions/batch", json={"session_ids": [a], "summary": True}).json()
+    assert summary["sessions"][0]["status"] == "completed"
+    assert "final" not in summary["sessions"][0]
+
+
+def test_sessions_batch_is_bounded(client):
+    response = client.post("/sessions/batch", json={"session_ids": [f"s{n}" for n in range(101)]})
+    assert response.status_code == 422
+
+
+def test_document_versions_endpoints(client):
+    sid = seed_session(document="first draft\nsecond line\n")
+
+    async def revise():
+        await server.memory.save_document(sid, {"document": "first draft\nsecond line, revised\n"})
+
+    asyncio.run(revise())
+    versions = client.get(f"/session/{sid}/versions").json()["versions"]
+    assert [v["version"] for v in versions] == [1, 2]
+    assert client.get(f"/session/{sid}/versions/1").json()["document"] == "first draft\nsecond line\n"
+    assert client.get(f"/session/{sid}/versions/2").json()["document"] == "first draft\nsecond line, revised\n"
+    assert client.get(f"/session/{sid}/versions/3").status_code == 404
+
+
+def test_session_views_and_artifacts(client):
+    sid = seed_session(document="final draft")
+    summary = client.get(f"/session/{sid}", params={"view": "summary"}).json()
+    assert summary["final"]["document"] == "final draft"
+    assert "handoff" not in summary and "plan" not in summary
+
+    picked = client.get(f"/session/{sid}", params={"fields": "status,confidence.confidence_score"}).json()
+    assert picked == {"session_id": sid, "status": "completed", "confidence": {"confidence_score": 88}}
+
+    plan = client.get(summary["artifacts"]["plan"]).json()
+    assert plan["plan"]["tasks"][0]["assigned_agent"] == "Writer"
+    assert client.get(summary["artifacts"]["research"]).json()["research"][0]["summary"] == "s"
+    assert client.get("/session/session_missing/artifacts/plan").status_code == 404
+    assert client.get(f"/session/{sid}/artifacts/secrets").status_code == 422
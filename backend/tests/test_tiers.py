@@ -0,0 +1,61 @@
+import pytest
+
+import tiers
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    fresh = {
+        "requested": {tier: 0 for tier in tiers.ORDER},
+        "served": {tier: 0 for tier in tiers.ORDER},
+        "downgraded": {"queue_depth": 0, "llm_budget": 0},
+    }
+    monkeypatch.setattr(tiers, "tier_stats", fresh)
+    return fresh
+
+
+@pytest.fixture
+def auto_downgrade(monkeypatch):
+    monkeypatch.setattr(tiers, "TIER_AUTO_DOWNGRADE", True)
+    monkeypatch.setattr(tiers, "TIER_STANDARD_AT_QUEUE_DEPTH", 1)
+    monkeypatch.setattr(tiers, "TIER_FAST_AT_QUEUE_DEPTH", 4)
+    monkeypatch.setattr(tiers, "TIER_STANDARD_AT_BUDGET_SECONDS", 2)
+    monkeypatch.setattr(tiers, "TIER_FAST_AT_BUDGET_SECONDS", 10)
+
+
+@pytest.mark.parametrize("requested, tier", [(None, "standard"), ("FAST", "fast"), (" thorough ", "thorough"), ("bogus", "standard")])
+def test_resolve_tier(requested, tier):
+    assert tiers.resolve_tier(requested) == tier
+
+
+def test_tier_settings():
+    assert not tiers.settings("fast")["developer"]
+    assert tiers.settings("fast")["combined_research"]
+    assert tiers.settings("thorough")["max_iterations"] >= tiers.settings("standard")["max_iterations"]
+
+
+def test_no_downgrade_when_disabled(monkeypatch, stats):
+    monkeypatch.setattr(tiers, "TIER_AUTO_DOWNGRADE", False)
+    assert tiers.select_tier("thorough", waiting=100, budget_wait=100)[0] == "thorough"
+
+
+@pytest.mark.parametrize(
+    "requested, waiting, budget_wait, tier, reason",
+    [
+        ("thorough", 0, 0.0, "thorough", None),
+        ("thorough", 1, 0.0, "standard", "queue_depth"),
+        ("thorough", 0, 3.0, "standard", "llm_budget"),
+        ("thorough", 4, 0.0, "fast", "queue_depth"),
+        ("standard", 0, 12.0, "fast", "llm_budget"),
+        ("fast", 10, 60.0, "fast", None),  # never upgraded
+    ],
+)
+def test_downgrade_under_load(auto_downgrade, stats, requested, waiting, budget_wait, tier, reason):
+    selected = tiers.select_tier(requested, waiting, budget_wait)
+    assert selected == (tier, requested, reason)
+    assert stats["served"][tier] == 0  # nothing counted before admission
+    tiers.record_tier(*selected)
+    assert stats["served"][tier] == 1
+    assert sum(stats["downgraded"].values()) == (1 if reason else 0)
+    if reason:
+        assert stats["downgraded"][reason] == 1
@@ -0,0 +1,108 @@
+"""Quality tiers: which stages a run executes and how long it may refine.
+
+- fast: combined CEO+Research call, then the Writer. No Developer, no scoring.
+- standard: the full chain with the usual refinement limits.
+- thorough: the full chain with more refinement iterations / Writer passes.
+
+With TIER_AUTO_DOWNGRADE on, the server caps new runs at a cheaper tier
+under load (`select_tier`), so peak traffic gets shorter runs instead of 429s.
+"""
+
+from typing import Literal, Optional, Tuple
+
+from config import (
+    QUALITY_MAX_WRITER_PASSES,
+    TIER_AUTO_DOWNGRADE,
+    TIER_DEFAULT,
+    TIER_FAST_AT_BUDGET_SECONDS,
+    TIER_FAST_AT_QUEUE_DEPTH,
+    TIER_STANDARD_AT_BUDGET_SECONDS,
+    TIER_STANDARD_AT_QUEUE_DEPTH,
+    TIER_THOROUGH_MAX_ITERATIONS,
+)
+
+Tier = Literal["fast", "standard", "thorough"]
+# Cheapest first: a downgrade moves left.
+ORDER = ("fast", "standard", "thorough")
+
+# combined_research: plan and research in one CEO call (the LangGraph
+# orchestrator always does this). max_iterations bounds the Orchestrator's
+# refinement loop, max_writer_passes the LangGraph quality gate.
+TIERS = {
+    "fast": {
+        "combined_research": True,
+        "developer": False,
+        "confidence": False,
+        "max_iterations": 1,
+        "max_writer_passes": 1,
+    },
+    "standard": {
+        "combined_research": False,
+        "developer": True,
+        "confidence": True,
+        "max_iterations": 3,
+        "max_writer_passes": QUALITY_MAX_WRITER_PASSES,
+    },
+    "thorough": {
+        "combined_research": False,
+        "developer": True,
+        "confidence": True,
+        "max_iterations": max(3, TIER_THOROUGH_MAX_ITERATIONS),
+        "max_writer_passes": QUALITY_MAX_WRITER_PASSES + 1,
+    },
+}
+
+tier_stats = {
+    "requested": {tier: 0 for tier in ORDER},
+    "served": {tier: 0 for tier in ORDER},
+    "downgraded": {"queue_depth": 0, "llm_budget": 0},
+}
+
+
+def resolve_tier(requested: Optional[str] = None) -> str:
+    """The requested tier, or TIER_DEFAULT (standard if that is not a tier)."""
+    tier = (requested or TIER_DEFAULT or "").strip().lower()
+    if tier in TIERS:
+        return tier
+    return TIER_DEFAULT if TIER_DEFAULT in TIERS else "standard"
+
+
+def settings(tier: Optional[str]) -> dict:
+    return TIERS[resolve_tier(tier)]
+
+
+def _cap(waiting: int, budget_wait: float) -> Tuple[Optional[str], Optional[str]]:
+    """Most expensive tier the current load allows, and why (None: no cap)."""
+    if waiting >= TIER_FAST_AT_QUEUE_DEPTH > 0:
+        return "fast", "queue_depth"
+    if budget_wait >= TIER_FAST_AT_BUDGET_SECONDS > 0:
+        return "fast", "llm_budget"
+    if waiting >= TIER_STANDARD_AT_QUEUE_DEPTH > 0:
+        return "standard", "queue_depth"
+    if budget_wait >= TIER_STANDARD_AT_BUDGET_SECONDS > 0:
+        return "standard", "llm_budget"
+    return None, None
+
+
+def select_tier(requested: Optional[str], waiting: int, budget_wait: float) -> Tuple[str, str, Optional[str]]:
+    """Tier a new run gets: the requested one, capped by the current load.
+
+    `waiting` is the number of runs queued for a slot, `budget_wait` the
+    seconds until an LLM key has budget again. Returns (tier, requested tier,
+    downgrade reason or None). Nothing is counted until `record_tier`.
+    """
+    wanted = resolve_tier(requested)
+    if TIER_AUTO_DOWNGRADE:
+        cap, reason = _cap(waiting, budget_wait)
+        if cap is not None and ORDER.index(cap) < ORDER.index(wanted):
+            return cap, wanted, reason
+    return wanted, wanted, None
+
+
+def record_tier(tier: str, requested: str, reason: Optional[str]) -> None:
+    """Count a run once it has been admitted (rejected requests are not counted)."""
+    tier_stats["requested"][requested] += 1
+    tier_stats["served"][tier] += 1
+    if reason is not None:
+        tier_stats["downgraded"][reason] += 1
+        print(f"🪶 Load is high ({reason}). Running '{requested}' request as '{tier}'.")
@@ -1,5 +1,6 @@
+import json
 import re
-from datetime import datetime
+from datetime import date, datetime
 
 try:
     from bson import ObjectId
@@ -7,6 +8,12 @@ try:
 except ImportError:
     BSON_AVAILABLE = False
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 
 def serialize_doc(doc):
     """Convert MongoDB documents to JSON-serializable format"""
@@ -21,6 +28,33 @@ def serialize_doc(doc):
     return doc
 
 
+def json_default(obj):
+    """Encoder hook for types JSON has no form for (same output as serialize_doc)."""
+    if BSON_AVAILABLE and isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_json(content) -> bytes:
+    """Serialize to compact UTF-8 JSON in one pass, without a serialize_doc copy.
+
+    Uses orjson when installed, the stdlib encoder otherwise.
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content,
+        default=json_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
 def format_email_content(text, confidence=None):
     """
     Format email content in a clean professional structure:
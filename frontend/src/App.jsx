@@ -42,6 +42,18 @@ const countApiCalls = (data) => {
   return count > 0 ? count : 12
 }
 
+// Map backend stage names (both orchestrators) to the agents shown in the UI
+const STAGE_TO_AGENT = {
+  ceo: 'CEO',
+  ceo_and_research: 'CEO',
+  research: 'Research',
+  developer: 'Developer',
+  writer: 'Writer',
+  confidence: 'Confidence',
+  validation: 'Confidence',
+  reviewer: 'Reviewer',
+}
+
 function App() {
   const [isRunning, setIsRunning] = useState(false)
   const [currentAgent, setCurrentAgent] = useState(null)
@@ -121,20 +133,15 @@ function App() {
     setCurrentAgent('CEO')
 
     try {
-      // Start backend request
-      const resultPromise = apiService.run(goal, null)
-      
-      // Simulate agent progression for UI feedback
       const agents = ['CEO', 'Research', 'Developer', 'Writer', 'Confidence', 'Reviewer']
-      
-      // Animate through agents while waiting for backend
-      for (const agent of agents) {
-        setCurrentAgent(agent)
-        await new Promise(resolve => setTimeout(resolve, 1500))
-      }
 
-      // Wait for backend result
-      const result = await resultPromise
+      // Stream the run so the active agent follows real backend progress
+      const result = await apiService.runStream(goal, null, (event, data) => {
+        if (event === 'stage' && data?.status === 'start') {
+          const agent = STAGE_TO_AGENT[data.stage]
+          if (agent) setCurrentAgent(agent)
+        }
+      })
       console.log('Backend result:', result)
 
       setResults({
@@ -2,9 +2,11 @@ import { motion } from 'framer-motion'
 import Header from './Header'
 import Footer from './Footer'
 import { useState, useEffect } from 'react'
+import apiService from '../services/api'
 
 const History = ({ onBack, onViewSession }) => {
   const [sessions, setSessions] = useState([])
+  const [summaries, setSummaries] = useState({})
 
   useEffect(() => {
     // Load sessions from localStorage (now only minimal session IDs)
@@ -21,6 +23,20 @@ const History = ({ onBack, onViewSession }) => {
     loadSessions()
   }, [])
 
+  useEffect(() => {
+    // One batch request for every stored session's status and confidence
+    const ids = sessions.map(s => s.session_id)
+    if (ids.length === 0) return
+    let cancelled = false
+    apiService.getSessionsBatch(ids, true)
+      .then(({ sessions: rows }) => {
+        if (cancelled) return
+        setSummaries(Object.fromEntries(rows.map(row => [row.session_id, row])))
+      })
+      .catch(err => console.error('Failed to load session summaries:', err))
+    return () => { cancelled = true }
+  }, [sessions])
+
   const clearHistory = () => {
     if (window.confirm('Are you sure you want to clear all history?')) {
       localStorage.removeItem('agentforge_session_ids')
@@ -117,9 +133,17 @@ const History = ({ onBack, onViewSession }) => {
                         <div className="glass-effect px-3 py-1 rounded-full flex items-center gap-2">
                           <span className="text-xs text-gray-400">📊</span>
                           <span className="text-xs font-semibold text-blue-400">
-                            DB Stored
+                            {summaries[session.session_id]?.status || 'DB Stored'}
                           </span>
                         </div>
+                        {summaries[session.session_id]?.confidence_score != null && (
+                          <div className="glass-effect px-3 py-1 rounded-full flex items-center gap-2">
+                            <span className="text-xs text-gray-400">🎯</span>
+                            <span className="text-xs font-semibold text-green-400">
+                              {summaries[session.session_id].confidence_score}% confidence
+                            </span>
+                          </div>
+                        )}
                       </div>
                     </div>
 
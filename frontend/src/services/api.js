@@ -23,12 +23,105 @@ export const apiService = {
     return response.data
   },
 
+  // Run orchestrator workflow, streaming progress as it happens.
+  // onEvent(event, data) receives `accepted`, `stage` and `token` events.
+  async runStream(goal, email, onEvent) {
+    let response
+    try {
+      response = await fetch(`${API_BASE_URL}/run/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ goal, email }),
+      })
+    } catch (err) {
+      // Match axios so callers can keep their offline fallback
+      err.code = 'ERR_NETWORK'
+      throw err
+    }
+
+    if (!response.ok || !response.body) {
+      const data = await response.json().catch(() => ({}))
+      const error = new Error(data.error || `Request failed with status ${response.status}`)
+      error.response = { status: response.status, data }
+      throw error
+    }
+
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+    let result = null
+
+    while (true) {
+      const { value, done } = await reader.read()
+      if (done) break
+      buffer += decoder.decode(value, { stream: true })
+
+      let boundary
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const raw = buffer.slice(0, boundary)
+        buffer = buffer.slice(boundary + 2)
+
+        let event = 'message'
+        let data = ''
+        for (const line of raw.split('\n')) {
+          if (line.startsWith('event:')) event = line.slice(6).trim()
+          else if (line.startsWith('data:')) data += line.slice(5).trim()
+        }
+        const payload = data ? JSON.parse(data) : null
+
+        if (event === 'error') {
+          const error = new Error(payload?.detail || payload?.error || 'Request failed')
+          error.response = { status: payload?.status, data: payload?.result || payload }
+          throw error
+        }
+        if (event === 'result') result = payload
+        else if (onEvent) onEvent(event, payload)
+      }
+    }
+
+    return result
+  },
+
+  // Queue a run in the background; poll getJob() for progress
+  async submitJob(goal, email) {
+    const response = await api.post('/jobs', { goal, email })
+    return response.data
+  },
+
+  async getJob(jobId) {
+    const response = await api.get(`/jobs/${jobId}`)
+    return response.data
+  },
+
+  async cancelJob(jobId) {
+    const response = await api.delete(`/jobs/${jobId}`)
+    return response.data
+  },
+
   // Get session details by ID
   async getSession(sessionId) {
     const response = await api.get(`/session/${sessionId}`)
     return response.data
   },
 
+  // List sessions newest first; pass the returned next_cursor to get the next page
+  async listSessions(cursor = null, limit = 20) {
+    const params = { limit }
+    if (cursor) params.cursor = cursor
+    const response = await api.get('/sessions', { params })
+    return response.data
+  },
+
+  // Fetch many sessions in one request ({ sessions, missing }).
+  // With summary=true only goal, created_at, confidence_score and status are returned.
+  async getSessionsBatch(sessionIds, summary = false) {
+    const response = await api.post('/sessions/batch', {
+      session_ids: sessionIds,
+      summary,
+    })
+    return response.data
+  },
+
   // Approve human-in-the-loop decision
   async approve(sessionId, decision) {
     const response = await api.post('/approve', {